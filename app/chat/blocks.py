@@ -85,3 +85,22 @@ def create_bot_response(
     
     return blocks
 
+
+def create_reminder_digest(owner: str, tasks: List[Dict[str, Any]], title: str) -> List[Dict[str, Any]]:
+    """リマインダーのダイジェスト用のblocks（担当者ごとに1メッセージ）"""
+    lines = "\n".join(f"• *{task['title']}* — {task['due_date']}" for task in tasks)
+    return [
+        create_section(f"*{title}*"),
+        create_divider(),
+        create_section(lines),
+        create_context([f"To: {owner}"]),
+    ]
+
+def create_hr_ticket_notification(ticket_id: str, question: str, user_ref: Optional[str], channel_ref: Optional[str]) -> List[Dict[str, Any]]:
+    """HRチャンネル通知用のblocks"""
+    return [
+        create_section(
+            f"*Ticket ID:* {ticket_id[:8]}\n*User:* <@{user_ref}>\n*Channel:* <#{channel_ref}>\n*Question:* {question}"
+        ),
+        create_context(["View all tickets: <http://localhost:8000/tickets|Web Dashboard>"]),
+    ]
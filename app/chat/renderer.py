@@ -0,0 +1,117 @@
+"""
+QA応答のBlock Kitレンダラ
+言語・トピックごとのblocksを1回だけ組み立て、Web用・Slack用のJSONバイト列としてキャッシュする
+"""
+from __future__ import annotations
+import threading
+from typing import Any, Dict, List, Tuple
+
+from app.chat.blocks import create_bot_response, create_context, create_section
+from app.services.pubsub import sse_frame
+from app.services.qa_engine import QAResponse
+from app.utils.fastjson import dumps as _dumps
+
+_cache: Dict[Tuple[str, str, str, str], Any] = {}
+_lock = threading.Lock()
+
+
+def _needs_escalate(qa: QAResponse) -> bool:
+    return qa.confidence == "low" or len(qa.suggested_actions) > 0
+
+
+def _web_blocks(qa: QAResponse) -> List[Dict[str, Any]]:
+    return create_bot_response(
+        text=qa.answer_text,
+        confidence=qa.confidence,
+        references=qa.references,
+        escalate=len(qa.suggested_actions) > 0,
+    )
+
+
+def _slack_blocks(qa: QAResponse) -> List[Dict[str, Any]]:
+    blocks = [create_section(qa.answer_text)]
+    if qa.references:
+        ref_text = "📚 *References:*\n" + "\n".join(f"• {ref}" for ref in qa.references)
+        blocks.append(create_context([ref_text]))
+    if _needs_escalate(qa):
+        blocks.append({
+            "type": "actions",
+            "elements": [
+                {
+                    "type": "button",
+                    "text": {"type": "plain_text", "text": "Escalate to HR"},
+                    "action_id": "escalate_to_hr",
+                    "style": "danger",
+                }
+            ],
+        })
+    return blocks
+
+
+def _cached(variant: str, qa: QAResponse, build) -> Any:
+    # 同じ言語・トピック・信頼度の回答は内容が同じなので1回だけ組み立てる
+    key = (variant, qa.lang, qa.topic or "_fallback", qa.confidence)
+    value = _cache.get(key)
+    if value is None:
+        value = build(qa)
+        with _lock:
+            _cache.setdefault(key, value)
+    return value
+
+
+def web_answer(qa: QAResponse) -> bytes:
+    """/chat/ask のレスポンスボディ（{"blocks": [...]}）"""
+    return _cached("web", qa, lambda q: _dumps({"blocks": _web_blocks(q)}))
+
+
+def web_answer_events(qa: QAResponse) -> bytes:
+    """SSEで送る回答（blockごとに1イベント、最後にdone）"""
+    return _cached("web_sse", qa, lambda q: b"".join(
+        [sse_frame("block", _dumps(block)) for block in _web_blocks(q)] + [sse_frame("done", b"{}")]
+    ))
+
+
+def slack_blocks(qa: QAResponse) -> List[Dict[str, Any]]:
+    """say()等に渡すSlack用blocks（キャッシュ済みのため変更しないこと）"""
+    return _cached("slack_blocks", qa, _slack_blocks)
+
+
+def slack_answer(qa: QAResponse) -> bytes:
+    """response_urlにPOSTするボディ（respond(blocks=...)と同じ形）"""
+    return _cached("slack", qa, lambda q: _dumps({"text": "", "blocks": _slack_blocks(q)}))
+
+
+class Template:
+    """一部の値だけを差し込むJSONテンプレート（残りは事前にエンコード済み）"""
+
+    _MARK = "\x00slot\x00"
+
+    def __init__(self, obj: Dict[str, Any]) -> None:
+        encoded = _dumps(obj)
+        marker = _dumps(self._MARK)[1:-1]  # 引用符を除いたエスケープ済みのマーカー
+        self._parts: List[bytes] = []
+        self._slots: List[str] = []
+        rest = encoded
+        while True:
+            i = rest.find(b'"' + marker)
+            if i < 0:
+                break
+            j = rest.index(b'"', i + 1)
+            self._parts.append(rest[:i])
+            self._slots.append(rest[i + 1 + len(marker):j].decode())
+            rest = rest[j + 1:]
+        self._parts.append(rest)
+
+    @classmethod
+    def slot(cls, name: str) -> str:
+        return cls._MARK + name
+
+    def render(self, **values: Any) -> bytes:
+        out = [self._parts[0]]
+        for name, part in zip(self._slots, self._parts[1:]):
+            out.append(_dumps(values[name]))
+            out.append(part)
+        return b"".join(out)
+
+
+ESCALATED = Template({"ticket_id": Template.slot("ticket_id"), "status": "escalated"})
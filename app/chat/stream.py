@@ -0,0 +1,36 @@
+"""
+Webチャットのストリーミング（SSE）
+セッション（chat_sid クッキー）ごとに1本の接続を持ち、回答のblocksとチケットの状態変化を送る
+"""
+from __future__ import annotations
+import hashlib
+import secrets
+from typing import Optional
+
+from app.services.pubsub import get_broker, sse_frame
+
+SESSION_COOKIE = "chat_sid"
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(16)
+
+
+def session_ref(session_id: str) -> str:
+    """チケットのuser_refに保存するセッションの参照（HR画面に出るのでセッションIDそのものは保存しない）"""
+    return "web:" + hashlib.blake2b(session_id.encode(), digest_size=8).hexdigest()
+
+
+def chat_topic(session_id: str) -> str:
+    return f"chat:{session_ref(session_id)}"
+
+
+def publish_ticket_status(ticket: dict) -> None:
+    """Webからエスカレーションしたユーザーにチケットの状態を送る"""
+    ref: Optional[str] = ticket.get("user_ref")
+    if ticket.get("source") != "web" or not ref:
+        return
+    get_broker().publish(
+        f"chat:{ref}",
+        sse_frame("ticket", {"ticket_id": ticket["id"], "status": ticket["status"]}),
+    )
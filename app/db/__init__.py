@@ -1,4 +1,9 @@
-from .connection import init_db, get_conn, DB_PATH
-
-__all__ = ["init_db", "get_conn", "DB_PATH"]
+from .connection import (
+    init_db, get_conn, get_versions, DB_PATH,
+    DEFAULT_TENANT, TENANTS, all_tenants, close_idle, current_tenant, is_tenant, tenant_context, tenant_db_path,
+)
 
+__all__ = [
+    "init_db", "get_conn", "get_versions", "DB_PATH",
+    "DEFAULT_TENANT", "TENANTS", "all_tenants", "close_idle", "current_tenant", "is_tenant", "tenant_context", "tenant_db_path",
+]
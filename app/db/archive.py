@@ -0,0 +1,308 @@
+"""
+クローズ済みチケット・完了したオンボーディングのアーカイブ
+- 対象: クローズから ARCHIVE_TICKETS_DAYS 日以上たったチケット、
+  作成から ARCHIVE_ONBOARDINGS_DAYS 日以上たった却下済み / 承認済みでタスクがすべて完了したオンボーディング（タスクごと）
+- 作成月ごとの NDJSON.gz（ARCHIVE_DIR/<kind>/<YYYY-MM>/<batch>.ndjson.gz）に書き出し、manifest.json に記録する
+  batchは実行ごとに一意（時刻 + uuid）。manifest.json はファイルロックの中で読み → 書き換え → rename する（同時実行でも項目を失わない）
+  （DEFAULT_TENANT以外は ARCHIVE_DIR/<tenant>/ の下）
+- ホットDBには archive_index（id -> ファイルと行番号）だけを残し、lookup() でidから読める（読み取り専用）
+- バッチごとに BEGIN IMMEDIATE の中で 選択 → 書き出し → 索引 → 削除 を行う（書き込みを止めるのは1バッチ分だけ）
+- 最後に空きページを返す: incremental（既定）は PRAGMA incremental_vacuum、full は VACUUM（rowidが変わるのでFTS索引も作り直す）
+集計テーブル（rollups）はそのまま残る。作り直すときはアーカイブも読む（rollups.rebuild）
+python -m app.db.archive --tickets-days 180 --onboardings-days 365 --vacuum incremental [--tenant acme]
+"""
+from __future__ import annotations
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+from app.db.connection import DB_PATH, DEFAULT_TENANT, FTS_TABLES, current_tenant, get_conn, tenant_context, tenant_db_path
+from app.utils.time import epoch, now_jst
+
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR") or DB_PATH.parent / "archive")
+ARCHIVE_TICKETS_DAYS = int(os.getenv("ARCHIVE_TICKETS_DAYS", "180"))
+ARCHIVE_ONBOARDINGS_DAYS = int(os.getenv("ARCHIVE_ONBOARDINGS_DAYS", "365"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "5000"))
+
+KINDS = ("tickets", "onboardings")
+VACUUM_MODES = ("incremental", "full", "none")
+
+# アーカイブの実行（同じプロセス内の同時実行を防ぐ。プロセス間は manifest のファイルロック）
+_lock = threading.Lock()
+
+
+def archive_dir() -> Path:
+    """現在のテナントのアーカイブの置き場所"""
+    tenant = current_tenant.get()
+    return ARCHIVE_DIR if tenant == DEFAULT_TENANT else ARCHIVE_DIR / tenant
+
+
+def _manifest_path() -> Path:
+    return archive_dir() / "manifest.json"
+
+
+def read_manifest() -> Dict[str, Any]:
+    path = _manifest_path()
+    if not path.exists():
+        return {"version": 1, "files": []}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+@contextmanager
+def _manifest_lock() -> Iterator[None]:
+    """manifest.json の読み書きの排他（別プロセスの archive の実行とも）"""
+    path = _manifest_path().with_suffix(".json.lock")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _update_manifest(change: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]) -> None:
+    """ロックの中で最新の manifest を読み、files を書き換えて一時ファイル → rename で置き換える"""
+    with _manifest_lock():
+        manifest = read_manifest()
+        manifest["files"] = change(manifest["files"])
+        path = _manifest_path()
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def _write_partition(kind: str, partition: str, batch: str, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """1パーティション分の行を書き出して manifest の項目を返す"""
+    rel = f"{kind}/{partition}/{batch}.ndjson.gz"
+    path = archive_dir() / rel
+    if path.exists():
+        # 他の実行が書いたファイルは上書きしない（そちらの行はDBから削除済み）
+        raise FileExistsError(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".gz.tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+        digest = hashlib.sha256(f.read()).hexdigest()
+    os.replace(tmp, path)
+    created = [r["created_at"] for r in records]
+    return {
+        "path": rel,
+        "kind": kind,
+        "partition": partition,
+        "rows": len(records),
+        "bytes": path.stat().st_size,
+        "sha256": digest,
+        "min_created_at": min(created),
+        "max_created_at": max(created),
+        "archived_at": now_jst().isoformat(),
+    }
+
+
+def _select(conn: sqlite3.Connection, kind: str, cutoff: int, limit: int) -> List[Dict[str, Any]]:
+    if kind == "tickets":
+        rows = conn.execute(
+            "SELECT * FROM tickets WHERE status = 'closed' AND resolved_ts < ? LIMIT ?", (cutoff, limit)
+        ).fetchall()
+        return [dict(r) for r in rows]
+    rows = conn.execute(
+        """SELECT * FROM onboarding_requests
+           WHERE created_ts < ? AND (status = 'REJECTED' OR (status = 'APPROVED'
+                 AND id NOT IN (SELECT onboarding_id FROM tasks WHERE is_done = 0)))
+           LIMIT ?""",
+        (cutoff, limit),
+    ).fetchall()
+    records = {r["id"]: {**dict(r), "tasks": []} for r in rows}
+    if records:
+        ids = list(records)
+        tasks = conn.execute(
+            f"SELECT * FROM tasks WHERE onboarding_id IN ({','.join('?' for _ in ids)}) ORDER BY due_date",
+            ids,
+        ).fetchall()
+        for t in tasks:
+            records[t["onboarding_id"]]["tasks"].append(dict(t))
+    return list(records.values())
+
+
+def _delete(conn: sqlite3.Connection, kind: str, ids: List[str]) -> None:
+    marks = ",".join("?" for _ in ids)
+    if kind == "tickets":
+        conn.execute(f"DELETE FROM tickets WHERE id IN ({marks})", ids)
+    else:
+        conn.execute(f"DELETE FROM tasks WHERE onboarding_id IN ({marks})", ids)
+        conn.execute(f"DELETE FROM onboarding_requests WHERE id IN ({marks})", ids)
+
+
+def _archive_batch(conn: sqlite3.Connection, kind: str, cutoff: int, batch: str, limit: int) -> List[Dict[str, Any]]:
+    """1バッチをアーカイブして書き出したファイルの manifest 項目を返す（対象がなければ空）"""
+    conn.execute("BEGIN IMMEDIATE")
+    written: List[Dict[str, Any]] = []
+    try:
+        records = _select(conn, kind, cutoff, limit)
+        if not records:
+            conn.rollback()
+            return []
+        partitions: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for record in records:
+            partitions[record["created_at"][:7]].append(record)
+        index: List[Tuple[str, str, str, int]] = []
+        for partition, rows in sorted(partitions.items()):
+            entry = _write_partition(kind, partition, batch, rows)
+            written.append(entry)
+            index.extend((r["id"], kind, entry["path"], line) for line, r in enumerate(rows))
+        conn.executemany(
+            "INSERT OR REPLACE INTO archive_index (id, kind, path, line) VALUES (?, ?, ?, ?)", index
+        )
+        _delete(conn, kind, [r["id"] for r in records])
+        # manifestはコミットの前に書く（コミットに失敗したら下で取り消す）
+        _update_manifest(lambda files: files + written)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        if written:
+            paths = {e["path"] for e in written}
+            _update_manifest(lambda files: [e for e in files if e["path"] not in paths])
+            for p in paths:
+                (archive_dir() / p).unlink(missing_ok=True)
+        raise
+    return written
+
+
+def vacuum(conn: sqlite3.Connection, mode: str) -> None:
+    """削除で空いたページをファイルから返す"""
+    if mode == "none":
+        return
+    if mode == "incremental" and conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        # 1ステップごとにページを返すので最後まで読む
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+        return
+    # 初回（auto_vacuum=NONE）は VACUUM で incremental に切り替える
+    if mode == "incremental":
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    # VACUUMは明示的なINTEGER PRIMARY KEYのないテーブルのrowidを振り直すので、外部コンテンツのFTS索引を作り直す
+    for fts in FTS_TABLES:
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+    conn.commit()
+
+
+def run(
+    tickets_days: int = ARCHIVE_TICKETS_DAYS,
+    onboardings_days: int = ARCHIVE_ONBOARDINGS_DAYS,
+    vacuum_mode: str = "incremental",
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """アーカイブを実行して件数・ファイル・DBサイズを返す"""
+    if vacuum_mode not in VACUUM_MODES:
+        raise ValueError(f"vacuum_mode must be one of {VACUUM_MODES}")
+    now = now_jst()
+    # 同じ秒に別の実行があってもファイル名が重ならないようにuuidを付ける
+    batch_prefix = f"{now.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex}"
+    cutoffs = {
+        "tickets": now - timedelta(days=tickets_days),
+        "onboardings": now - timedelta(days=onboardings_days),
+    }
+    db_path = tenant_db_path()
+    size_before = os.path.getsize(db_path)
+    archived = {kind: 0 for kind in KINDS}
+    files: List[str] = []
+    with _lock:
+        conn = get_conn()
+        conn.isolation_level = None  # BEGIN / COMMIT は自分で出す
+        try:
+            for kind in KINDS:
+                n = 0
+                while True:
+                    n += 1
+                    written = _archive_batch(conn, kind, epoch(cutoffs[kind]), f"{batch_prefix}-{n:04d}", batch_size)
+                    if not written:
+                        break
+                    archived[kind] += sum(e["rows"] for e in written)
+                    files.extend(e["path"] for e in written)
+            if any(archived.values()):
+                vacuum(conn, vacuum_mode)
+        finally:
+            conn.close()
+    return {
+        "cutoffs": {kind: cutoff.isoformat() for kind, cutoff in cutoffs.items()},
+        "archived": archived,
+        "files": files,
+        "vacuum": vacuum_mode,
+        "db_bytes_before": size_before,
+        "db_bytes_after": os.path.getsize(db_path),
+    }
+
+
+def _read_line(path: Path, line: int) -> Optional[Dict[str, Any]]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for i, text in enumerate(f):
+            if i == line:
+                return json.loads(text)
+    return None
+
+
+def lookup(kind: str, record_id: str) -> Optional[Dict[str, Any]]:
+    """アーカイブ済みの行をidで取得（なければNone）"""
+    conn = get_conn()
+    row = conn.execute("SELECT path, line FROM archive_index WHERE id = ? AND kind = ?", (record_id, kind)).fetchone()
+    conn.close()
+    if row is None:
+        return None
+    path = archive_dir() / row["path"]
+    if not path.exists():
+        return None
+    return _read_line(path, row["line"])
+
+
+def iter_records(kind: str) -> Iterator[Dict[str, Any]]:
+    """manifestのファイルを順に読んで全行を返す（集計の作り直し用）"""
+    for entry in read_manifest()["files"]:
+        if entry["kind"] != kind:
+            continue
+        with gzip.open(archive_dir() / entry["path"], "rt", encoding="utf-8") as f:
+            for text in f:
+                yield json.loads(text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickets-days", type=int, default=ARCHIVE_TICKETS_DAYS)
+    parser.add_argument("--onboardings-days", type=int, default=ARCHIVE_ONBOARDINGS_DAYS)
+    parser.add_argument("--vacuum", choices=VACUUM_MODES, default="incremental")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--tenant", default=current_tenant.get())
+    args = parser.parse_args()
+    with tenant_context(args.tenant):
+        result = run(args.tickets_days, args.onboardings_days, args.vacuum, args.batch_size)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
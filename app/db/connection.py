@@ -1,15 +1,165 @@
+import os
+import re
 import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set
 
-DB_PATH = Path(__file__).parent.parent / "data.db"
+from app.db.instrumented import InstrumentedConnection
+from app.services.metrics import METRICS_ENABLED
 
-def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+DB_PATH = Path(os.getenv("DB_PATH") or Path(__file__).parent.parent / "data.db")
+
+# テナント（子会社）ごとのDBファイル。DEFAULT_TENANTはDB_PATH、それ以外は TENANT_DB_DIR/<tenant>.db
+# TENANTSが空なら単一テナント（すべてDEFAULT_TENANT）
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "default")
+TENANTS = [t.strip() for t in os.getenv("TENANTS", "").split(",") if t.strip()]
+TENANT_DB_DIR = Path(os.getenv("TENANT_DB_DIR") or DB_PATH.parent / "tenants")
+# スレッドごとに開いたままにしておく接続の数（テナント単位のLRU）
+DB_CONN_CACHE = int(os.getenv("DB_CONN_CACHE", "8"))
+
+TENANT_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")
+
+# リクエスト（またはtenant_context()）のテナント。スレッドプールの同期ルートやto_threadにもコピーされる
+current_tenant: ContextVar[str] = ContextVar("tenant", default=DEFAULT_TENANT)
+
+# 書き込みをtable_versionsで追跡するテーブル
+VERSIONED_TABLES = ("onboarding_requests", "tasks", "tickets")
+
+# 全文検索（FTS5, trigram）のテーブル: FTSテーブル名 -> (元のテーブル, 検索する列)
+# 本文は元のテーブルから読む外部コンテンツ方式（rowidで対応付け、トリガーで同期）
+FTS_TABLES = {
+    "tickets_fts": ("tickets", ("question",)),
+    "onboardings_fts": ("onboarding_requests", ("employee_name", "manager_name")),
+}
+
+# ISO文字列の列と並べて持つ整数の列（時刻はUNIX秒、日付は1970-01-01からの日数）: テーブル -> [(整数の列, 元の列, SQLの式)]
+# 範囲検索・並べ替え・索引はこちらを使う。repoが書き込み時に両方を入れ、init_db()が既存の行を埋める
+EPOCH_COLUMNS = {
+    "onboarding_requests": [("created_ts", "created_at", "CAST(strftime('%s', created_at) AS INTEGER)")],
+    "tasks": [
+        ("due_day", "due_date", "CAST(julianday(due_date) - 2440587.5 AS INTEGER)"),
+        ("last_reminded_ts", "last_reminded_at", "CAST(strftime('%s', last_reminded_at) AS INTEGER)"),
+    ],
+    "tickets": [
+        ("created_ts", "created_at", "CAST(strftime('%s', created_at) AS INTEGER)"),
+        ("resolved_ts", "resolved_at", "CAST(strftime('%s', resolved_at) AS INTEGER)"),
+    ],
+}
+
+# init_db()のDDLを変えたら上げる。DBのPRAGMA user_versionと同じなら起動時のDDLを省く
+SCHEMA_VERSION = 6
+
+def is_tenant(tenant: str) -> bool:
+    return tenant == DEFAULT_TENANT or tenant in TENANTS
+
+def tenant_db_path(tenant: Optional[str] = None) -> Path:
+    tenant = tenant or current_tenant.get()
+    if tenant == DEFAULT_TENANT:
+        return DB_PATH
+    if not TENANT_NAME.match(tenant):
+        raise ValueError(f"invalid tenant name: {tenant!r}")
+    return TENANT_DB_DIR / f"{tenant}.db"
+
+@contextmanager
+def tenant_context(tenant: str) -> Iterator[None]:
+    """バックグラウンド処理・CLIでテナントを指定してrepoの関数を呼ぶ"""
+    token = current_tenant.set(tenant)
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)
+
+
+class _Pooled:
+    """close()で閉じずにスレッドのLRUに戻す接続"""
+    tenant = DEFAULT_TENANT
+
+    def close(self) -> None:
+        _release(self)  # type: ignore[arg-type]
+
+    def close_handle(self) -> None:
+        super().close()  # type: ignore[misc]
+
+
+class PooledConnection(_Pooled, sqlite3.Connection):
+    pass
+
+
+class PooledInstrumentedConnection(_Pooled, InstrumentedConnection):
+    pass
+
+
+_local = threading.local()
+_ready: Set[str] = set()  # スキーマを確認済みのテナント
+_ready_lock = threading.Lock()
+
+def _idle() -> "OrderedDict[str, _Pooled]":
+    idle = getattr(_local, "idle", None)
+    if idle is None:
+        idle = _local.idle = OrderedDict()
+    return idle
+
+def _open(tenant: str) -> sqlite3.Connection:
+    path = tenant_db_path(tenant)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # 計測が有効ならクエリ数・行数・時間をリクエストごとに数える接続
+    conn = sqlite3.connect(path, factory=PooledInstrumentedConnection if METRICS_ENABLED else PooledConnection)
+    conn.tenant = tenant
     conn.row_factory = sqlite3.Row
     return conn
 
-def init_db() -> None:
-    conn = get_conn()
+def _release(conn: "_Pooled") -> None:
+    # 呼び出し側がcommitしなかった変更は、閉じたときと同じく捨てる
+    if conn.in_transaction:  # type: ignore[attr-defined]
+        conn.rollback()  # type: ignore[attr-defined]
+    conn.isolation_level = ""  # type: ignore[attr-defined]
+    conn.row_factory = sqlite3.Row  # type: ignore[attr-defined]
+    idle = _idle()
+    previous = idle.pop(conn.tenant, None)
+    if previous is not None and previous is not conn:
+        previous.close_handle()  # 同じテナントで同時に開いていた分
+    idle[conn.tenant] = conn
+    while len(idle) > DB_CONN_CACHE:
+        _, evicted = idle.popitem(last=False)
+        evicted.close_handle()
+
+def get_conn() -> sqlite3.Connection:
+    """現在のテナントのDB接続（close()でスレッドごとのLRUに戻り、次のget_conn()で再利用される）"""
+    tenant = current_tenant.get()
+    if tenant not in _ready:
+        # テナントのDBは最初に使うときにスキーマを作る
+        init_db(tenant)
+    conn = _idle().pop(tenant, None)
+    return conn if conn is not None else _open(tenant)  # type: ignore[return-value]
+
+def close_idle() -> None:
+    """このスレッドで開いたままの接続を閉じる"""
+    idle = _idle()
+    while idle:
+        idle.popitem()[1].close_handle()
+
+def all_tenants() -> List[str]:
+    """設定されたすべてのテナント（バックグラウンド処理が巡回する。まだリクエストが来ていないテナントも含む）"""
+    return [DEFAULT_TENANT, *TENANTS]
+
+def init_db(tenant: Optional[str] = None) -> None:
+    tenant = tenant or current_tenant.get()
+    with _ready_lock:
+        if tenant in _ready:
+            return
+        # 集計の作り直し（rollups.rebuild）はアーカイブも読むので、そのテナントとして実行する
+        with tenant_context(tenant):
+            _init_schema(_open(tenant))
+        _ready.add(tenant)
+
+def _init_schema(conn: sqlite3.Connection) -> None:
+    if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+        conn.close()
+        return
     cur = conn.cursor()
     cur.execute(
         """
@@ -23,7 +173,8 @@ def init_db() -> None:
             start_date TEXT NOT NULL,
             status TEXT NOT NULL,
             rejection_reason TEXT,
-            lang TEXT NOT NULL DEFAULT 'en'
+            lang TEXT NOT NULL DEFAULT 'en',
+            created_ts INTEGER
         )
         """
     )
@@ -45,11 +196,16 @@ def init_db() -> None:
             due_date TEXT NOT NULL,
             is_done INTEGER NOT NULL DEFAULT 0,
             last_reminded_at TEXT,
+            due_day INTEGER,
+            last_reminded_ts INTEGER,
             FOREIGN KEY (onboarding_id) REFERENCES onboarding_requests(id)
         )
         """
     )
     
+    # オンボーディングのタスク一覧・アーカイブ時の削除
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_onboarding ON tasks(onboarding_id)")
+    
     cur.execute(
         """
         CREATE TABLE IF NOT EXISTS tickets (
@@ -60,11 +216,198 @@ def init_db() -> None:
             question TEXT NOT NULL,
             status TEXT NOT NULL DEFAULT 'open',
             channel_ref TEXT,
-            resolved_at TEXT
+            resolved_at TEXT,
+            topic TEXT,
+            created_ts INTEGER,
+            resolved_ts INTEGER
+        )
+        """
+    )
+    
+    # Migration: エスカレーションされた質問のQAトピック（レポート用）
+    cur.execute("PRAGMA table_info(tickets)")
+    if "topic" not in [row[1] for row in cur.fetchall()]:
+        cur.execute("ALTER TABLE tickets ADD COLUMN topic TEXT")
+    
+    # Transactional outbox: 外部通知をチケット作成と同じトランザクションで記録し、dispatcherが送信する
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id TEXT PRIMARY KEY,
+            created_at TEXT NOT NULL,
+            dedup_key TEXT NOT NULL UNIQUE,
+            method TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            locked_until REAL,
+            last_error TEXT,
+            sent_at TEXT
         )
         """
     )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox(status, next_attempt_at)")
     
+    # テーブルごとのデータバージョン（書き込みのたびにトリガーで加算、ETagに使う）
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """
+    )
+    for table in VERSIONED_TABLES:
+        cur.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)", (table,))
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            cur.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{op.lower()}_version AFTER {op} ON {table}
+                BEGIN
+                    UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+                END
+                """
+            )
+    
+    for fts, (table, columns) in FTS_TABLES.items():
+        exists = cur.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)).fetchone()
+        cols = ", ".join(columns)
+        new_cols = ", ".join(f"new.{c}" for c in columns)
+        old_cols = ", ".join(f"old.{c}" for c in columns)
+        cur.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='rowid', tokenize='trigram')"
+        )
+        cur.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO {fts} (rowid, {cols}) VALUES (new.rowid, {new_cols});
+            END
+            """
+        )
+        cur.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols});
+            END
+            """
+        )
+        # 検索する列が変わったときだけ（ステータス更新などでは索引を触らない）
+        cur.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {cols} ON {table}
+            BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols});
+                INSERT INTO {fts} (rowid, {cols}) VALUES (new.rowid, {new_cols});
+            END
+            """
+        )
+        if not exists:
+            # 既存の行を索引に入れる
+            cur.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+    
+    # レポート用の集計テーブル（app/db/rollups.py が書き込みごとに加算する）
+    rollups_exist = cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'rollup_funnel'").fetchone()
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rollup_tickets_daily (
+            day TEXT NOT NULL,
+            source TEXT NOT NULL,
+            created INTEGER NOT NULL DEFAULT 0,
+            closed INTEGER NOT NULL DEFAULT 0,
+            resolve_seconds REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, source)
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rollup_topics_daily (
+            day TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            asks INTEGER NOT NULL DEFAULT 0,
+            low_confidence INTEGER NOT NULL DEFAULT 0,
+            escalations INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, topic)
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rollup_funnel (
+            role TEXT PRIMARY KEY,
+            pending INTEGER NOT NULL DEFAULT 0,
+            approved INTEGER NOT NULL DEFAULT 0,
+            rejected INTEGER NOT NULL DEFAULT 0,
+            tasks_total INTEGER NOT NULL DEFAULT 0,
+            tasks_done INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rollup_onboarding_daily (
+            day TEXT PRIMARY KEY,
+            pending INTEGER NOT NULL DEFAULT 0,
+            approved INTEGER NOT NULL DEFAULT 0,
+            rejected INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """
+    )
+    if not rollups_exist:
+        # 既存のデータから集計する
+        from app.db.rollups import rebuild
+        rebuild(conn)
+    
+    # Migration: 整数の日時列と索引（既存の行はISO文字列から埋める）
+    for table, columns in EPOCH_COLUMNS.items():
+        cur.execute(f"PRAGMA table_info({table})")
+        existing = [row[1] for row in cur.fetchall()]
+        for column, _, _ in columns:
+            if column not in existing:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER")
+    backfill_epoch_columns(conn)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_onboarding_created_ts ON onboarding_requests(created_ts)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_due_day ON tasks(due_day)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tickets_created_ts ON tickets(created_ts)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tickets_status_created_ts ON tickets(status, created_ts)")
+    # マネージャーごとの一覧（/manager/{name}）
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_onboarding_manager_status ON onboarding_requests(manager_name, status)")
+    
+    # アーカイブ済みの行の場所（app/db/archive.py）
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS archive_index (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            path TEXT NOT NULL,
+            line INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    
+    cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     conn.commit()
     conn.close()
 
+
+def backfill_epoch_columns(conn: sqlite3.Connection) -> None:
+    """整数の列が空の行をISO文字列から埋める（移行時・直接INSERTしたあと）。commitは呼び出し側"""
+    for table, columns in EPOCH_COLUMNS.items():
+        sets = ", ".join(f"{column} = COALESCE({column}, {expr})" for column, _, expr in columns)
+        missing = " OR ".join(f"({column} IS NULL AND {source} IS NOT NULL)" for column, source, _ in columns)
+        conn.execute(f"UPDATE {table} SET {sets} WHERE {missing}")
+
+
+def get_versions(tables: Iterable[str]) -> Dict[str, int]:
+    """テーブルごとのデータバージョンを取得"""
+    names = tuple(tables)
+    conn = get_conn()
+    rows = conn.execute(
+        f"SELECT name, version FROM table_versions WHERE name IN ({','.join('?' for _ in names)})",
+        names,
+    ).fetchall()
+    conn.close()
+    return {r["name"]: r["version"] for r in rows}
@@ -0,0 +1,96 @@
+"""
+クエリ数・取得行数・所要時間を数えるsqlite3のConnection/Cursor
+集計先はリクエストごとのQueryStats（contextvarで渡す。スレッドプールの同期ルートにもコピーされる）
+リクエスト外（バックグラウンド処理など）のクエリはroute="background"として直接メトリクスに加算する
+"""
+from __future__ import annotations
+import sqlite3
+import time
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from app.services.metrics import inc
+
+
+class QueryStats:
+    __slots__ = ("queries", "rows", "seconds", "closed")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.closed = False
+
+
+current_stats: ContextVar[Optional[QueryStats]] = ContextVar("db_query_stats", default=None)
+
+
+def _record(queries: int, rows: int, seconds: float) -> None:
+    stats = current_stats.get()
+    if stats is not None and not stats.closed:
+        stats.queries += queries
+        stats.rows += rows
+        stats.seconds += seconds
+        return
+    # レスポンス後に動くタスクなど、集計済みのリクエストに属さないクエリ
+    if queries:
+        inc("db_queries_total", queries, route="background")
+    if rows:
+        inc("db_rows_total", rows, route="background")
+    inc("db_seconds_total", seconds, route="background")
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql: str, parameters: Any = ()) -> "InstrumentedCursor":
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record(1, 0, time.perf_counter() - started)
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> "InstrumentedCursor":
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record(1, 0, time.perf_counter() - started)
+
+    def executescript(self, sql_script: str) -> "InstrumentedCursor":
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            _record(1, 0, time.perf_counter() - started)
+
+    def fetchone(self) -> Any:
+        started = time.perf_counter()
+        row = super().fetchone()
+        _record(0, 0 if row is None else 1, time.perf_counter() - started)
+        return row
+
+    def fetchmany(self, size: int = -1) -> list:
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size < 0 else size)
+        _record(0, len(rows), time.perf_counter() - started)
+        return rows
+
+    def fetchall(self) -> list:
+        started = time.perf_counter()
+        rows = super().fetchall()
+        _record(0, len(rows), time.perf_counter() - started)
+        return rows
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory: Any = InstrumentedCursor) -> Any:  # type: ignore[override]
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute() はPython側のcursor()を経由しないので上書きする
+    def execute(self, sql: str, parameters: Any = ()) -> Any:  # type: ignore[override]
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> Any:  # type: ignore[override]
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script: str) -> Any:  # type: ignore[override]
+        return self.cursor().executescript(sql_script)
@@ -1,19 +1,29 @@
 from __future__ import annotations
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+import json
+import sqlite3
+import time
 import uuid
 
-from app.db import get_conn
-from app.utils.time import now_jst
+from app.chat.blocks import create_hr_ticket_notification
+from app.chat.stream import publish_ticket_status
+from app.services.qa_engine import match_topic
+from app.services.ticket_feed import publish_ticket_change
+from app.db import get_conn, rollups
+from app.utils.time import day_date, epoch, epoch_day, now_jst, parse_date
 
 def create_onboarding(employee_name: str, manager_name: str, role: str, grade: str, start_date: str, lang: str = "en") -> str:
     oid = str(uuid.uuid4())
+    now = now_jst()
+    created_at = now.isoformat()
     conn = get_conn()
     conn.execute(
         """INSERT INTO onboarding_requests
-           (id, created_at, employee_name, manager_name, role, grade, start_date, status, lang)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-        (oid, now_jst().isoformat(), employee_name, manager_name, role, grade, start_date, "PENDING", lang),
+           (id, created_at, employee_name, manager_name, role, grade, start_date, status, lang, created_ts)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (oid, created_at, employee_name, manager_name, role, grade, start_date, "PENDING", lang, epoch(now)),
     )
+    rollups.onboarding_created(conn, role, created_at)
     conn.commit()
     conn.close()
     return oid
@@ -26,16 +36,19 @@ def get_onboarding(oid: str) -> Optional[Dict[str, Any]]:
 
 def list_onboardings() -> List[Dict[str, Any]]:
     conn = get_conn()
-    rows = conn.execute("SELECT * FROM onboarding_requests ORDER BY created_at DESC").fetchall()
+    rows = conn.execute("SELECT * FROM onboarding_requests ORDER BY created_ts DESC").fetchall()
     conn.close()
     return [dict(r) for r in rows]
 
 def set_status(oid: str, status: str, rejection_reason: Optional[str] = None) -> None:
     conn = get_conn()
+    before = conn.execute("SELECT role, status, created_at FROM onboarding_requests WHERE id = ?", (oid,)).fetchone()
     conn.execute(
         "UPDATE onboarding_requests SET status = ?, rejection_reason = ? WHERE id = ?",
         (status, rejection_reason, oid),
     )
+    if before:
+        rollups.onboarding_status_changed(conn, before, status)
     conn.commit()
     conn.close()
 
@@ -43,17 +56,20 @@ def add_task(onboarding_id: str, owner: str, title: str, description: str, due_d
     tid = str(uuid.uuid4())
     conn = get_conn()
     conn.execute(
-        """INSERT INTO tasks (id, onboarding_id, owner, title, description, due_date)
-           VALUES (?, ?, ?, ?, ?, ?)""",
-        (tid, onboarding_id, owner, title, description, due_date),
+        """INSERT INTO tasks (id, onboarding_id, owner, title, description, due_date, due_day)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (tid, onboarding_id, owner, title, description, due_date, epoch_day(parse_date(due_date))),
     )
+    role = conn.execute("SELECT role FROM onboarding_requests WHERE id = ?", (onboarding_id,)).fetchone()
+    if role:
+        rollups.task_added(conn, role[0])
     conn.commit()
     conn.close()
 
 def list_tasks(onboarding_id: str) -> List[Dict[str, Any]]:
     conn = get_conn()
     rows = conn.execute(
-        "SELECT * FROM tasks WHERE onboarding_id = ? ORDER BY due_date ASC",
+        "SELECT * FROM tasks WHERE onboarding_id = ? ORDER BY due_day ASC",
         (onboarding_id,),
     ).fetchall()
     conn.close()
@@ -61,31 +77,134 @@ def list_tasks(onboarding_id: str) -> List[Dict[str, Any]]:
 
 def mark_done(task_id: str, done: bool) -> None:
     conn = get_conn()
+    before = conn.execute(
+        "SELECT t.is_done, o.role FROM tasks t JOIN onboarding_requests o ON o.id = t.onboarding_id WHERE t.id = ?",
+        (task_id,),
+    ).fetchone()
     conn.execute("UPDATE tasks SET is_done = ? WHERE id = ?", (1 if done else 0, task_id))
+    if before and bool(before["is_done"]) != done:
+        rollups.task_done_changed(conn, before["role"], done)
+    conn.commit()
+    conn.close()
+
+def manager_portfolio(manager_name: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    """マネージャーの全オンボーディングとタスクの集計（1回のGROUP BY。manager_name, status の索引を使う）
+    次の期限は未完了で今日以降が期限の最初のタスク。期限の日数を先頭に付けた文字列のMINで1つ選ぶ"""
+    today = epoch_day(now_jst().date())
+    where = "o.manager_name = ?" + (" AND o.status = ?" if status else "")
+    conn = get_conn()
+    rows = conn.execute(
+        f"""SELECT o.id, o.employee_name, o.role, o.grade, o.start_date, o.status, o.created_at,
+                   COUNT(t.id) AS tasks_total,
+                   COALESCE(SUM(t.is_done), 0) AS tasks_done,
+                   COALESCE(SUM(t.is_done = 0 AND t.due_day < ?), 0) AS overdue,
+                   MIN(CASE WHEN t.is_done = 0 AND t.due_day >= ? THEN printf('%06d', t.due_day) || t.title END) AS next_due
+            FROM onboarding_requests o LEFT JOIN tasks t ON t.onboarding_id = o.id
+            WHERE {where}
+            GROUP BY o.id
+            ORDER BY o.created_ts DESC""",
+        (today, today, manager_name, *((status,) if status else ())),
+    ).fetchall()
+    conn.close()
+    items = []
+    for r in rows:
+        item = dict(r)
+        next_due = item.pop("next_due")
+        item["next_due"] = (
+            {"title": next_due[6:], "due_date": day_date(int(next_due[:6])).isoformat()} if next_due else None
+        )
+        items.append(item)
+    return items
+
+# 更新したタスクの状態と、集計用のオンボーディングのrole
+_TASK_RETURNING = """RETURNING id, is_done, owner,
+                     (SELECT role FROM onboarding_requests o WHERE o.id = tasks.onboarding_id) AS role"""
+
+def toggle_task(task_id: str) -> Optional[Dict[str, Any]]:
+    """完了状態を反転して新しい状態を返す（UPDATE 1回。タスクがなければNone）"""
+    conn = get_conn()
+    row = conn.execute(f"UPDATE tasks SET is_done = 1 - is_done WHERE id = ? {_TASK_RETURNING}", (task_id,)).fetchone()
+    if row is None:
+        conn.close()
+        return None
+    if row["role"]:
+        rollups.task_done_changed(conn, row["role"], bool(row["is_done"]))
     conn.commit()
     conn.close()
+    return {"id": row["id"], "is_done": bool(row["is_done"]), "owner": row["owner"]}
 
-def create_ticket(source: str, question: str, user_ref: Optional[str] = None, channel_ref: Optional[str] = None) -> str:
-    """チケットを作成"""
-    import uuid
+def bulk_update_tasks(task_ids: List[str], is_done: Optional[bool] = None, owner: Optional[str] = None) -> int:
+    """複数タスクの完了状態・担当者をまとめて変更（項目ごとにUPDATE 1回）。変わったタスク数を返す"""
+    ids = list(dict.fromkeys(task_ids))
+    marks = ",".join("?" for _ in ids)
+    changed = set()
+    conn = get_conn()
+    if is_done is not None:
+        # 状態が変わる行だけを更新し、roleごとの件数で集計を直す
+        rows = conn.execute(
+            f"UPDATE tasks SET is_done = ? WHERE id IN ({marks}) AND is_done != ? {_TASK_RETURNING}",
+            (int(is_done), *ids, int(is_done)),
+        ).fetchall()
+        per_role: Dict[str, int] = {}
+        for r in rows:
+            changed.add(r["id"])
+            if r["role"]:
+                per_role[r["role"]] = per_role.get(r["role"], 0) + 1
+        for role, n in per_role.items():
+            rollups.task_done_changed(conn, role, is_done, n)
+    if owner is not None:
+        rows = conn.execute(
+            f"UPDATE tasks SET owner = ? WHERE id IN ({marks}) AND owner IS NOT ? RETURNING id", (owner, *ids, owner)
+        ).fetchall()
+        changed.update(r["id"] for r in rows)
+    conn.commit()
+    conn.close()
+    return len(changed)
+
+def create_ticket(
+    source: str,
+    question: str,
+    user_ref: Optional[str] = None,
+    channel_ref: Optional[str] = None,
+    notify_channel: Optional[str] = None,
+    topic: Optional[str] = None,
+) -> str:
+    """チケットを作成（notify_channelがあればHR通知をoutboxに同じトランザクションで記録）"""
     tid = str(uuid.uuid4())
+    now = now_jst()
+    created_at = now.isoformat()
+    topic = topic or match_topic(question) or rollups.NO_TOPIC
     conn = get_conn()
     conn.execute(
-        """INSERT INTO tickets (id, created_at, source, user_ref, question, status, channel_ref)
-           VALUES (?, ?, ?, ?, ?, ?, ?)""",
-        (tid, now_jst().isoformat(), source, user_ref, question, "open", channel_ref),
+        """INSERT INTO tickets (id, created_at, source, user_ref, question, status, channel_ref, topic, created_ts)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (tid, created_at, source, user_ref, question, "open", channel_ref, topic, epoch(now)),
     )
+    rollups.ticket_created(conn, created_at, source, topic)
+    if notify_channel:
+        enqueue_outbox(
+            conn,
+            dedup_key=f"hr_notify:{tid}",
+            method="chat.postMessage",
+            payload={
+                "channel": notify_channel,
+                "text": f"🚨 New HR ticket from {source.capitalize()}",
+                "blocks": create_hr_ticket_notification(tid, question, user_ref, channel_ref),
+            },
+        )
+    ticket, version = _ticket_change(conn, tid)
     conn.commit()
     conn.close()
+    publish_ticket_change(ticket, version)
     return tid
 
 def list_tickets(status: Optional[str] = None) -> List[Dict[str, Any]]:
     """チケット一覧を取得"""
     conn = get_conn()
     if status:
-        rows = conn.execute("SELECT * FROM tickets WHERE status = ? ORDER BY created_at DESC", (status,)).fetchall()
+        rows = conn.execute("SELECT * FROM tickets WHERE status = ? ORDER BY created_ts DESC", (status,)).fetchall()
     else:
-        rows = conn.execute("SELECT * FROM tickets ORDER BY created_at DESC").fetchall()
+        rows = conn.execute("SELECT * FROM tickets ORDER BY created_ts DESC").fetchall()
     conn.close()
     return [dict(r) for r in rows]
 
@@ -96,12 +215,90 @@ def get_ticket(ticket_id: str) -> Optional[Dict[str, Any]]:
     conn.close()
     return dict(row) if row else None
 
-def close_ticket(ticket_id: str) -> None:
-    """チケットをクローズ"""
+def close_ticket(ticket_id: str) -> Optional[Dict[str, Any]]:
+    """チケットをクローズしてクローズ後の行を返す（なければNone。Webからのチケットはエスカレーションしたユーザーに通知）"""
+    now = now_jst()
+    resolved_at = now.isoformat()
     conn = get_conn()
+    before = conn.execute("SELECT status, source, created_at FROM tickets WHERE id = ?", (ticket_id,)).fetchone()
     conn.execute(
-        "UPDATE tickets SET status = ?, resolved_at = ? WHERE id = ?",
-        ("closed", now_jst().isoformat(), ticket_id),
+        # 二重クローズでは最初のクローズ時刻を残す（解決時間の集計と合わせる）
+        """UPDATE tickets SET status = ?, resolved_at = COALESCE(resolved_at, ?), resolved_ts = COALESCE(resolved_ts, ?)
+           WHERE id = ?""",
+        ("closed", resolved_at, epoch(now), ticket_id),
+    )
+    if before:
+        rollups.ticket_closed(conn, before, resolved_at)
+    ticket, version = _ticket_change(conn, ticket_id)
+    conn.commit()
+    conn.close()
+    if ticket:
+        publish_ticket_change(ticket, version)
+        publish_ticket_status(ticket)
+    return ticket
+
+def _ticket_change(conn: sqlite3.Connection, ticket_id: str) -> Tuple[Optional[Dict[str, Any]], int]:
+    """変更直後（コミット前）のチケット行とticketsのデータバージョン"""
+    row = conn.execute("SELECT * FROM tickets WHERE id = ?", (ticket_id,)).fetchone()
+    version = conn.execute("SELECT version FROM table_versions WHERE name = 'tickets'").fetchone()
+    return (dict(row) if row else None), (version[0] if version else 0)
+
+def enqueue_outbox(conn: sqlite3.Connection, dedup_key: str, method: str, payload: Dict[str, Any]) -> None:
+    """outboxに送信予定のメッセージを追加（commitは呼び出し側のトランザクションで行う）"""
+    conn.execute(
+        """INSERT OR IGNORE INTO outbox (id, created_at, dedup_key, method, payload, next_attempt_at)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (str(uuid.uuid4()), now_jst().isoformat(), dedup_key, method, json.dumps(payload, ensure_ascii=False), time.time()),
+    )
+
+def claim_outbox(limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+    """送信期限の来たoutboxの行をリースして取得（複数ワーカーで同じ行を二重に取らない）"""
+    now = time.time()
+    conn = get_conn()
+    conn.execute("BEGIN IMMEDIATE")
+    rows = conn.execute(
+        """SELECT * FROM outbox
+           WHERE status = 'pending' AND next_attempt_at <= ? AND (locked_until IS NULL OR locked_until < ?)
+           ORDER BY created_at ASC LIMIT ?""",
+        (now, now, limit),
+    ).fetchall()
+    if rows:
+        conn.executemany(
+            "UPDATE outbox SET locked_until = ? WHERE id = ?",
+            [(now + lease_seconds, r["id"]) for r in rows],
+        )
+    conn.commit()
+    conn.close()
+    return [dict(r) for r in rows]
+
+def mark_outbox_sent(outbox_id: str) -> None:
+    conn = get_conn()
+    conn.execute(
+        "UPDATE outbox SET status = 'sent', attempts = attempts + 1, locked_until = NULL, sent_at = ? WHERE id = ?",
+        (now_jst().isoformat(), outbox_id),
+    )
+    conn.commit()
+    conn.close()
+
+def mark_outbox_failed(outbox_id: str, error: str, next_attempt_at: float, dead: bool = False) -> None:
+    """送信失敗を記録（deadなら以後リトライしない）"""
+    conn = get_conn()
+    conn.execute(
+        """UPDATE outbox SET status = ?, attempts = attempts + 1, locked_until = NULL,
+           last_error = ?, next_attempt_at = ? WHERE id = ?""",
+        ("dead" if dead else "pending", error[:500], next_attempt_at, outbox_id),
+    )
+    conn.commit()
+    conn.close()
+
+def defer_outbox(outbox_ids: List[str], next_attempt_at: float) -> None:
+    """リース中の行を試行回数を増やさずに解放し、次回送信時刻を後ろにずらす"""
+    if not outbox_ids:
+        return
+    conn = get_conn()
+    conn.executemany(
+        "UPDATE outbox SET locked_until = NULL, next_attempt_at = ? WHERE id = ?",
+        [(next_attempt_at, oid) for oid in outbox_ids],
     )
     conn.commit()
     conn.close()
@@ -0,0 +1,267 @@
+"""
+HRレポート用の集計テーブル（ロールアップ）
+repoの書き込み（create_onboarding / set_status / add_task / mark_done / toggle_task / bulk_update_tasks / create_ticket / close_ticket）と
+同じトランザクションで差分を加算するので、/reports は履歴の量に関係なく集計テーブルの数行だけを読む
+- rollup_tickets_daily: 日付・経路ごとの作成数、クローズ数、解決までの秒数の合計（作成日 / クローズ日で集計）
+- rollup_topics_daily: 日付・QAトピックごとの質問数、低信頼度の回答数、エスカレーション数
+- rollup_funnel: ロールごとの承認待ち / 承認 / 却下の件数とタスクの総数・完了数
+- rollup_onboarding_daily: 作成日ごとのオンボーディングの状態（コホート）
+質問数はDBに残らないのでメモリで数え、定期的に（とレポート表示時・終了時に）書き込む
+python -m app.db.rollups [tenant]  # 元のテーブルとアーカイブから作り直す（質問数は残す）
+"""
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+from collections import Counter
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from app.db.connection import current_tenant, get_conn, tenant_context
+from app.utils.time import now_jst
+
+# KBにマッチしなかった質問のトピック
+NO_TOPIC = "_none"
+
+# メモリの質問数を書き込む間隔（秒）
+ROLLUP_FLUSH_SECONDS = float(os.getenv("ROLLUP_FLUSH_SECONDS", "10"))
+
+STATUS_COLUMNS = {"PENDING": "pending", "APPROVED": "approved", "REJECTED": "rejected"}
+
+# テーブル -> キーの列（init_db()のDDLと同じ）
+_KEYS = {
+    "rollup_tickets_daily": ("day", "source"),
+    "rollup_topics_daily": ("day", "topic"),
+    "rollup_funnel": ("role",),
+    "rollup_onboarding_daily": ("day",),
+}
+
+_questions: Counter = Counter()  # (tenant, day, topic, low) -> 件数
+_questions_lock = threading.Lock()
+
+
+def _bump(conn: sqlite3.Connection, table: str, key: Tuple[Any, ...], **deltas: float) -> None:
+    """キーの行に差分を加算（行がなければ作る）"""
+    keys = _KEYS[table]
+    cols = list(keys) + list(deltas)
+    conn.execute(
+        f"""INSERT INTO {table} ({", ".join(cols)}) VALUES ({", ".join("?" for _ in cols)})
+            ON CONFLICT ({", ".join(keys)}) DO UPDATE SET {", ".join(f"{c} = {c} + excluded.{c}" for c in deltas)}""",
+        (*key, *deltas.values()),
+    )
+
+
+def _day(ts: str) -> str:
+    return ts[:10]  # ISO形式（JST）の日付部分
+
+
+# --- repoの書き込みから呼ぶ（commitは呼び出し側） ---
+
+def onboarding_created(conn: sqlite3.Connection, role: str, created_at: str) -> None:
+    _bump(conn, "rollup_funnel", (role,), pending=1)
+    _bump(conn, "rollup_onboarding_daily", (_day(created_at),), pending=1)
+
+
+def onboarding_status_changed(conn: sqlite3.Connection, before: Dict[str, Any], status: str) -> None:
+    old, new = STATUS_COLUMNS.get(before["status"]), STATUS_COLUMNS.get(status)
+    if old == new or old is None or new is None:
+        return
+    _bump(conn, "rollup_funnel", (before["role"],), **{old: -1, new: 1})
+    _bump(conn, "rollup_onboarding_daily", (_day(before["created_at"]),), **{old: -1, new: 1})
+
+
+def task_added(conn: sqlite3.Connection, role: str) -> None:
+    _bump(conn, "rollup_funnel", (role,), tasks_total=1)
+
+
+def task_done_changed(conn: sqlite3.Connection, role: str, done: bool, count: int = 1) -> None:
+    _bump(conn, "rollup_funnel", (role,), tasks_done=count if done else -count)
+
+
+def ticket_created(conn: sqlite3.Connection, created_at: str, source: str, topic: Optional[str]) -> None:
+    _bump(conn, "rollup_tickets_daily", (_day(created_at), source), created=1)
+    _bump(conn, "rollup_topics_daily", (_day(created_at), topic or NO_TOPIC), escalations=1)
+
+
+def ticket_closed(conn: sqlite3.Connection, before: Dict[str, Any], resolved_at: str) -> None:
+    if before["status"] == "closed":
+        return
+    seconds = conn.execute("SELECT (julianday(?) - julianday(?)) * 86400", (resolved_at, before["created_at"])).fetchone()[0]
+    _bump(conn, "rollup_tickets_daily", (_day(resolved_at), before["source"]), closed=1, resolve_seconds=seconds or 0.0)
+
+
+# --- QAの質問数（メモリで数えてまとめて書き込む） ---
+
+def record_question(topic: Optional[str], confidence: str) -> None:
+    key = (current_tenant.get(), _day(now_jst().isoformat()), topic or NO_TOPIC, confidence == "low")
+    with _questions_lock:
+        _questions[key] += 1
+
+
+def flush_questions() -> int:
+    """メモリの質問数を（テナントごとの）集計テーブルに加算"""
+    with _questions_lock:
+        pending = dict(_questions)
+        _questions.clear()
+    by_tenant: Dict[str, Dict[Tuple[str, str, bool], int]] = {}
+    for (tenant, *key), count in pending.items():
+        by_tenant.setdefault(tenant, {})[tuple(key)] = count
+    failed: Optional[sqlite3.Error] = None
+    for tenant, counts in by_tenant.items():
+        try:
+            with tenant_context(tenant):
+                conn = get_conn()
+                for (day, topic, low), count in counts.items():
+                    _bump(conn, "rollup_topics_daily", (day, topic), asks=count, low_confidence=count if low else 0)
+                conn.commit()
+                conn.close()
+        except sqlite3.Error as e:
+            # 書き込めなかった分は次回に回す
+            with _questions_lock:
+                _questions.update({(tenant, *key): count for key, count in counts.items()})
+            failed = e
+    if failed is not None:
+        raise failed
+    return len(pending)
+
+
+# --- 作り直し ---
+
+def rebuild(conn: sqlite3.Connection) -> None:
+    """元のテーブルとアーカイブから集計し直す（質問数asks / low_confidenceはDBに元がないので残す）"""
+    from app.services.qa_engine import match_topic
+
+    # トピック未設定の古いチケットを埋める
+    rows = conn.execute("SELECT rowid, question FROM tickets WHERE topic IS NULL").fetchall()
+    conn.executemany(
+        "UPDATE tickets SET topic = ? WHERE rowid = ?",
+        [(match_topic(r["question"]) or NO_TOPIC, r["rowid"]) for r in rows],
+    )
+    conn.execute("DELETE FROM rollup_tickets_daily")
+    conn.execute(
+        """INSERT INTO rollup_tickets_daily (day, source, created, closed, resolve_seconds)
+           SELECT day, source, SUM(created), SUM(closed), SUM(seconds) FROM (
+               SELECT substr(created_at, 1, 10) AS day, source, 1 AS created, 0 AS closed, 0.0 AS seconds FROM tickets
+               UNION ALL
+               SELECT substr(resolved_at, 1, 10), source, 0, 1, (julianday(resolved_at) - julianday(created_at)) * 86400
+               FROM tickets WHERE status = 'closed' AND resolved_at IS NOT NULL
+           ) GROUP BY day, source"""
+    )
+    conn.execute("UPDATE rollup_topics_daily SET escalations = 0")
+    conn.execute(
+        """INSERT INTO rollup_topics_daily (day, topic, escalations)
+           SELECT substr(created_at, 1, 10), COALESCE(topic, ?), COUNT(*) FROM tickets WHERE true GROUP BY 1, 2
+           ON CONFLICT (day, topic) DO UPDATE SET escalations = excluded.escalations""",
+        (NO_TOPIC,),
+    )
+    conn.execute("DELETE FROM rollup_funnel")
+    conn.execute(
+        """INSERT INTO rollup_funnel (role, pending, approved, rejected)
+           SELECT role, SUM(status = 'PENDING'), SUM(status = 'APPROVED'), SUM(status = 'REJECTED')
+           FROM onboarding_requests GROUP BY role"""
+    )
+    conn.execute(
+        """INSERT INTO rollup_funnel (role, tasks_total, tasks_done)
+           SELECT o.role, COUNT(*), SUM(t.is_done) FROM tasks t JOIN onboarding_requests o ON o.id = t.onboarding_id
+           WHERE true GROUP BY o.role
+           ON CONFLICT (role) DO UPDATE SET tasks_total = excluded.tasks_total, tasks_done = excluded.tasks_done"""
+    )
+    conn.execute("DELETE FROM rollup_onboarding_daily")
+    conn.execute(
+        """INSERT INTO rollup_onboarding_daily (day, pending, approved, rejected)
+           SELECT substr(created_at, 1, 10), SUM(status = 'PENDING'), SUM(status = 'APPROVED'), SUM(status = 'REJECTED')
+           FROM onboarding_requests GROUP BY 1"""
+    )
+    _add_archived(conn)
+
+
+def _add_archived(conn: sqlite3.Connection) -> None:
+    """アーカイブに移した行の分を書き込み時と同じように加算する"""
+    from app.db.archive import iter_records
+    from app.services.qa_engine import match_topic
+
+    for t in iter_records("tickets"):
+        topic = t.get("topic") or match_topic(t["question"]) or NO_TOPIC
+        ticket_created(conn, t["created_at"], t["source"], topic)
+        if t["status"] == "closed" and t.get("resolved_at"):
+            ticket_closed(conn, {**t, "status": "open"}, t["resolved_at"])
+    for o in iter_records("onboardings"):
+        onboarding_created(conn, o["role"], o["created_at"])
+        onboarding_status_changed(conn, {**o, "status": "PENDING"}, o["status"])
+        for task in o["tasks"]:
+            task_added(conn, o["role"])
+            if task["is_done"]:
+                task_done_changed(conn, o["role"], True)
+
+
+def rebuild_all() -> None:
+    conn = get_conn()
+    rebuild(conn)
+    conn.commit()
+    conn.close()
+
+
+# --- レポート ---
+
+def _rate(n: float, d: float) -> Optional[float]:
+    return round(n / d, 4) if d else None
+
+
+def report(days: int = 30) -> Dict[str, Any]:
+    """直近days日のレポート（集計テーブルだけを読む）"""
+    flush_questions()
+    since = (now_jst().date() - timedelta(days=days - 1)).isoformat()
+    conn = get_conn()
+    tickets = conn.execute(
+        "SELECT day, source, created, closed, resolve_seconds FROM rollup_tickets_daily WHERE day >= ? ORDER BY day, source",
+        (since,),
+    ).fetchall()
+    topics = conn.execute(
+        """SELECT topic, SUM(asks) AS asks, SUM(low_confidence) AS low_confidence, SUM(escalations) AS escalations
+           FROM rollup_topics_daily WHERE day >= ? GROUP BY topic ORDER BY escalations DESC, asks DESC""",
+        (since,),
+    ).fetchall()
+    funnel = conn.execute("SELECT * FROM rollup_funnel ORDER BY role").fetchall()
+    cohorts = conn.execute(
+        "SELECT day, pending, approved, rejected FROM rollup_onboarding_daily WHERE day >= ? ORDER BY day", (since,)
+    ).fetchall()
+    conn.close()
+
+    closed = sum(r["closed"] for r in tickets)
+    resolve_seconds = sum(r["resolve_seconds"] for r in tickets)
+    by_source: Dict[str, Dict[str, int]] = {}
+    for r in tickets:
+        s = by_source.setdefault(r["source"], {"created": 0, "closed": 0})
+        s["created"] += r["created"]
+        s["closed"] += r["closed"]
+    return {
+        "days": days,
+        "since": since,
+        "tickets": {
+            "created": sum(r["created"] for r in tickets),
+            "closed": closed,
+            "avg_resolve_hours": round(resolve_seconds / closed / 3600, 2) if closed else None,
+            "by_source": by_source,
+            "daily": [
+                {**dict(r), "resolve_seconds": round(r["resolve_seconds"], 1)}
+                for r in tickets
+            ],
+        },
+        "topics": [
+            {**dict(r), "escalation_rate": _rate(r["escalations"], r["asks"])}
+            for r in topics
+        ],
+        "funnel": [
+            {**dict(r), "approval_rate": _rate(r["approved"], r["approved"] + r["rejected"]),
+             "task_completion": _rate(r["tasks_done"], r["tasks_total"])}
+            for r in funnel
+        ],
+        "cohorts": [dict(r) for r in cohorts],
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    with tenant_context(sys.argv[1] if len(sys.argv) > 1 else current_tenant.get()):
+        rebuild_all()
+    print("rebuilt rollups")
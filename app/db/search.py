@@ -0,0 +1,199 @@
+"""
+チケット・オンボーディングの全文検索（FTS5 trigram、索引はinit_db()のトリガーで同期）
+- 語がすべて3文字以上: FTS5のMATCH。どの語も一致がSEARCH_RANK_LIMIT件未満ならbm25の順、そうでなければ新しい順
+  （bm25は語ごとに一致する全行を数えるので、100万件中16万件に一致するような語を含むと1回60〜250msかかる）
+- 3文字未満の語を含む（trigramでは引けない）: LIKEで新しい順に走査
+スニペットはHTMLエスケープ済みで、一致箇所を<mark>で囲む
+python -m app.db.search [tenant]  # 索引の作り直し（VACUUMでrowidが変わった場合など）
+"""
+from __future__ import annotations
+import html
+import os
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.db.connection import FTS_TABLES, current_tenant, get_conn, tenant_context
+
+# この件数以上に一致する語はbm25で並べず新しい順にする
+SEARCH_RANK_LIMIT = int(os.getenv("SEARCH_RANK_LIMIT", "1000"))
+MAX_PER_PAGE = 50
+MAX_TERMS = 8
+
+# snippet()/highlight()で一致箇所を囲む印（エスケープ後に<mark>へ置き換える）
+_OPEN, _CLOSE = "\x02", "\x03"
+
+
+def _terms(q: str) -> List[str]:
+    return [t.replace(_OPEN, "").replace(_CLOSE, "") for t in q.split()][:MAX_TERMS]
+
+
+def _match_query(terms: Sequence[str]) -> Optional[str]:
+    """語ごとのフレーズをANDでつないだMATCH式（trigramで引けない語があればNone）"""
+    if not terms or any(len(t) < 3 for t in terms):
+        return None
+    return " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def _marked_html(text: Optional[str]) -> str:
+    return html.escape(text or "").replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+
+def _mark_terms(text: Optional[str], terms: Sequence[str], width: int = 0) -> str:
+    """LIKEで見つけた行の一致箇所を<mark>で囲む（widthがあれば最初の一致の周りだけ）"""
+    text = text or ""
+    spans = sorted(
+        (m.start(), m.end())
+        for t in terms
+        for m in re.finditer(re.escape(t), text, re.IGNORECASE)
+    )
+    start, end, prefix, suffix = 0, len(text), "", ""
+    if width and len(text) > width:
+        first = spans[0][0] if spans else 0
+        start = max(0, min(first - width // 4, len(text) - width))
+        end = start + width
+        prefix = "…" if start > 0 else ""
+        suffix = "…" if end < len(text) else ""
+    out, pos = [], start
+    for s, e in spans:
+        s, e = max(s, pos), min(e, end)
+        if s >= e:
+            continue
+        out.append(html.escape(text[pos:s]))
+        out.append("<mark>" + html.escape(text[s:e]) + "</mark>")
+        pos = e
+    out.append(html.escape(text[pos:end]))
+    return prefix + "".join(out) + suffix
+
+
+def _page(page: int, per_page: int) -> Tuple[int, int]:
+    return max(1, page), min(max(1, per_page), MAX_PER_PAGE)
+
+
+def _too_common(conn: sqlite3.Connection, fts: str, terms: Sequence[str]) -> bool:
+    """一致が多すぎてbm25が重くなる語があるか（件数は上限までしか数えない）"""
+    for term in terms:
+        row = conn.execute(
+            f"SELECT count(*) FROM (SELECT rowid FROM {fts} WHERE {fts} MATCH ? LIMIT ?)",
+            (_match_query([term]), SEARCH_RANK_LIMIT),
+        ).fetchone()
+        if row[0] >= SEARCH_RANK_LIMIT:
+            return True
+    return False
+
+
+def _result(q: str, order: str, page: int, per_page: int, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # 1件多く取って次のページの有無を判定する（一致件数は数えない）
+    return {
+        "query": q,
+        "order": order,
+        "page": page,
+        "per_page": per_page,
+        "has_more": len(rows) > per_page,
+        "results": rows[:per_page],
+    }
+
+
+def search_tickets(q: str, status: Optional[str] = None, page: int = 1, per_page: int = 20) -> Dict[str, Any]:
+    """チケットの質問文を検索"""
+    page, per_page = _page(page, per_page)
+    terms = _terms(q)
+    if not terms:
+        return _result(q, "recent", page, per_page, [])
+    limit, offset = per_page + 1, (page - 1) * per_page
+    status_sql = " AND t.status = ?" if status else ""
+    status_args: Tuple[Any, ...] = (status,) if status else ()
+    conn = get_conn()
+    match = _match_query(terms)
+    if match is not None:
+        order = "recent" if _too_common(conn, "tickets_fts", terms) else "rank"
+        rows = conn.execute(
+            f"""SELECT t.id, t.created_at, t.source, t.status, t.question,
+                       snippet(tickets_fts, 0, ?, ?, '…', 16) AS snippet
+                FROM tickets_fts JOIN tickets t ON t.rowid = tickets_fts.rowid
+                WHERE tickets_fts MATCH ?{status_sql}
+                ORDER BY {"tickets_fts.rank" if order == "rank" else "tickets_fts.rowid DESC"}
+                LIMIT ? OFFSET ?""",
+            (_OPEN, _CLOSE, match, *status_args, limit, offset),
+        ).fetchall()
+        results = [{**dict(r), "snippet": _marked_html(r["snippet"])} for r in rows]
+    else:
+        order = "recent"
+        likes = " AND ".join("t.question LIKE ? ESCAPE '\\'" for _ in terms)
+        rows = conn.execute(
+            f"""SELECT t.id, t.created_at, t.source, t.status, t.question FROM tickets t
+                WHERE {likes}{status_sql} ORDER BY t.rowid DESC LIMIT ? OFFSET ?""",
+            (*(_like(t) for t in terms), *status_args, limit, offset),
+        ).fetchall()
+        results = [{**dict(r), "snippet": _mark_terms(r["question"], terms, width=64)} for r in rows]
+    conn.close()
+    return _result(q, order, page, per_page, results)
+
+
+def search_onboardings(q: str, page: int = 1, per_page: int = 20) -> Dict[str, Any]:
+    """オンボーディングを入社者名・マネージャー名で検索"""
+    page, per_page = _page(page, per_page)
+    terms = _terms(q)
+    if not terms:
+        return _result(q, "recent", page, per_page, [])
+    limit, offset = per_page + 1, (page - 1) * per_page
+    conn = get_conn()
+    match = _match_query(terms)
+    if match is not None:
+        order = "recent" if _too_common(conn, "onboardings_fts", terms) else "rank"
+        rows = conn.execute(
+            f"""SELECT o.id, o.created_at, o.employee_name, o.manager_name, o.role, o.grade, o.start_date, o.status,
+                       highlight(onboardings_fts, 0, ?, ?) AS employee_hl,
+                       highlight(onboardings_fts, 1, ?, ?) AS manager_hl
+                FROM onboardings_fts JOIN onboarding_requests o ON o.rowid = onboardings_fts.rowid
+                WHERE onboardings_fts MATCH ?
+                ORDER BY {"onboardings_fts.rank" if order == "rank" else "onboardings_fts.rowid DESC"}
+                LIMIT ? OFFSET ?""",
+            (_OPEN, _CLOSE, _OPEN, _CLOSE, match, limit, offset),
+        ).fetchall()
+        results = []
+        for r in rows:
+            item = dict(r)
+            item["highlight"] = {
+                "employee_name": _marked_html(item.pop("employee_hl")),
+                "manager_name": _marked_html(item.pop("manager_hl")),
+            }
+            results.append(item)
+    else:
+        order = "recent"
+        likes = " AND ".join("(o.employee_name LIKE ? ESCAPE '\\' OR o.manager_name LIKE ? ESCAPE '\\')" for _ in terms)
+        rows = conn.execute(
+            f"""SELECT o.id, o.created_at, o.employee_name, o.manager_name, o.role, o.grade, o.start_date, o.status
+                FROM onboarding_requests o WHERE {likes} ORDER BY o.rowid DESC LIMIT ? OFFSET ?""",
+            (*(p for t in terms for p in (_like(t), _like(t))), limit, offset),
+        ).fetchall()
+        results = [
+            {**dict(r), "highlight": {
+                "employee_name": _mark_terms(r["employee_name"], terms),
+                "manager_name": _mark_terms(r["manager_name"], terms),
+            }}
+            for r in rows
+        ]
+    conn.close()
+    return _result(q, order, page, per_page, results)
+
+
+def _like(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def rebuild_index() -> None:
+    """FTS索引を元のテーブルから作り直す"""
+    conn = get_conn()
+    for fts in FTS_TABLES:
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('optimize')")
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+    with tenant_context(sys.argv[1] if len(sys.argv) > 1 else current_tenant.get()):
+        rebuild_index()
+    print(f"rebuilt {', '.join(FTS_TABLES)}")
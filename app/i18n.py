@@ -17,6 +17,13 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "home_start": "Start",
         "home_status": "Status",
         
+        "manager_title": "Onboardings by manager",
+        "manager_all": "All",
+        "manager_tasks_done": "Tasks done",
+        "manager_next_due": "Next due",
+        "manager_overdue": "Overdue",
+        "manager_no_records": "No onboardings for this manager.",
+        
         "create_title": "Create onboarding (mock)",
         "create_desc": "Simulates Slack modal input. Submit to create a PENDING request.",
         "create_employee_name": "Employee name",
@@ -61,6 +68,10 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "detail_owner": "Owner",
         "detail_task": "Task",
         "detail_done": "Done",
+        "detail_bulk_done": "Mark selected done",
+        "detail_bulk_undone": "Mark selected not done",
+        "detail_bulk_owner": "New owner",
+        "detail_bulk_reassign": "Reassign selected",
         
         "reject_title": "Reject onboarding",
         "reject_desc": "Simulates Slack \"Reject\" with a reason.",
@@ -76,6 +87,34 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "reminders_no_tasks": "No tasks found.",
         "reminders_last_reminded": "Last reminded",
         "reminders_dm_previews": "Reminder DM previews",
+        "reminders_digest_title": "Reminder: {count} task(s) due soon",
+        
+        "reports_title": "HR Reports",
+        "reports_period": "Last {days} days (since {since})",
+        "reports_days": "{days} days",
+        "reports_tickets": "Tickets",
+        "reports_created": "Created",
+        "reports_closed": "Closed",
+        "reports_avg_resolve": "Avg. time to resolve",
+        "reports_day": "Day",
+        "reports_source": "Source",
+        "reports_escalation_by_topic": "Escalation rate by QA topic",
+        "reports_no_questions": "No questions yet.",
+        "reports_topic": "Topic",
+        "reports_no_match": "(no match)",
+        "reports_questions": "Questions",
+        "reports_low_confidence": "Low confidence",
+        "reports_escalations": "Escalations",
+        "reports_rate": "Rate",
+        "reports_funnel": "Onboarding funnel by role",
+        "reports_no_onboardings": "No onboardings yet.",
+        "reports_role": "Role",
+        "reports_pending": "Pending",
+        "reports_approved": "Approved",
+        "reports_rejected": "Rejected",
+        "reports_approval_rate": "Approval rate",
+        "reports_tasks_done": "Tasks done",
+        "reports_cohorts": "Cohorts (by request date)",
         
         # Navigation
         "nav_home": "Home",
@@ -100,6 +139,13 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "home_start": "開始日",
         "home_status": "ステータス",
         
+        "manager_title": "マネージャーの担当オンボーディング",
+        "manager_all": "すべて",
+        "manager_tasks_done": "完了タスク",
+        "manager_next_due": "次の期限",
+        "manager_overdue": "期限切れ",
+        "manager_no_records": "このマネージャーのオンボーディングはありません。",
+        
         "create_title": "オンボーディング作成（モック）",
         "create_desc": "Slackモーダル入力をシミュレートします。送信してPENDINGリクエストを作成します。",
         "create_employee_name": "従業員名",
@@ -144,6 +190,10 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "detail_owner": "所有者",
         "detail_task": "タスク",
         "detail_done": "完了",
+        "detail_bulk_done": "選択したタスクを完了にする",
+        "detail_bulk_undone": "選択したタスクを未完了に戻す",
+        "detail_bulk_owner": "新しい担当者",
+        "detail_bulk_reassign": "選択したタスクの担当者を変更",
         
         "reject_title": "オンボーディング却下",
         "reject_desc": "理由付きでSlackの「却下」をシミュレートします。",
@@ -159,6 +209,34 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "reminders_no_tasks": "タスクが見つかりません。",
         "reminders_last_reminded": "最終リマインダー",
         "reminders_dm_previews": "リマインダーDMプレビュー",
+        "reminders_digest_title": "リマインダー: 期限が近いタスクが{count}件あります",
+        
+        "reports_title": "人事レポート",
+        "reports_period": "過去{days}日間（{since}以降）",
+        "reports_days": "{days}日",
+        "reports_tickets": "チケット",
+        "reports_created": "作成",
+        "reports_closed": "クローズ",
+        "reports_avg_resolve": "平均解決時間",
+        "reports_day": "日付",
+        "reports_source": "経路",
+        "reports_escalation_by_topic": "QAトピック別のエスカレーション率",
+        "reports_no_questions": "まだ質問がありません。",
+        "reports_topic": "トピック",
+        "reports_no_match": "（該当なし）",
+        "reports_questions": "質問数",
+        "reports_low_confidence": "低信頼度",
+        "reports_escalations": "エスカレーション",
+        "reports_rate": "率",
+        "reports_funnel": "役割別のオンボーディング状況",
+        "reports_no_onboardings": "まだオンボーディングがありません。",
+        "reports_role": "役割",
+        "reports_pending": "承認待ち",
+        "reports_approved": "承認",
+        "reports_rejected": "却下",
+        "reports_approval_rate": "承認率",
+        "reports_tasks_done": "完了タスク",
+        "reports_cohorts": "依頼日別のコホート",
         
         # Navigation
         "nav_home": "ホーム",
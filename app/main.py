@@ -1,37 +1,92 @@
 from __future__ import annotations
 
-from datetime import timedelta
-from typing import Any, Dict, List
+import asyncio
+import hmac
+import importlib
+import logging
+import os
+import uuid
+from typing import Any, Dict, List, Optional
 
 from fastapi import FastAPI, Request, Form, Query
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse, Response, StreamingResponse
 
-from app.db import init_db, get_conn
+from app.db import TENANTS, all_tenants, init_db, get_conn, get_versions, current_tenant
 from app.db.repo import (
     create_onboarding, get_onboarding, list_onboardings, set_status,
-    add_task, list_tasks, mark_done,
+    add_task, list_tasks, toggle_task, bulk_update_tasks, manager_portfolio,
     create_ticket, list_tickets, close_ticket
 )
 from app.services.template_engine import generate
 from app.services.qa_engine import process_question
-from app.chat.blocks import create_user_message, create_bot_response
-from app.utils.time import now_jst, parse_date
+from app.chat.renderer import ESCALATED, web_answer, web_answer_events
+from app.chat.stream import SESSION_COOKIE, chat_topic, new_session_id, session_ref
+from app.services.pubsub import BrokerFull, event_stream, get_broker
+from app.services import ticket_feed
+from app.services.metrics import METRICS_ENABLED, register_gauge, render_prometheus
+from app.services.request_metrics import MetricsMiddleware
+from app.services.tenancy import TenantMiddleware, slack_tenant
+from app.services.admission import ADMISSION_ENABLED, AdmissionMiddleware
+from app.services.idempotency import HEADER as IDEMPOTENCY_HEADER, IdempotencyError, clean_key, fingerprint, get_store as get_idempotency
+from app.services.profiler import MODES as PROFILE_MODES, ProfilerConfig, ProfilingRoute, profiler, stats_text
+from app.services.page_cache import conditional_page
+from app.services.reminders import build_digests
+from app.slack.client import SLACK_BOT_TOKEN, SLACK_SIGNING_SECRET, get_async_client, open_session, close_session
+from app.slack.delivery import DeliveryQueue, get_reminder_queue, set_reminder_queue
+from app.slack.outbox import SLACK_HR_CHANNEL_ID, OutboxDispatcher, get_dispatcher, set_dispatcher
+from app.utils.time import day_start_epoch, epoch, epoch_day, now_jst, parse_date
 from app.i18n import t
-
-# Slack Bolt統合（オプション）
-try:
-    from app.slack.bolt_app import handler
-    SLACK_ENABLED = handler is not None
-except ImportError:
-    SLACK_ENABLED = False
-    handler = None
-
-app = FastAPI(title="Onboarding Mock App", version="0.1.0")
-templates = Jinja2Templates(directory=str((__import__("pathlib").Path(__file__).parent / "templates")))
-
-# Inject t function into templates
-templates.env.globals["t"] = t
+from app.templating import LocalizedTemplates
+from app.db import archive
+from app.db.rollups import ROLLUP_FLUSH_SECONDS, flush_questions, report
+from app.db.search import MAX_PER_PAGE, search_onboardings, search_tickets
+from app.schemas import (
+    ChatAnswer, ChatAskRequest, ChatEscalateRequest, ChatEscalateResponse, ManagerPortfolio, OnboardingSearchPage, Report, TaskBulkResult,
+    TaskBulkUpdate, TaskState, TicketCloseResult, TicketSearchPage, body_schema, parse_body,
+)
+from app.utils.fastjson import FastJSONResponse
+
+logger = logging.getLogger(__name__)
+
+# Slack Bolt統合（オプション）。slack_boltは最初のSlackリクエストで読み込む（app.slack.bolt_app）
+SLACK_ENABLED = bool(SLACK_BOT_TOKEN and SLACK_SIGNING_SECRET)
+if not SLACK_ENABLED:
+    logger.warning("SLACK_BOT_TOKEN or SLACK_SIGNING_SECRET not set. Slack integration disabled.")
+_slack_bolt = None
+_slack_services: Optional[asyncio.Task] = None
+_rollup_flusher: Optional[asyncio.Task] = None
+
+SLACK_REMINDER_CHANNEL_ID = os.getenv("SLACK_REMINDER_CHANNEL_ID", "")
+# /admin/* のトークン（X-Admin-Tokenヘッダ）。未設定なら管理APIは無効
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# dictを返すルートもorjson（なければ標準のjson）でエンコードする
+app = FastAPI(title="Onboarding Mock App", version="0.1.0", default_response_class=FastJSONResponse)
+# 管理APIでプロファイラを有効にしたときだけエンドポイントを計測する
+app.router.route_class = ProfilingRoute
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+# チャット・Slackの流入制御（レート制限と同時実行数。超えたら429/503 + Retry-After）
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
+# 複数テナント: リクエストごとにテナント（DBファイル）を決める
+if TENANTS:
+    app.add_middleware(TenantMiddleware)
+register_gauge("sse_connections", lambda: get_broker().connections)
+# 言語ごとにt()を畳み込んでプリコンパイルしたテンプレート
+templates = LocalizedTemplates(directory=str((__import__("pathlib").Path(__file__).parent / "templates")))
+# チケット変更フィードで送る行のHTML（チケット画面は英語のみ）
+def _ticket_row(ticket: Dict[str, Any]) -> str:
+    return templates.get_template("_ticket_row.html", "en").render(ticket=ticket)
+
+ticket_feed.set_row_renderer(_ticket_row)
+
+@app.exception_handler(IdempotencyError)
+async def _idempotency_error(request: Request, exc: IdempotencyError):
+    return FastJSONResponse({"error": str(exc)}, status_code=exc.status)
+
+# 記録済みの結果を返したレスポンスに付けるヘッダ
+REPLAYED = {"Idempotent-Replayed": "true"}
 
 def get_lang(request: Request) -> str:
     """Determine language: query param > cookie > default 'en'"""
@@ -49,13 +104,76 @@ def get_lang(request: Request) -> str:
     return "en"
 
 @app.on_event("startup")
-def _startup() -> None:
-    init_db()
+async def _startup() -> None:
+    global _slack_services, _rollup_flusher
+    # スキーマが変わっていなければDDLは流さない（PRAGMA user_version）
+    # 全テナントを起動時に開く（outboxなどのバックグラウンド処理が、リクエストの来ていないテナントも回る）
+    for tenant in all_tenants():
+        init_db(tenant)
+    _rollup_flusher = asyncio.create_task(_flush_rollups())
+    # テンプレートは最初の表示でコンパイルされる。残りは起動後にスレッドで温める
+    asyncio.get_running_loop().run_in_executor(None, templates.warm)
+    if SLACK_BOT_TOKEN:
+        # slack_sdk / aiohttp の読み込みを待たずに起動を終える
+        _slack_services = asyncio.create_task(_start_slack_services())
+
+async def _flush_rollups() -> None:
+    """QAの質問数（メモリ）を定期的に集計テーブルへ書き込む"""
+    while True:
+        await asyncio.sleep(ROLLUP_FLUSH_SECONDS)
+        try:
+            await asyncio.to_thread(flush_questions)
+        except Exception:
+            logger.exception("failed to flush question rollups")
+
+async def _start_slack_services() -> None:
+    # slack_sdk / aiohttp の読み込みはスレッドで（イベントループを塞がない）
+    client = await asyncio.to_thread(get_async_client)
+    # 共有AsyncWebClientのコネクションプールを起動
+    await open_session()
+    # リマインダーのSlack配信（トークンと送信先チャンネルがある場合のみ）
+    if SLACK_REMINDER_CHANNEL_ID:
+        queue = DeliveryQueue(client)
+        await queue.start()
+        set_reminder_queue(queue)
+    # HRチャンネル通知のoutboxを送信（未送信分は再起動後も送られる）
+    if SLACK_HR_CHANNEL_ID:
+        dispatcher = OutboxDispatcher(client)
+        await dispatcher.start()
+        set_dispatcher(dispatcher)
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    # SSE接続を閉じる（開いたままだとグレースフルシャットダウンが終わらない）
+    get_broker().close_all()
+    if _rollup_flusher is not None:
+        _rollup_flusher.cancel()
+    await asyncio.to_thread(flush_questions)
+    if _slack_services is not None and not _slack_services.done():
+        await _slack_services
+    if _slack_bolt is not None:
+        # ack済みのバックグラウンド処理を完了させる
+        await _slack_bolt.background.drain()
+    dispatcher = get_dispatcher()
+    if dispatcher is not None:
+        await dispatcher.stop()
+        set_dispatcher(None)
+    queue = get_reminder_queue()
+    if queue is not None:
+        await queue.stop()
+        set_reminder_queue(None)
+    if SLACK_BOT_TOKEN:
+        await close_session()
 
 @app.get("/health")
 def health() -> Dict[str, str]:
     return {"status": "ok"}
 
+@app.get("/metrics")
+def metrics() -> PlainTextResponse:
+    """Prometheusのテキスト形式のメトリクス"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/set-lang")
 def set_lang(request: Request, lang: str = Query(...), next: str = Query("/")):
     """Set language cookie and redirect"""
@@ -69,14 +187,19 @@ def set_lang(request: Request, lang: str = Query(...), next: str = Query("/")):
 def home(request: Request):
     lang = get_lang(request)
     request.state.lang = lang
-    onboardings = list_onboardings()
-    return templates.TemplateResponse("home.html", {"request": request, "onboardings": onboardings, "lang": lang})
+
+    def render():
+        onboardings = list_onboardings()
+        return templates.TemplateResponse("home.html", {"request": request, "onboardings": onboardings, "lang": lang})
+
+    return conditional_page(request, lang, ("onboarding_requests",), render)
 
 @app.get("/onboard", response_class=HTMLResponse)
 def onboard_form(request: Request):
     lang = get_lang(request)
     request.state.lang = lang
-    return templates.TemplateResponse("create.html", {"request": request, "lang": lang})
+    # フォームの再送信（戻る・二重クリック）で同じオンボーディングを作らないためのキー
+    return templates.TemplateResponse("create.html", {"request": request, "lang": lang, "idempotency_key": uuid.uuid4().hex})
 
 @app.post("/onboard")
 def onboard_create(
@@ -87,16 +210,26 @@ def onboard_create(
     grade: str = Form(...),
     start_date: str = Form(...),
     lang: str = Form("en"),
+    idempotency_key: str = Form(""),
 ):
     if lang not in ("en", "ja"):
         lang = get_lang(request)
-    oid = create_onboarding(employee_name, manager_name, role, grade, start_date, lang)
-    return RedirectResponse(url=f"/onboarding/{oid}", status_code=303)
+    # Idempotency-Keyヘッダ（APIクライアント）またはフォームの隠しフィールド
+    oid, replayed = get_idempotency().run(
+        "onboard",
+        clean_key(request.headers.get(IDEMPOTENCY_HEADER) or idempotency_key),
+        fingerprint(employee_name, manager_name, role, grade, start_date, lang),
+        lambda: create_onboarding(employee_name, manager_name, role, grade, start_date, lang),
+    )
+    return RedirectResponse(url=f"/onboarding/{oid}", status_code=303, headers=REPLAYED if replayed else None)
 
 @app.get("/onboarding/{oid}", response_class=HTMLResponse)
 def onboarding_detail(request: Request, oid: str):
     lang = get_lang(request)
     request.state.lang = lang
+    return conditional_page(request, lang, ("onboarding_requests", "tasks"), lambda: _render_onboarding_detail(request, oid, lang))
+
+def _render_onboarding_detail(request: Request, oid: str, lang: str):
     onboarding = get_onboarding(oid)
     if not onboarding:
         return HTMLResponse("Not found", status_code=404)
@@ -143,6 +276,41 @@ def approve(request: Request, oid: str):
 
     return RedirectResponse(url=f"/onboarding/{oid}", status_code=303)
 
+STATUS_FILTER = "^(PENDING|APPROVED|REJECTED)$"
+
+def _portfolio(name: str, status: Optional[str]) -> Dict[str, Any]:
+    onboardings = manager_portfolio(name, status)
+    return {
+        "manager_name": name,
+        "today": now_jst().date().isoformat(),
+        "totals": {
+            "onboardings": len(onboardings),
+            "tasks_total": sum(o["tasks_total"] for o in onboardings),
+            "tasks_done": sum(o["tasks_done"] for o in onboardings),
+            "overdue": sum(o["overdue"] for o in onboardings),
+        },
+        "onboardings": onboardings,
+    }
+
+@app.get("/manager/{name}.json", response_model=ManagerPortfolio)
+def manager_json(name: str, status: Optional[str] = Query(None, pattern=STATUS_FILTER)):
+    """マネージャーの全オンボーディングの進み具合（タスク数・完了数・次の期限・期限切れ）"""
+    return FastJSONResponse(_portfolio(name, status))
+
+@app.get("/manager/{name}", response_class=HTMLResponse)
+def manager_view(request: Request, name: str, status: Optional[str] = Query(None, pattern=STATUS_FILTER)):
+    lang = get_lang(request)
+    request.state.lang = lang
+    today = now_jst().date()
+
+    def render():
+        return templates.TemplateResponse(
+            "manager.html", {"request": request, "portfolio": _portfolio(name, status), "status": status, "lang": lang}
+        )
+
+    # 期限切れ・次の期限は日付で変わるのでETagに含める
+    return conditional_page(request, lang, ("onboarding_requests", "tasks"), render, extra=today.isoformat())
+
 @app.get("/onboarding/{oid}/reject", response_class=HTMLResponse)
 def reject_form(request: Request, oid: str):
     lang = get_lang(request)
@@ -161,67 +329,91 @@ def reject_submit(oid: str, reason: str = Form(...)):
     return RedirectResponse(url=f"/onboarding/{oid}", status_code=303)
 
 @app.post("/tasks/{task_id}/toggle")
-def toggle_task(task_id: str, redirect_to: str = Form("/")):
-    conn = get_conn()
-    row = conn.execute("SELECT is_done FROM tasks WHERE id = ?", (task_id,)).fetchone()
-    conn.close()
-    if not row:
-        return RedirectResponse(url=redirect_to, status_code=303)
-    mark_done(task_id, not bool(row["is_done"]))
+def toggle_task_form(task_id: str, redirect_to: str = Form("/")):
+    """JavaScriptなしのフォーム用（切り替えてページに戻る）"""
+    toggle_task(task_id)
     return RedirectResponse(url=redirect_to, status_code=303)
 
+@app.post("/tasks/{task_id}/toggle.json", response_model=TaskState)
+def toggle_task_json(task_id: str):
+    """完了状態を切り替えて新しい状態を返す（画面はクライアント側で書き換える）"""
+    state = toggle_task(task_id)
+    if state is None:
+        return FastJSONResponse({"error": "task not found"}, status_code=404)
+    return FastJSONResponse(state)
+
+@app.post("/tasks/bulk", response_model=TaskBulkResult, openapi_extra=body_schema(TaskBulkUpdate))
+async def tasks_bulk(request: Request):
+    """複数タスクの完了・未完了 / 担当者の変更をまとめて行う"""
+    body = await parse_body(request, TaskBulkUpdate)
+    # 最大500件のUPDATEと集計の更新はスレッドで（イベントループを塞がない）
+    updated = await asyncio.to_thread(bulk_update_tasks, body.task_ids, body.is_done, body.owner)
+    return FastJSONResponse({"updated": updated})
+
 @app.get("/reminders", response_class=HTMLResponse)
 def reminders(request: Request):
     lang = get_lang(request)
     request.state.lang = lang
-    conn = get_conn()
     today = now_jst().date()
-    start = (today - timedelta(days=1)).isoformat()
-    end = (today + timedelta(days=7)).isoformat()
+
+    def render():
+        tasks = _reminder_window(today)
+        return templates.TemplateResponse("reminders.html", {"request": request, "tasks": tasks, "messages": [], "lang": lang})
+
+    # 表示期間は日付で変わるのでETagに含める
+    return conditional_page(request, lang, ("tasks",), render, extra=today.isoformat())
+
+def _reminder_window(today) -> List[Dict[str, Any]]:
+    """昨日から7日後までが期限のタスク（due_dayの索引で範囲検索）"""
+    day = epoch_day(today)
+    conn = get_conn()
     rows = conn.execute(
-        "SELECT * FROM tasks WHERE due_date BETWEEN ? AND ? ORDER BY due_date ASC",
-        (start, end),
+        "SELECT * FROM tasks WHERE due_day BETWEEN ? AND ? ORDER BY due_day ASC",
+        (day - 1, day + 7),
     ).fetchall()
     conn.close()
-    tasks = [dict(r) for r in rows]
-    return templates.TemplateResponse("reminders.html", {"request": request, "tasks": tasks, "messages": [], "lang": lang})
+    return [dict(r) for r in rows]
 
 @app.post("/reminders/run", response_class=HTMLResponse)
 def reminders_run(request: Request):
     lang = get_lang(request)
     request.state.lang = lang
     conn = get_conn()
-    today = now_jst().date()
-    targets = [(today + timedelta(days=d)).isoformat() for d in (7, 3, 0)]
+    now = now_jst()
+    today = now.date()
+    targets = [epoch_day(today) + d for d in (7, 3, 0)]
+    # 今日（JST）まだリマインドしていないもの
     rows = conn.execute(
-        f"SELECT * FROM tasks WHERE is_done = 0 AND due_date IN ({','.join('?' for _ in targets)})",
-        targets,
+        f"""SELECT * FROM tasks WHERE due_day IN ({','.join('?' for _ in targets)}) AND is_done = 0
+            AND (last_reminded_ts IS NULL OR last_reminded_ts < ?)""",
+        (*targets, day_start_epoch(today)),
     ).fetchall()
 
-    messages: List[Dict[str, Any]] = []
-    ts = now_jst().isoformat()
+    due: List[Dict[str, Any]] = [dict(r) for r in rows]
+    conn.executemany(
+        "UPDATE tasks SET last_reminded_at = ?, last_reminded_ts = ? WHERE id = ?",
+        [(now.isoformat(), epoch(now), r["id"]) for r in due],
+    )
 
-    for r in rows:
-        if r["last_reminded_at"] and r["last_reminded_at"][:10] == today.isoformat():
-            continue
-        # Use t function for reminder title
-        reminder_title = t("reminders_dm_previews", lang) if lang == "ja" else f"Reminder: {r['title']}"
-        messages.append({"to": r["owner"], "title": f"Reminder: {r['title']}", "body": f"Due: {r['due_date']} — {r['description']}"})
-        conn.execute("UPDATE tasks SET last_reminded_at = ? WHERE id = ?", (ts, r["id"]))
+    # 担当者ごとに1通のダイジェストにまとめる
+    messages = build_digests(due, lang)
 
     conn.commit()
     conn.close()
 
+    # Slack送信キューが起動していればダイジェストを送信
+    queue = get_reminder_queue()
+    if queue is not None:
+        for m in messages:
+            queue.submit(
+                "chat.postMessage",
+                channel=SLACK_REMINDER_CHANNEL_ID,
+                text=m["title"],
+                blocks=m["blocks"],
+            )
+
     # refresh list
-    conn = get_conn()
-    start = (today - timedelta(days=1)).isoformat()
-    end = (today + timedelta(days=7)).isoformat()
-    rows2 = conn.execute(
-        "SELECT * FROM tasks WHERE due_date BETWEEN ? AND ? ORDER BY due_date ASC",
-        (start, end),
-    ).fetchall()
-    conn.close()
-    tasks = [dict(r) for r in rows2]
+    tasks = _reminder_window(today)
 
     return templates.TemplateResponse("reminders.html", {"request": request, "tasks": tasks, "messages": messages, "lang": lang})
 
@@ -230,87 +422,285 @@ def chat(request: Request):
     """WebチャットUI"""
     lang = get_lang(request)
     request.state.lang = lang
-    return templates.TemplateResponse("chat.html", {"request": request, "lang": lang})
+    response = templates.TemplateResponse("chat.html", {"request": request, "lang": lang})
+    if not request.cookies.get(SESSION_COOKIE):
+        response.set_cookie(key=SESSION_COOKIE, value=new_session_id(), httponly=True, samesite="lax")
+    return response
 
-@app.post("/chat/ask")
+@app.get("/chat/stream")
+async def chat_stream(request: Request):
+    """チャットのSSEストリーム（セッションごとに1本。新しい接続が古い接続を置き換える）"""
+    session_id = request.cookies.get(SESSION_COOKIE)
+    if not session_id:
+        return Response(status_code=400)
+    broker = get_broker()
+    try:
+        sub = broker.subscribe(chat_topic(session_id), exclusive=True)
+    except BrokerFull:
+        return Response(status_code=503, headers={"Retry-After": "5"})
+    return StreamingResponse(
+        event_stream(broker, sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/chat/ask", response_model=ChatAnswer, openapi_extra=body_schema(ChatAskRequest))
 async def chat_ask(request: Request):
     """チャット質問を処理"""
-    from fastapi import Body
-    data = await request.json()
-    question = data.get("question", "")
-    
-    # QAエンジンで処理
-    qa_response = process_question(question)
-    
-    # Block Kit風のblocksを生成
-    blocks = create_bot_response(
-        text=qa_response.answer_text,
-        confidence=qa_response.confidence,
-        references=qa_response.references,
-        escalate=len(qa_response.suggested_actions) > 0
-    )
+    body = await parse_body(request, ChatAskRequest)
+    # QAエンジンで処理（画面の言語は回答言語のヒント）
+    qa_response = process_question(body.question, get_lang(request))
+
+    # ストリームが開いていればblocksをSSEで送り、POSTはすぐに返す
+    session_id = request.cookies.get(SESSION_COOKIE)
+    if body.stream and session_id:
+        if get_broker().publish(chat_topic(session_id), web_answer_events(qa_response)):
+            return Response(status_code=202)
     
-    return {"blocks": blocks}
+    # トピックごとにエンコード済みのBlock Kit風JSONをそのまま返す
+    return Response(content=web_answer(qa_response), media_type="application/json")
 
-@app.post("/chat/escalate")
+@app.post("/chat/escalate", response_model=ChatEscalateResponse, openapi_extra=body_schema(ChatEscalateRequest))
 async def chat_escalate(request: Request):
     """Escalate to HR（Webチャットから）"""
-    from fastapi import Body
-    data = await request.json()
-    question = data.get("question", "")
-    
-    ticket_id = create_ticket(
-        source="web",
-        question=question,
-        user_ref=None
+    body = await parse_body(request, ChatEscalateRequest)
+    # セッションの参照を記録し、クローズ時にストリームへ通知する
+    session_id = request.cookies.get(SESSION_COOKIE)
+
+    async def escalate() -> str:
+        # チケット作成（トランザクション・トピック判定・outbox）はスレッドで（イベントループを塞がない）
+        return await asyncio.to_thread(
+            create_ticket,
+            source="web",
+            question=body.question,
+            user_ref=session_ref(session_id) if session_id else None
+        )
+
+    # 同じIdempotency-Keyの再送は最初のチケットを返す
+    ticket_id, replayed = await get_idempotency().run_async(
+        "chat_escalate", clean_key(request.headers.get(IDEMPOTENCY_HEADER)), fingerprint(body.question), escalate
+    )
+    return Response(
+        content=ESCALATED.render(ticket_id=ticket_id), media_type="application/json", headers=REPLAYED if replayed else None
     )
-    
-    return {"ticket_id": ticket_id, "status": "escalated"}
 
 @app.get("/tickets", response_class=HTMLResponse)
 def tickets(request: Request):
     """チケット一覧（HR用）"""
     lang = get_lang(request)
     request.state.lang = lang
-    tickets_list = list_tickets()
-    return templates.TemplateResponse("tickets.html", {"request": request, "tickets": tickets_list, "lang": lang})
 
-@app.post("/tickets/{ticket_id}/close")
-def close_ticket_route(ticket_id: str):
-    """チケットをクローズ"""
-    close_ticket(ticket_id)
+    def render():
+        # 一覧より先にバージョンを読む（間に変更があればストリーム接続時にresyncになる）
+        version = get_versions(("tickets",)).get("tickets", 0)
+        tickets_list = list_tickets()
+        return templates.TemplateResponse("tickets.html", {"request": request, "tickets": tickets_list, "version": version, "lang": lang})
+
+    return conditional_page(request, lang, ("tickets",), render)
+
+@app.get("/tickets/stream")
+async def tickets_stream(request: Request, since: Optional[int] = Query(None)):
+    """チケットの変更フィード（SSE）。sinceは表示中のページのデータバージョン"""
+    broker = get_broker()
+    try:
+        sub = broker.subscribe(ticket_feed.topic())
+    except BrokerFull:
+        return Response(status_code=503, headers={"Retry-After": "5"})
+    # 再接続時はLast-Event-IDが最後に受け取ったバージョン
+    last_id = request.headers.get("last-event-id", "")
+    seen = int(last_id) if last_id.isdigit() else since
+    initial = b""
+    if seen is not None and seen != get_versions(("tickets",)).get("tickets", 0):
+        initial = ticket_feed.resync_frame()
+    return StreamingResponse(
+        event_stream(broker, sub, initial=initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/search/tickets", response_model=TicketSearchPage)
+def search_tickets_route(
+    q: str = Query(..., min_length=1, max_length=200),
+    status: Optional[str] = Query(None),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=MAX_PER_PAGE),
+):
+    """チケットの全文検索（関連度順、スニペット付き）"""
+    return FastJSONResponse(search_tickets(q, status, page, per_page))
+
+@app.get("/search/onboardings", response_model=OnboardingSearchPage)
+def search_onboardings_route(
+    q: str = Query(..., min_length=1, max_length=200),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=MAX_PER_PAGE),
+):
+    """入社者名・マネージャー名で検索"""
+    return FastJSONResponse(search_onboardings(q, page, per_page))
+
+@app.get("/reports", response_class=HTMLResponse)
+def reports(request: Request, days: int = Query(30, ge=1, le=366)):
+    """HRレポート（集計テーブルから。履歴の量に関係なく一定時間）"""
+    lang = get_lang(request)
+    request.state.lang = lang
+    return templates.TemplateResponse("reports.html", {"request": request, "report": report(days), "lang": lang})
+
+@app.get("/reports.json", response_model=Report)
+def reports_json(days: int = Query(30, ge=1, le=366)):
+    return FastJSONResponse(report(days))
+
+@app.get("/archive/{kind}/{record_id}")
+def archive_lookup(kind: str, record_id: str):
+    """アーカイブ済みのチケット / オンボーディング（タスク付き）をidで取得（読み取り専用）"""
+    if kind not in archive.KINDS:
+        return Response(status_code=404)
+    record = archive.lookup(kind, record_id)
+    if record is None:
+        return FastJSONResponse({"error": "not archived"}, status_code=404)
+    return FastJSONResponse(record)
+
+@app.post("/tickets/{ticket_id}/close", response_model=TicketCloseResult)
+def close_ticket_route(request: Request, ticket_id: str):
+    """チケットをクローズ（fetchからは Accept: application/json で新しい状態と行のHTMLを返す。フォームはリダイレクト）"""
+    ticket = close_ticket(ticket_id)
+    if "application/json" in request.headers.get("accept", ""):
+        if ticket is None:
+            return FastJSONResponse({"error": "ticket not found"}, status_code=404)
+        return FastJSONResponse({"id": ticket["id"], "status": ticket["status"], "row": _ticket_row(ticket)})
     return RedirectResponse(url="/tickets", status_code=303)
 
+def _admin_denied(request: Request) -> Optional[Response]:
+    """管理APIのトークンを確認（問題なければNone）"""
+    if not ADMIN_TOKEN:
+        return Response(status_code=404)
+    if not hmac.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        return Response(status_code=403)
+    return None
+
+@app.get("/admin/profiler")
+def profiler_status(request: Request):
+    """プロファイラの設定と保存済みプロファイルの一覧"""
+    denied = _admin_denied(request)
+    if denied:
+        return denied
+    config = profiler.config
+    return {"config": config.__dict__ if config else None, "profiles": profiler.list()}
+
+@app.post("/admin/profiler")
+async def profiler_enable(request: Request):
+    """プロファイラを有効化 {"mode": "cprofile"|"stack", "every": N} または {"path": "/chat/ask"}（"count"で件数を制限）"""
+    denied = _admin_denied(request)
+    if denied:
+        return denied
+    data = await request.json()
+    mode = data.get("mode", "cprofile")
+    every = int(data.get("every") or 0)
+    path = data.get("path") or ""
+    count = data.get("count")
+    if mode not in PROFILE_MODES or (every < 1 and not path):
+        return FastJSONResponse({"error": "mode must be cprofile|stack and one of every>=1 or path is required"}, status_code=400)
+    config = ProfilerConfig(mode=mode, every=every, path=path, remaining=int(count) if count else None)
+    profiler.configure(config)
+    return {"config": config.__dict__}
+
+@app.delete("/admin/profiler")
+def profiler_disable(request: Request):
+    denied = _admin_denied(request)
+    if denied:
+        return denied
+    profiler.configure(None)
+    return {"config": None}
+
+@app.get("/admin/profiles/{profile_id}")
+def profile_download(request: Request, profile_id: int, format: str = Query("pstats")):
+    """プロファイルのダウンロード（pstats: snakeviz等で開く / text: 上位の関数 / collapsed: flamegraph用）"""
+    denied = _admin_denied(request)
+    if denied:
+        return denied
+    profile = profiler.get(profile_id)
+    if profile is None:
+        return Response(status_code=404)
+    if format == "pstats" and profile.stats is not None:
+        return Response(
+            profile.stats,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.pstats"'},
+        )
+    if format == "text" and profile.stats is not None:
+        return PlainTextResponse(stats_text(profile))
+    if format == "collapsed" and profile.collapsed is not None:
+        return PlainTextResponse(profile.collapsed)
+    return FastJSONResponse({"error": "format not available", "formats": profile.summary()["formats"]}, status_code=404)
+
+@app.post("/admin/archive")
+async def archive_run(request: Request):
+    """古い行をアーカイブ {"tickets_days": N, "onboardings_days": N, "vacuum": "incremental"|"full"|"none"}"""
+    denied = _admin_denied(request)
+    if denied:
+        return denied
+    data = await request.json() if await request.body() else {}
+    vacuum_mode = data.get("vacuum", "incremental")
+    if vacuum_mode not in archive.VACUUM_MODES:
+        return FastJSONResponse({"error": f"vacuum must be one of {', '.join(archive.VACUUM_MODES)}"}, status_code=400)
+    result = await asyncio.to_thread(
+        archive.run,
+        int(data.get("tickets_days", archive.ARCHIVE_TICKETS_DAYS)),
+        int(data.get("onboardings_days", archive.ARCHIVE_ONBOARDINGS_DAYS)),
+        vacuum_mode,
+    )
+    return FastJSONResponse(result)
+
 # Slack Events API endpoints
 if SLACK_ENABLED:
-    @app.post("/slack/events")
-    async def slack_events(request: Request):
-        """Slack Events API endpoint"""
-        return await handler.handle(request)
-    
-    @app.post("/slack/interactive")
-    async def slack_interactive(request: Request):
-        """Slack Interactive Components endpoint"""
-        return await handler.handle(request)
-    
-    @app.post("/slack/commands")
-    async def slack_commands(request: Request):
-        """Slack Slash Commands endpoint"""
-        return await handler.handle(request)
+    from app.slack.dedup import SlackDeduplicator, build_store
+
+    _slack_dedup = None
+    _slack_lock = asyncio.Lock()
+
+    async def _load_slack_bolt():
+        """最初のSlackリクエストでslack_boltを読み込む（読み込みはスレッドで）"""
+        global _slack_bolt
+        async with _slack_lock:
+            if _slack_bolt is None:
+                _slack_bolt = await asyncio.to_thread(importlib.import_module, "app.slack.bolt_app")
+        return _slack_bolt
+
+    async def _handle_slack(request: Request):
+        """署名を検証し、再送・重複配信はBoltに渡す前に200で捨てる"""
+        global _slack_dedup
+        if _slack_dedup is None:
+            _slack_dedup = SlackDeduplicator(build_store(), SLACK_SIGNING_SECRET)
+        body = await request.body()
+        # Boltは署名を再検証しない（bolt_app.py）
+        if not _slack_dedup.verify(body, request.headers):
+            return Response(status_code=401)
+        if TENANTS:
+            # ワークスペース（team_id）のテナントで重複チェックとBoltの処理を行う
+            current_tenant.set(slack_tenant(body, request.headers.get("content-type", "")))
+        duplicate, key = await _slack_dedup.claim_request(request)
+        if duplicate:
+            return Response(status_code=200, headers={"X-Slack-No-Retry": "1"})
+        bolt = _slack_bolt or await _load_slack_bolt()
+        try:
+            response = await bolt.handler.handle(request)
+        except BaseException:
+            await _slack_dedup.forget(key)
+            raise
+        if response.status_code >= 300:
+            # 処理できなかった配信は記録しない（Slackの再送を受け付ける）
+            await _slack_dedup.forget(key)
+        return response
 
-# Slack Events API endpoint
-if SLACK_ENABLED:
     @app.post("/slack/events")
     async def slack_events(request: Request):
         """Slack Events API endpoint"""
-        return await handler.handle(request)
+        return await _handle_slack(request)
     
     @app.post("/slack/interactive")
     async def slack_interactive(request: Request):
         """Slack Interactive Components endpoint"""
-        return await handler.handle(request)
+        return await _handle_slack(request)
     
     @app.post("/slack/commands")
     async def slack_commands(request: Request):
         """Slack Slash Commands endpoint"""
-        return await handler.handle(request)
+        return await _handle_slack(request)
@@ -0,0 +1,200 @@
+"""
+JSON APIのリクエスト・レスポンスモデル
+リクエストは parse_body() でボディのJSONを直接検証する（不正な形はFastAPIと同じ422）
+FastAPIのボディ引数はdictを経由するため1リクエストあたり約25us重い（python -m bench.json_codec）
+レスポンスはエンコード済みのバイト列や FastJSONResponse で返すため、レスポンスモデルはドキュメント（OpenAPI）用
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Type, TypeVar
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, Field, ValidationError, model_validator
+
+M = TypeVar("M", bound=BaseModel)
+
+# 一括更新で一度に指定できるタスク数
+BULK_MAX_TASKS = 500
+
+
+class ChatAskRequest(BaseModel):
+    question: str = ""
+    stream: bool = False  # SSEストリームが開いていれば回答はストリームで送る（202）
+
+
+class ChatAnswer(BaseModel):
+    blocks: List[Dict[str, Any]]
+
+
+class ChatEscalateRequest(BaseModel):
+    question: str = ""
+
+
+class ChatEscalateResponse(BaseModel):
+    ticket_id: str
+    status: str = "escalated"
+
+
+class TaskState(BaseModel):
+    id: str
+    is_done: bool
+    owner: Optional[str] = None
+
+
+class TaskBulkUpdate(BaseModel):
+    """複数タスクの完了状態・担当者をまとめて変更"""
+    task_ids: List[str] = Field(min_length=1, max_length=BULK_MAX_TASKS)
+    is_done: Optional[bool] = None
+    owner: Optional[str] = Field(default=None, min_length=1)
+
+    @model_validator(mode="after")
+    def _has_change(self) -> "TaskBulkUpdate":
+        if self.is_done is None and self.owner is None:
+            raise ValueError("is_done or owner is required")
+        return self
+
+
+class TaskBulkResult(BaseModel):
+    updated: int
+
+
+class TicketCloseResult(BaseModel):
+    id: str
+    status: str
+    row: str  # チケット一覧の行のHTML（_ticket_row.html）
+
+
+async def parse_body(request: Request, model: Type[M]) -> M:
+    """ボディのJSONをモデルで検証"""
+    try:
+        return model.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)])
+
+
+def body_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """parse_body()を使うルートのOpenAPI用（openapi_extraに渡す）"""
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": model.model_json_schema()}}}}
+
+
+class TicketHit(BaseModel):
+    id: str
+    created_at: str
+    source: str
+    status: str
+    question: str
+    snippet: str  # HTMLエスケープ済み、一致箇所は<mark>
+
+
+class TicketSearchPage(BaseModel):
+    query: str
+    order: str  # "rank"（bm25）または "recent"（一致が多すぎる語・短い語）
+    page: int
+    per_page: int
+    has_more: bool
+    results: List[TicketHit]
+
+
+class OnboardingHit(BaseModel):
+    id: str
+    created_at: str
+    employee_name: str
+    manager_name: str
+    role: str
+    grade: str
+    start_date: str
+    status: str
+    highlight: Dict[str, str]  # employee_name / manager_name（HTMLエスケープ済み、一致箇所は<mark>）
+
+
+class OnboardingSearchPage(BaseModel):
+    query: str
+    order: str
+    page: int
+    per_page: int
+    has_more: bool
+    results: List[OnboardingHit]
+
+
+class TicketDay(BaseModel):
+    day: str
+    source: str
+    created: int
+    closed: int
+    resolve_seconds: float
+
+
+class TicketReport(BaseModel):
+    created: int
+    closed: int
+    avg_resolve_hours: Optional[float]
+    by_source: Dict[str, Dict[str, int]]
+    daily: List[TicketDay]
+
+
+class TopicReport(BaseModel):
+    topic: str  # KBにマッチしなかった質問は "_none"
+    asks: int
+    low_confidence: int
+    escalations: int
+    escalation_rate: Optional[float]  # escalations / asks
+
+
+class FunnelReport(BaseModel):
+    role: str
+    pending: int
+    approved: int
+    rejected: int
+    tasks_total: int
+    tasks_done: int
+    approval_rate: Optional[float]
+    task_completion: Optional[float]
+
+
+class CohortDay(BaseModel):
+    day: str  # オンボーディングの作成日
+    pending: int
+    approved: int
+    rejected: int
+
+
+class Report(BaseModel):
+    days: int
+    since: str
+    tickets: TicketReport
+    topics: List[TopicReport]
+    funnel: List[FunnelReport]
+    cohorts: List[CohortDay]
+
+
+class NextDueTask(BaseModel):
+    title: str
+    due_date: str
+
+
+class ManagerOnboarding(BaseModel):
+    id: str
+    employee_name: str
+    role: str
+    grade: str
+    start_date: str
+    status: str
+    created_at: str
+    tasks_total: int
+    tasks_done: int
+    overdue: int
+    next_due: Optional[NextDueTask] = None
+
+
+class ManagerTotals(BaseModel):
+    onboardings: int
+    tasks_total: int
+    tasks_done: int
+    overdue: int
+
+
+class ManagerPortfolio(BaseModel):
+    manager_name: str
+    today: str
+    totals: ManagerTotals
+    onboardings: List[ManagerOnboarding]
@@ -0,0 +1,290 @@
+"""
+チャット・Slackのエンドポイントの流入制御（ロードシェディング）
+対象: POST /chat/ask, /chat/escalate, /slack/*
+1. レート制限（トークンバケット）: Webはクライアントごと + 全体、Slackは専用のバケット（Webのバーストで枯れない）
+   超えたら 429 + Retry-After
+2. 同時実行数の制限: ADMISSION_MAX_CONCURRENCY まで。空きを待つ時間が予算（ADMISSION_QUEUE_MS）を超えそうなら
+   待たずに 503 + Retry-After（待ち行列が伸びて全員が遅くなるより、早く断る）
+Slackは優先レーン: 3秒以内にackが必要なので、ADMISSION_SLACK_RESERVED 枠はSlack専用、空きは先にSlackへ回し、
+待ち時間の予算も長い（ADMISSION_SLACK_QUEUE_MS）
+状態はプロセス内。ADMISSION_STORE=sqlite でレート制限のバケットを ADMISSION_DB_PATH で全ワーカー共有する
+（同時実行数はワーカーごと）
+"""
+from __future__ import annotations
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.db import DB_PATH
+from app.services.metrics import inc, observe, register_gauge
+from app.utils.ratelimit import TokenBucket
+from app.utils.ttlcache import TTLCache
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# 0で無効化（ベンチマーク用）
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") != "0"
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "32"))
+ADMISSION_SLACK_RESERVED = int(os.getenv("ADMISSION_SLACK_RESERVED", "4"))
+ADMISSION_QUEUE_MS = float(os.getenv("ADMISSION_QUEUE_MS", "500"))
+ADMISSION_SLACK_QUEUE_MS = float(os.getenv("ADMISSION_SLACK_QUEUE_MS", "2000"))
+# 1秒あたりのリクエスト数とバースト
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", "200"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "400"))
+ADMISSION_CLIENT_RATE = float(os.getenv("ADMISSION_CLIENT_RATE", "2"))
+ADMISSION_CLIENT_BURST = float(os.getenv("ADMISSION_CLIENT_BURST", "10"))
+ADMISSION_SLACK_RATE = float(os.getenv("ADMISSION_SLACK_RATE", "50"))
+ADMISSION_SLACK_BURST = float(os.getenv("ADMISSION_SLACK_BURST", "100"))
+# 前段の信頼できるプロキシの数。0ならX-Forwarded-Forは見ない（クライアントが自由に書けるため）
+# N>0なら右からN番目（一番外側の信頼できるプロキシが付けた接続元）をクライアントとする
+ADMISSION_TRUSTED_PROXIES = int(os.getenv("ADMISSION_TRUSTED_PROXIES", "0"))
+# memory: ワーカーごと / sqlite: 全ワーカー共有
+ADMISSION_STORE = os.getenv("ADMISSION_STORE", "memory")
+ADMISSION_DB_PATH = Path(os.getenv("ADMISSION_DB_PATH") or DB_PATH.parent / "admission.db")
+
+WEB = "web"
+SLACK = "slack"
+PATHS = ("/chat/ask", "/chat/escalate")
+SLACK_PREFIX = "/slack/"
+
+
+def lane_for(scope: Scope) -> Optional[str]:
+    """対象のリクエストならレーン名、対象外ならNone"""
+    if scope["type"] != "http" or scope["method"] != "POST":
+        return None
+    path = scope["path"]
+    if path.startswith(SLACK_PREFIX):
+        return SLACK
+    return WEB if path in PATHS else None
+
+
+def client_key(scope: Scope, trusted_proxies: int = ADMISSION_TRUSTED_PROXIES) -> str:
+    """信頼できるプロキシが付けたX-Forwarded-For > 接続元アドレス
+    クライアントが自由に決められる値（X-Forwarded-Forの左側、chat_sid クッキー）は使わない
+    （書き換えるたびに新しいバケットになってしまう。クッキーは署名しても GET /chat で何度でも取り直せる）"""
+    hops: List[str] = []
+    for name, value in scope.get("headers", ()):
+        if name == b"x-forwarded-for" and trusted_proxies > 0:
+            hops.extend(h.strip() for h in value.decode("latin-1").split(","))
+    hops = [h for h in hops if h]
+    if hops:
+        # 経由したプロキシが設定より少なければ、最初のプロキシが付けた値（一番左）
+        return "ip:" + hops[-min(trusted_proxies, len(hops))]
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "-")
+
+
+class MemoryBuckets:
+    """プロセス内のトークンバケット（クライアントごとのバケットは使われなくなったら消える）"""
+
+    def __init__(self) -> None:
+        self._shared = {
+            WEB: TokenBucket(ADMISSION_RATE, ADMISSION_BURST),
+            SLACK: TokenBucket(ADMISSION_SLACK_RATE, ADMISSION_SLACK_BURST),
+        }
+        self._clients = TTLCache(maxsize=50000, ttl=max(60.0, ADMISSION_CLIENT_BURST / ADMISSION_CLIENT_RATE))
+
+    def try_acquire(self, lane: str, client: Optional[str]) -> Tuple[float, str]:
+        """(待つべき秒数, 理由)。0なら通してよい"""
+        if client is not None:
+            bucket = self._clients.get(client)
+            if bucket is None:
+                bucket = TokenBucket(ADMISSION_CLIENT_RATE, ADMISSION_CLIENT_BURST)
+                self._clients.set(client, bucket)
+            wait = bucket.try_acquire()
+            if wait > 0:
+                return wait, "client_rate"
+        return self._shared[lane].try_acquire(), "rate"
+
+
+class SqliteBuckets:
+    """複数ワーカー用: バケットを1行に持ち、補充と取得を1つのUPSERTで行う"""
+
+    def __init__(self, path: Path = ADMISSION_DB_PATH, purge_every: int = 1000) -> None:
+        self.path = path
+        self.purge_every = purge_every
+        self._calls = 0
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS admission_buckets "
+            "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) WITHOUT ROWID"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _take(self, conn: sqlite3.Connection, key: str, rate: float, capacity: float, now: float) -> float:
+        row = conn.execute(
+            """INSERT INTO admission_buckets (key, tokens, updated) VALUES (:key, :capacity - 1, :now)
+               ON CONFLICT(key) DO UPDATE
+                  SET tokens = min(:capacity, tokens + (:now - updated) * :rate) - 1, updated = :now
+                  WHERE min(:capacity, tokens + (:now - updated) * :rate) >= 1
+               RETURNING tokens""",
+            {"key": key, "rate": rate, "capacity": capacity, "now": now},
+        ).fetchone()
+        if row is not None:
+            return 0.0
+        tokens, updated = conn.execute(
+            "SELECT tokens, updated FROM admission_buckets WHERE key = ?", (key,)
+        ).fetchone()
+        return (1 - min(capacity, tokens + (now - updated) * rate)) / rate
+
+    def try_acquire(self, lane: str, client: Optional[str]) -> Tuple[float, str]:
+        conn = self._conn()
+        now = time.time()
+        self._calls += 1
+        if self._calls % self.purge_every == 0:
+            # 満タンに戻ったバケットは行がなくても同じ
+            conn.execute("DELETE FROM admission_buckets WHERE updated < ?", (now - 3600,))
+        if client is not None:
+            wait = self._take(conn, f"client:{client}", ADMISSION_CLIENT_RATE, ADMISSION_CLIENT_BURST, now)
+            if wait > 0:
+                return wait, "client_rate"
+        if lane == SLACK:
+            return self._take(conn, "lane:slack", ADMISSION_SLACK_RATE, ADMISSION_SLACK_BURST, now), "rate"
+        return self._take(conn, "lane:web", ADMISSION_RATE, ADMISSION_BURST, now), "rate"
+
+
+class ConcurrencyLimiter:
+    """同時実行数の制限。空きはSlackの待ちに先に渡し、Webは reserved 枠を残して使う"""
+
+    def __init__(self, limit: int = ADMISSION_MAX_CONCURRENCY, reserved: int = ADMISSION_SLACK_RESERVED) -> None:
+        self.limit = limit
+        self.reserved = min(reserved, limit - 1)
+        self.active = 0
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {SLACK: deque(), WEB: deque()}
+        # 1リクエストが枠を持つ時間の移動平均（待ち時間の見積もり用）
+        self._service = 0.01
+
+    def _slots(self, lane: str) -> int:
+        return self.limit if lane == SLACK else self.limit - self.reserved
+
+    def queued(self) -> int:
+        return len(self._waiters[SLACK]) + len(self._waiters[WEB])
+
+    def estimated_wait(self, lane: str) -> float:
+        ahead = len(self._waiters[SLACK]) + (len(self._waiters[WEB]) if lane == WEB else 0)
+        return (ahead + 1) * self._service / self._slots(lane)
+
+    async def acquire(self, lane: str, budget: float) -> float:
+        """枠を取れたら0、予算内に取れなければ再試行までの目安の秒数"""
+        ahead = len(self._waiters[SLACK]) + (0 if lane == SLACK else len(self._waiters[WEB]))
+        if not ahead and self.active < self._slots(lane):
+            self.active += 1
+            return 0.0
+        estimate = self.estimated_wait(lane)
+        if estimate > budget:
+            return estimate
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future = loop.create_future()
+        self._waiters[lane].append(fut)
+        timer = loop.call_later(budget, self._expire, lane, fut)
+        try:
+            admitted = await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled() and fut.result():
+                self.release(0.0)
+            else:
+                self._discard(lane, fut)
+            raise
+        finally:
+            timer.cancel()
+        return 0.0 if admitted else max(estimate, budget)
+
+    def _discard(self, lane: str, fut: asyncio.Future) -> None:
+        try:
+            self._waiters[lane].remove(fut)
+        except ValueError:
+            pass
+
+    def _expire(self, lane: str, fut: asyncio.Future) -> None:
+        if not fut.done():
+            fut.set_result(False)
+            self._discard(lane, fut)
+
+    def release(self, held: float) -> None:
+        """枠を返す（待っているリクエストがあればそのまま渡す）"""
+        if held > 0:
+            self._service += (held - self._service) * 0.1
+        self.active -= 1
+        for lane in (SLACK, WEB):
+            waiters = self._waiters[lane]
+            while waiters and self.active < self._slots(lane):
+                fut = waiters.popleft()
+                if fut.done():
+                    continue
+                self.active += 1
+                fut.set_result(True)
+
+
+def _reject(status: int, retry_after: float, error: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    body = ('{"error":"%s"}' % error).encode()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+    ]
+    return {"type": "http.response.start", "status": status, "headers": headers}, {"type": "http.response.body", "body": body}
+
+
+def build_buckets():
+    if ADMISSION_STORE == "sqlite":
+        return SqliteBuckets()
+    return MemoryBuckets()
+
+
+class AdmissionMiddleware:
+    def __init__(self, app: Callable[[Scope, Receive, Send], Awaitable[None]]) -> None:
+        self.app = app
+        self.buckets = build_buckets()
+        self.limiter = ConcurrencyLimiter()
+        self._shared_store = isinstance(self.buckets, SqliteBuckets)
+        register_gauge("admission_in_flight", lambda: self.limiter.active)
+        register_gauge("admission_queued", lambda: self.limiter.queued())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        lane = lane_for(scope)
+        if lane is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = client_key(scope) if lane == WEB else None
+        if self._shared_store:
+            wait, reason = await asyncio.to_thread(self.buckets.try_acquire, lane, client)
+        else:
+            wait, reason = self.buckets.try_acquire(lane, client)
+        if wait > 0:
+            inc("admission_rejected_total", lane=lane, reason=reason)
+            for message in _reject(429, wait, "rate limited"):
+                await send(message)
+            return
+
+        started = time.perf_counter()
+        budget = (ADMISSION_SLACK_QUEUE_MS if lane == SLACK else ADMISSION_QUEUE_MS) / 1000
+        wait = await self.limiter.acquire(lane, budget)
+        if wait > 0:
+            inc("admission_rejected_total", lane=lane, reason="queue")
+            for message in _reject(503, wait, "overloaded"):
+                await send(message)
+            return
+        admitted = time.perf_counter()
+        observe("admission_queue_seconds", admitted - started, lane=lane)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(time.perf_counter() - admitted)
@@ -0,0 +1,140 @@
+"""
+書き込みAPIの冪等キー（Idempotency-Key）
+同じキーのリクエストは最初の結果を返し、書き込み（チケット・オンボーディングの作成）を繰り返さない
+- キーは (テナント, 操作, クライアントのキー)。件数上限とTTL付きのメモリ内ストア（ワーカーごと）
+- 最初のリクエストの処理中に同じキーが来たら、完了を待ってその結果を返す
+- 同じキーで内容の違うリクエストは 422（キーの使い回しの誤り）
+- 処理が例外で終わったらキーは記録しない（再試行できる）
+"""
+from __future__ import annotations
+import asyncio
+import hashlib
+import os
+import threading
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+from app.db import current_tenant
+from app.services.metrics import inc
+from app.utils.ttlcache import TTLCache
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_MAX = int(os.getenv("IDEMPOTENCY_MAX", "10000"))
+# 処理中の同じキーの完了を待つ上限（秒）
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", "10"))
+
+HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyError(Exception):
+    """キーの誤用（status: 400 長すぎる / 409 処理中のまま / 422 内容が違う）"""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class _Entry:
+    def __init__(self, fingerprint: str) -> None:
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.result: Any = None
+        self.ok = False
+
+
+def fingerprint(*parts: Any) -> str:
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def clean_key(key: Optional[str]) -> Optional[str]:
+    """空ならNone、長すぎれば400"""
+    key = (key or "").strip()
+    if not key:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyError(400, f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+    return key
+
+
+class IdempotencyStore:
+    def __init__(self, maxsize: int = IDEMPOTENCY_MAX, ttl: float = IDEMPOTENCY_TTL) -> None:
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def _claim(self, key: Hashable, fp: str) -> Tuple[_Entry, bool]:
+        """(エントリ, 自分が最初か)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry(fp)
+                self._entries.set(key, entry)
+                return entry, True
+        if entry.fingerprint != fp:
+            raise IdempotencyError(422, "Idempotency-Key was already used for a different request")
+        return entry, False
+
+    def _finish(self, key: Hashable, entry: _Entry, ok: bool, result: Any = None) -> None:
+        entry.result, entry.ok = result, ok
+        if not ok:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._entries.pop(key)
+        entry.done.set()
+
+    @staticmethod
+    def _replay(entry: _Entry, operation: str) -> Any:
+        if not entry.done.is_set():
+            raise IdempotencyError(409, "A request with this Idempotency-Key is still in progress")
+        if not entry.ok:
+            raise IdempotencyError(409, "The original request with this Idempotency-Key failed; retry")
+        inc("idempotent_replays_total", operation=operation)
+        return entry.result
+
+    def run(self, operation: str, key: Optional[str], fp: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """fn() の結果と、記録済みの結果を返したか。keyがNoneならそのまま実行"""
+        if key is None:
+            return fn(), False
+        full_key = (current_tenant.get(), operation, key)
+        entry, first = self._claim(full_key, fp)
+        if not first:
+            entry.done.wait(IDEMPOTENCY_WAIT)
+            return self._replay(entry, operation), True
+        try:
+            result = fn()
+        except BaseException:
+            self._finish(full_key, entry, False)
+            raise
+        self._finish(full_key, entry, True, result)
+        return result, False
+
+    async def run_async(
+        self, operation: str, key: Optional[str], fp: str, fn: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """非同期版（fnはコルーチン関数。処理中の重複の完了はスレッドで待つ）"""
+        if key is None:
+            return await fn(), False
+        full_key = (current_tenant.get(), operation, key)
+        entry, first = self._claim(full_key, fp)
+        if not first:
+            await asyncio.to_thread(entry.done.wait, IDEMPOTENCY_WAIT)
+            return self._replay(entry, operation), True
+        try:
+            result = await fn()
+        except BaseException:
+            self._finish(full_key, entry, False)
+            raise
+        self._finish(full_key, entry, True, result)
+        return result, False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_store: Optional[IdempotencyStore] = None
+
+
+def get_store() -> IdempotencyStore:
+    global _store
+    if _store is None:
+        _store = IdempotencyStore()
+    return _store
@@ -0,0 +1,133 @@
+"""
+プロセス内メトリクス（カウンタ・ヒストグラム）
+"""
+from __future__ import annotations
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# 0でリクエスト計測・DB計測を無効化（ベンチマークでの比較用）
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# 秒単位のヒストグラムのバケット上限
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)  # 最後は+Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[LabelKey, float]] = {}
+_histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+# 出力時に値を読むゲージ（接続数など）
+_gauges: Dict[str, Callable[[], float]] = {}
+
+
+def _key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels: str) -> None:
+    """カウンタを加算"""
+    key = _key(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0.0) + value
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    """ヒストグラムに値を記録"""
+    key = _key(labels)
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        hist = series.get(key)
+        if hist is None:
+            hist = series[key] = Histogram()
+        hist.observe(value)
+
+
+@contextmanager
+def timed(name: str, **labels: str) -> Iterator[None]:
+    """ブロックの所要時間（秒）をヒストグラムに記録（async関数内でも使える）"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def register_gauge(name: str, read: Callable[[], float]) -> None:
+    """/metrics の出力時にread()の値を返すゲージを登録"""
+    _gauges[name] = read
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key: LabelKey, le: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in key]
+    if le:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus() -> str:
+    """Prometheusのテキスト形式（0.0.4）で全メトリクスを出力"""
+    lines: List[str] = []
+    with _lock:
+        for name in sorted(_counters):
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(_counters[name].items()):
+                lines.append(f"{name}{_labels(key)} {_num(value)}")
+        for name in sorted(_histograms):
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in sorted(_histograms[name].items(), key=lambda kv: kv[0]):
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(key, str(bound))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(key, '+Inf')} {hist.count}")
+                lines.append(f"{name}_sum{_labels(key)} {_num(hist.sum)}")
+                lines.append(f"{name}_count{_labels(key)} {hist.count}")
+    for name in sorted(_gauges):
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {_num(_gauges[name]())}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot() -> Dict[str, Dict[str, object]]:
+    """現在値のコピー（デバッグ・テスト用）"""
+    with _lock:
+        return {
+            "counters": {name: dict(series) for name, series in _counters.items()},
+            "histograms": {
+                name: {k: {"count": h.count, "sum": h.sum} for k, h in series.items()}
+                for name, series in _histograms.items()
+            },
+        }
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
@@ -0,0 +1,57 @@
+"""
+ダッシュボードページの条件付きGET（ETag / 304）と描画済みHTMLの短期キャッシュ
+ETagはテーブルごとのデータバージョンから作るので、データが変わらなければDBクエリもテンプレート描画もしない
+バージョンはテナントのDBごとなので、ETag（とキャッシュのキー）にはテナントも含める
+"""
+from __future__ import annotations
+import hashlib
+import os
+from typing import Callable, Iterable
+
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+
+from app.db import current_tenant, get_versions
+from app.utils.ttlcache import TTLCache
+
+# 描画済みHTMLの保持秒数（0で無効）
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "30"))
+
+_pages = TTLCache(maxsize=256, ttl=PAGE_CACHE_TTL or 1)
+
+
+def page_etag(request: Request, lang: str, tables: Iterable[str], extra: str = "") -> str:
+    versions = get_versions(tables)
+    raw = "|".join([
+        current_tenant.get(),
+        request.url.path,
+        request.url.query,
+        lang,
+        ",".join(f"{k}={v}" for k, v in sorted(versions.items())),
+        extra,
+    ])
+    return 'W/"' + hashlib.blake2b(raw.encode(), digest_size=12).hexdigest() + '"'
+
+
+def conditional_page(
+    request: Request,
+    lang: str,
+    tables: Iterable[str],
+    render: Callable[[], Response],
+    extra: str = "",
+) -> Response:
+    """ETagが一致すれば304、キャッシュがあればそのHTML、なければrender()してキャッシュ"""
+    etag = page_etag(request, lang, tables, extra)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    body = _pages.get(etag) if PAGE_CACHE_TTL > 0 else None
+    if body is None:
+        response = render()
+        if response.status_code != 200:
+            return response
+        body = response.body
+        if PAGE_CACHE_TTL > 0:
+            _pages.set(etag, body)
+    return HTMLResponse(content=body, headers=headers)
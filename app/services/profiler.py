@@ -0,0 +1,315 @@
+"""
+本番リクエスト向けのオプトインのプロファイラ
+管理APIで有効にすると、N件に1件または指定したパスのリクエストを cProfile かスタックサンプラで計測し、
+結果を上限付きのリングバッファに保存する（pstats / collapsed stack形式でダウンロードできる）
+
+エンドポイント関数だけを計測する（ProfilingRouteで包む）:
+- 同期ルート: スレッドプールのワーカースレッド内で計測
+- 非同期ルート: コルーチンが実際に動いている間だけ計測し、await中に同じイベントループで動く他のリクエストは含めない
+"""
+from __future__ import annotations
+import asyncio
+import cProfile
+import functools
+import io
+import itertools
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+
+# 保存しておくプロファイルの数（古いものから捨てる）
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+# スタックサンプラの間隔（秒）
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.001"))
+
+MODES = ("cprofile", "stack")
+
+
+@dataclass
+class ProfilerConfig:
+    mode: str = "cprofile"
+    every: int = 0  # N件に1件（0なら使わない）
+    path: str = ""  # このパスで始まるリクエストをすべて
+    remaining: Optional[int] = None  # 残り件数（Noneなら無制限）
+
+
+@dataclass
+class Profile:
+    id: int
+    method: str
+    path: str
+    route: str
+    mode: str
+    started_at: float
+    duration: float = 0.0
+    stats: Optional[bytes] = None  # marshal済みのpstatsデータ
+    collapsed: Optional[str] = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "mode": self.mode,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "formats": ["pstats", "text"] if self.stats is not None else ["collapsed"],
+        }
+
+
+class _StackSampler:
+    """指定スレッドのスタックを一定間隔で数える（activeの間だけ）"""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.thread_id: Optional[int] = None
+        self.active = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if not self.active or self.thread_id is None:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class _NullSampler(_StackSampler):
+    """計測できなかったリクエスト用（空の結果になる）"""
+
+    def __init__(self) -> None:
+        super().__init__(PROFILE_SAMPLE_INTERVAL)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+@dataclass
+class _Session:
+    profile: Profile
+    profiler: Optional[cProfile.Profile] = None
+    sampler: Optional[_StackSampler] = None
+    started: float = field(default_factory=time.perf_counter)
+
+    def begin(self) -> None:
+        if self.profiler is not None:
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # 別スレッドで他のプロファイラが動いている（Python 3.12以降はプロセスで1つ）
+                self.profiler = None
+                self.sampler = _NullSampler()
+        else:
+            self.sampler.thread_id = threading.get_ident()
+            self.sampler.active = True
+
+    def end(self) -> None:
+        if self.profiler is not None:
+            self.profiler.disable()
+        else:
+            self.sampler.active = False
+
+
+class _ProfiledCoroutine:
+    """コルーチンを1ステップずつ進め、動いている間だけ計測する"""
+
+    def __init__(self, coro: Any, session: _Session) -> None:
+        self.coro = coro
+        self.session = session
+
+    def __await__(self):
+        value: Any = None
+        error: Optional[BaseException] = None
+        while True:
+            self.session.begin()
+            try:
+                if error is not None:
+                    yielded = self.coro.throw(error)
+                else:
+                    yielded = self.coro.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.session.end()
+            try:
+                value = yield yielded
+                error = None
+            except BaseException as e:  # キャンセル等はコルーチンに渡す
+                value = None
+                error = e
+
+
+class Profiler:
+    def __init__(self, buffer_size: int = PROFILE_BUFFER_SIZE) -> None:
+        self._lock = threading.Lock()
+        self._config: Optional[ProfilerConfig] = None
+        self._seen = 0
+        self._ids = itertools.count(1)
+        self._profiles: Deque[Profile] = deque(maxlen=buffer_size)
+
+    @property
+    def config(self) -> Optional[ProfilerConfig]:
+        return self._config
+
+    def configure(self, config: Optional[ProfilerConfig]) -> None:
+        with self._lock:
+            self._config = config
+            self._seen = 0
+
+    def _select(self, path: str) -> Optional[str]:
+        """計測するリクエストならモードを返す"""
+        with self._lock:
+            config = self._config
+            if config is None:
+                return None
+            if config.path:
+                hit = path.startswith(config.path)
+            else:
+                self._seen += 1
+                hit = config.every > 0 and self._seen % config.every == 0
+            if not hit:
+                return None
+            if config.remaining is not None:
+                config.remaining -= 1
+                if config.remaining <= 0:
+                    self._config = None  # 指定件数に達したら自動で停止
+            return config.mode
+
+    def start(self, request: Request, route: str) -> Optional[_Session]:
+        if self._config is None:  # 無効時はロックも取らない
+            return None
+        path = request.url.path
+        mode = self._select(path)
+        if mode is None:
+            return None
+        profile = Profile(next(self._ids), request.method, path, route, mode, time.time())
+        if mode == "stack":
+            sampler = _StackSampler(PROFILE_SAMPLE_INTERVAL)
+            sampler.start()
+            return _Session(profile, sampler=sampler)
+        return _Session(profile, profiler=cProfile.Profile())
+
+    def finish(self, session: _Session) -> None:
+        profile = session.profile
+        profile.duration = time.perf_counter() - session.started
+        if session.profiler is not None:
+            stats = pstats.Stats(session.profiler)
+            profile.stats = marshal.dumps(stats.stats)
+        else:
+            session.sampler.stop()
+            profile.collapsed = session.sampler.collapsed()
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [p.summary() for p in reversed(self._profiles)]
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        with self._lock:
+            for p in self._profiles:
+                if p.id == profile_id:
+                    return p
+        return None
+
+
+def stats_text(profile: Profile, limit: int = 40) -> str:
+    """pstatsの上位（累積時間順）を人が読める形で"""
+    out = io.StringIO()
+    stats = pstats.Stats(_LoadedStats(marshal.loads(profile.stats)), stream=out)
+    stats.sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+class _LoadedStats:
+    """marshal済みデータからpstats.Statsを作るためのアダプタ"""
+
+    def __init__(self, data: Dict[Any, Any]) -> None:
+        self.stats = data
+
+    def create_stats(self) -> None:
+        pass
+
+
+_current: ContextVar[Optional[_Session]] = ContextVar("profile_session", default=None)
+
+profiler = Profiler()
+
+
+def _wrap_endpoint(call: Callable[..., Any]) -> Callable[..., Any]:
+    """エンドポイント関数を包み、計測対象のリクエストなら実行中だけ計測する"""
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def async_endpoint(*args: Any, **kwargs: Any) -> Any:
+            session = _current.get()
+            if session is None:
+                return await call(*args, **kwargs)
+            return await _ProfiledCoroutine(call(*args, **kwargs), session)
+        return async_endpoint
+
+    @functools.wraps(call)
+    def sync_endpoint(*args: Any, **kwargs: Any) -> Any:
+        # スレッドプールのワーカースレッドで実行される
+        session = _current.get()
+        if session is None:
+            return call(*args, **kwargs)
+        session.begin()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            session.end()
+    return sync_endpoint
+
+
+class ProfilingRoute(APIRoute):
+    """プロファイラが有効なときにエンドポイントを計測するAPIRoute"""
+
+    def get_route_handler(self) -> Callable[[Request], Any]:
+        # 依存関係の解決はそのままで、呼び出す関数だけを差し替える
+        self.dependant.call = _wrap_endpoint(self.dependant.call)
+        handler = super().get_route_handler()
+
+        async def profiled_handler(request: Request) -> Any:
+            session = profiler.start(request, self.path)
+            if session is None:
+                return await handler(request)
+            token = _current.set(session)
+            try:
+                return await handler(request)
+            finally:
+                _current.reset(token)
+                profiler.finish(session)
+
+        return profiled_handler
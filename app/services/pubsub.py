@@ -0,0 +1,186 @@
+"""
+プロセス内のpub/sub（SSE配信用）
+publishはどのスレッドからでも呼べる（同期ルートはスレッドプールで動くため）
+メッセージはエンコード済みのSSEフレーム（bytes）で、購読者全員で同じバイト列を共有する
+"""
+from __future__ import annotations
+import asyncio
+import os
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set
+
+from app.services.metrics import inc
+from app.utils.fastjson import dumps
+
+# ワーカーあたりの同時SSE接続数の上限
+SSE_MAX_CONNECTIONS = int(os.getenv("SSE_MAX_CONNECTIONS", "200"))
+# 無通信時にコメント行を送る間隔（秒）。プロキシのアイドル切断を防ぐ
+SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", "15"))
+# 購読者ごとに溜められる未送信フレーム数（超えたら切断し、クライアントの再接続に任せる）
+SSE_MAX_PENDING = int(os.getenv("SSE_MAX_PENDING", "256"))
+
+
+class BrokerFull(Exception):
+    """接続数の上限に達している"""
+
+
+def sse_frame(event: str, data: Any, id: Optional[str] = None) -> bytes:
+    """SSEの1イベント分のバイト列（dataがbytes/str以外ならJSONにする）"""
+    if isinstance(data, bytes):
+        payload = data.decode("utf-8")
+    elif isinstance(data, str):
+        payload = data
+    else:
+        payload = dumps(data).decode("utf-8")
+    lines = [f"event: {event}"]
+    if id is not None:
+        lines.append(f"id: {id}")
+    lines.extend(f"data: {line}" for line in payload.split("\n"))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class Subscription:
+    def __init__(self, topic: str, max_pending: int) -> None:
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        self.closed = False
+        self.reason = ""
+        self._max_pending = max_pending
+        self._frames: Deque[bytes] = deque()
+        self._ready = asyncio.Event()
+
+    def _deliver(self, frames: List[bytes]) -> None:
+        # 購読者のイベントループ上で実行される
+        if self.closed:
+            return
+        self._frames.extend(frames)
+        if len(self._frames) > self._max_pending:
+            inc("sse_dropped_total", reason="slow_consumer")
+            self._close("overflow")
+            return
+        self._ready.set()
+
+    def _close(self, reason: str) -> None:
+        if not self.closed:
+            self.closed = True
+            self.reason = reason
+            self._frames.clear()
+            self._ready.set()
+
+    async def get(self, timeout: float) -> List[bytes]:
+        """溜まっているフレームをまとめて返す（timeout内に何もなければ空リスト）"""
+        if not self._frames and not self.closed:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        frames = list(self._frames)
+        self._frames.clear()
+        return frames
+
+
+class Broker:
+    def __init__(self, max_connections: int = SSE_MAX_CONNECTIONS, max_pending: int = SSE_MAX_PENDING) -> None:
+        self.max_connections = max_connections
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._topics: Dict[str, Set[Subscription]] = {}
+        self._count = 0
+
+    @property
+    def connections(self) -> int:
+        return self._count
+
+    def subscribe(self, topic: str, exclusive: bool = False) -> Subscription:
+        """topicを購読（イベントループ上で呼ぶこと）。exclusiveなら同じtopicの既存接続を閉じる"""
+        with self._lock:
+            replaced = list(self._topics.get(topic, ())) if exclusive else []
+            if self._count - len(replaced) >= self.max_connections:
+                inc("sse_rejected_total")
+                raise BrokerFull()
+            for old in replaced:
+                self._remove(old)
+            sub = Subscription(topic, self.max_pending)
+            self._topics.setdefault(topic, set()).add(sub)
+            self._count += 1
+        for old in replaced:
+            old.loop.call_soon_threadsafe(old._close, "replaced")
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._remove(sub)
+
+    def _remove(self, sub: Subscription) -> bool:
+        topic_subs = self._topics.get(sub.topic)
+        if not topic_subs or sub not in topic_subs:
+            return False
+        topic_subs.discard(sub)
+        if not topic_subs:
+            del self._topics[sub.topic]
+        self._count -= 1
+        return True
+
+    def has_subscribers(self, topic: str) -> bool:
+        return topic in self._topics
+
+    def publish(self, topic: str, *frames: bytes) -> int:
+        """framesを順番通りにtopicの購読者へ送る（どのスレッドからでも可）。送信先の数を返す"""
+        with self._lock:
+            subs = list(self._topics.get(topic, ()))
+        if not subs:
+            return 0
+        batch = list(frames)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for sub in subs:
+            if sub.loop is running:
+                sub._deliver(batch)
+            else:
+                sub.loop.call_soon_threadsafe(sub._deliver, batch)
+        return len(subs)
+
+    def close_all(self) -> None:
+        """全接続を閉じる（シャットダウン時）"""
+        with self._lock:
+            subs = [sub for topic_subs in self._topics.values() for sub in topic_subs]
+        for sub in subs:
+            sub.loop.call_soon_threadsafe(sub._close, "shutdown")
+
+
+async def event_stream(
+    broker: Broker,
+    sub: Subscription,
+    heartbeat: float = SSE_HEARTBEAT,
+    retry_ms: int = 3000,
+    initial: bytes = b"",
+) -> AsyncIterator[bytes]:
+    """購読をSSEのバイト列ストリームにする（切断・終了時に購読を解除）"""
+    try:
+        yield f"retry: {retry_ms}\n\n".encode() + initial
+        while not sub.closed:
+            frames = await sub.get(heartbeat)
+            if frames:
+                # 溜まったフレームは1回の書き込みで送る
+                yield b"".join(frames)
+            elif not sub.closed:
+                yield b": ping\n\n"
+        if sub.reason == "replaced":
+            # 同じセッションの新しい接続に置き換えられた（クライアントは再接続しない）
+            yield sse_frame("replaced", {})
+    finally:
+        broker.unsubscribe(sub)
+
+
+_broker: Optional[Broker] = None
+
+
+def get_broker() -> Broker:
+    global _broker
+    if _broker is None:
+        _broker = Broker()
+    return _broker
@@ -1,119 +1,130 @@
 from __future__ import annotations
-from typing import Dict, List, Any
+import json
+import re
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 
+from app.db.rollups import record_question
+from app.services.metrics import observe
+
 @dataclass
 class QAResponse:
     answer_text: str
     confidence: str  # "high" or "low"
     references: List[str]
     suggested_actions: List[str]
+    topic: Optional[str] = None  # マッチしたKBトピック（なければNone）
+    lang: str = "en"  # 回答の言語
 
 # キーワード辞書ベースのQAエンジン
-QA_KNOWLEDGE: Dict[str, Dict[str, Any]] = {
-    "attendance": {
-        "keywords": ["勤怠", "出勤", "退勤", "attendance", "clock", "time", "work hours"],
-        "answer": "勤怠管理について：\n• 出勤時間: 9:00-10:00の間で柔軟\n• 退勤時間: 18:00以降（8時間労働）\n• 遅刻・早退は事前にマネージャーに連絡\n• システム: [勤怠管理システム](https://example.com/attendance)",
-        "references": [
-            "[勤怠規程](https://example.com/attendance-policy)",
-            "[勤怠管理システム](https://example.com/attendance)"
-        ],
-        "confidence": "high"
-    },
-    "leave": {
-        "keywords": ["休暇", "有休", "年休", "leave", "vacation", "holiday", "PTO"],
-        "answer": "休暇申請について：\n• 有給休暇: 入社日から付与（初年度10日）\n• 申請方法: [休暇申請システム](https://example.com/leave)から申請\n• 事前申請: 原則1週間前まで\n• 緊急時: 当日でも可（マネージャー承認必要）",
-        "references": [
-            "[休暇規程](https://example.com/leave-policy)",
-            "[休暇申請システム](https://example.com/leave)"
-        ],
-        "confidence": "high"
-    },
-    "address": {
-        "keywords": ["住所", "転居", "引っ越し", "address", "move", "relocation"],
-        "answer": "住所変更について：\n• 変更手続き: [人事システム](https://example.com/hr)の「個人情報変更」から申請\n• 必要書類: 住民票の写しまたは運転免許証\n• 提出期限: 変更後1週間以内\n• 影響: 給与明細の送付先が更新されます",
-        "references": [
-            "[人事システム](https://example.com/hr)",
-            "[個人情報管理規程](https://example.com/privacy)"
-        ],
-        "confidence": "high"
-    },
-    "onboarding": {
-        "keywords": ["オンボーディング", "入社", "初日", "onboarding", "first day", "new hire"],
-        "answer": "オンボーディングについて：\n• 初日: 9:00に本社受付で集合\n• 持ち物: 身分証明書、銀行口座情報\n• 初日スケジュール: HRオリエンテーション → デスクセットアップ → チーム紹介\n• 詳細: マネージャーから事前に連絡があります",
-        "references": [
-            "[オンボーディングガイド](https://example.com/onboarding)",
-            "[初日チェックリスト](https://example.com/first-day)"
-        ],
-        "confidence": "high"
-    },
-    "training": {
-        "keywords": ["研修", "トレーニング", "教育", "training", "education", "course"],
-        "answer": "研修について：\n• 必須研修: セキュリティ研修、コンプライアンス研修（入社後1ヶ月以内）\n• 選択研修: [研修カタログ](https://example.com/training)から選択可能\n• 申請方法: マネージャー承認後、[研修システム](https://example.com/training)から申請\n• 費用: 会社負担（業務関連のみ）",
-        "references": [
-            "[研修カタログ](https://example.com/training)",
-            "[研修システム](https://example.com/training)"
-        ],
-        "confidence": "high"
-    },
-    "benefits": {
-        "keywords": ["福利厚生", "ベネフィット", "benefits", "insurance", "health"],
-        "answer": "福利厚生について：\n• 健康保険: 社会保険完備\n• 退職金制度: あり（3年以上勤務）\n• 各種手当: 交通費、住宅手当（条件あり）\n• 詳細: [福利厚生ガイド](https://example.com/benefits)を参照",
-        "references": [
-            "[福利厚生ガイド](https://example.com/benefits)"
-        ],
-        "confidence": "high"
-    }
+# 辞書は app/data/qa_knowledge.json（起動を軽くするため最初の質問で読み込む）
+# トピックごとに言語別（ja / en）のキーワード・回答・参照元を持つ。トピックの順番が優先順位
+KNOWLEDGE_PATH = Path(__file__).resolve().parent.parent / "data" / "qa_knowledge.json"
+LANGS = ("ja", "en")
+
+# 日本語の文字（ひらがな・カタカナ・CJK統合漢字と拡張A・半角カナ）
+_JA_CHARS = re.compile("[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uff66-\uff9f]")
+_LATIN_CHARS = re.compile("[A-Za-z]")
+
+# 低信頼度にするキーワード（例外・複雑な条件分岐）。言語によらず全部見る
+_LOW_CONFIDENCE = re.compile("|".join(re.escape(kw) for kw in [
+    "例外", "特別", "特殊", "exception", "special", "unusual", "complex",
+    "場合", "条件", "if", "when", "depending", "case",
+]))
+
+_FALLBACK = {
+    "ja": "申し訳ございませんが、ご質問の内容について確実な回答を提供できません。\n\n人事部門にエスカレートして、適切な対応をさせていただきます。",
+    "en": "Sorry, I can't give a reliable answer to this question.\n\nI'll escalate it to HR so the right person can follow up.",
 }
 
-def process_question(question: str) -> QAResponse:
+@lru_cache(maxsize=1)
+def load_knowledge() -> Dict[str, Dict[str, Any]]:
+    with open(KNOWLEDGE_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+@lru_cache(maxsize=None)
+def _index(langs: Tuple[str, ...]) -> Tuple[Tuple[str, str], ...]:
+    """言語ごとのキーワード索引: (小文字にしたキーワード, トピック) をトピックの優先順に並べたもの
+    日英両方の文字がある質問用に ("ja", "en") の索引も作る（優先順位は以前の1つの一覧と同じ）"""
+    return tuple(
+        (keyword.lower(), topic)
+        for topic, data in load_knowledge().items()
+        for lang in langs
+        for keyword in data[lang]["keywords"]
+    )
+
+def detect_languages(text: str) -> Tuple[str, ...]:
+    """文字種で引く索引を決める（日本語の文字があれば ja、ラテン文字があれば en。両方なら両方）"""
+    langs = tuple(lang for lang, chars in (("ja", _JA_CHARS), ("en", _LATIN_CHARS)) if chars.search(text))
+    return langs or ("en",)
+
+def answer_language(langs: Tuple[str, ...], hint: Optional[str] = None) -> str:
+    """回答の言語: 日本語の文字があれば ja。ラテン文字だけの質問（PTO など）はどちらの利用者もありうるので hint（画面の言語）"""
+    if "ja" in langs:
+        return "ja"
+    return hint if hint in LANGS else "en"
+
+def _match(question_lower: str, langs: Tuple[str, ...]) -> Optional[str]:
+    for keyword, topic in _index(langs):
+        if keyword in question_lower:
+            return topic
+    return None
+
+def process_question(question: str, lang: Optional[str] = None) -> QAResponse:
     """
     質問を処理して回答を生成（ルールベース）
     
     Args:
         question: ユーザーの質問テキスト
+        lang: 画面の言語（ja / en）。ラテン文字だけの質問の回答言語に使う
     
     Returns:
         QAResponse: 回答、信頼度、参照元、推奨アクション
     """
+    started = time.perf_counter()
+    qa = _answer(question, lang)
+    observe("qa_seconds", time.perf_counter() - started, confidence=qa.confidence)
+    # レポート用の質問数（トピック・信頼度ごと）
+    record_question(qa.topic, qa.confidence)
+    return qa
+
+def match_topic(question: str) -> Optional[str]:
+    """キーワードが最初にマッチしたKBトピック（なければNone）。質問の文字種に合う言語の索引だけを引く"""
+    return _match(question.lower(), detect_languages(question))
+
+def _answer(question: str, hint: Optional[str] = None) -> QAResponse:
     question_lower = question.lower()
+    langs = detect_languages(question)
+    lang = answer_language(langs, hint)
     
-    # キーワードマッチング
-    matched_topics = []
-    for topic, data in QA_KNOWLEDGE.items():
-        for keyword in data["keywords"]:
-            if keyword.lower() in question_lower:
-                matched_topics.append(topic)
-                break
+    # キーワードマッチング（最初にマッチしたトピックを使用）
+    topic = _match(question_lower, langs)
     
     # マッチしたトピックがある場合
-    if matched_topics:
-        # 最初にマッチしたトピックを使用
-        topic = matched_topics[0]
-        data = QA_KNOWLEDGE[topic]
+    if topic is not None:
+        data = load_knowledge()[topic]
+        localized = data[lang]
         
-        # 例外キーワードチェック（低信頼度トリガー）
-        exception_keywords = ["例外", "特別", "特殊", "例外", "exception", "special", "unusual", "complex"]
-        has_exception = any(kw in question_lower for kw in exception_keywords)
-        
-        # 複雑な条件分岐を示すキーワード
-        complex_keywords = ["場合", "条件", "if", "when", "depending", "case"]
-        has_complex = any(kw in question_lower for kw in complex_keywords)
-        
-        confidence = "low" if (has_exception or has_complex) else data["confidence"]
+        # 例外・複雑な条件分岐を示すキーワードがあれば低信頼度
+        confidence = "low" if _LOW_CONFIDENCE.search(question_lower) else data["confidence"]
         
         return QAResponse(
-            answer_text=data["answer"],
+            answer_text=localized["answer"],
             confidence=confidence,
-            references=data["references"],
-            suggested_actions=["escalate"] if confidence == "low" else []
+            references=localized["references"],
+            suggested_actions=["escalate"] if confidence == "low" else [],
+            topic=topic,
+            lang=lang
         )
     
     # マッチしない場合（低信頼度）
     return QAResponse(
-        answer_text="申し訳ございませんが、ご質問の内容について確実な回答を提供できません。\n\n人事部門にエスカレートして、適切な対応をさせていただきます。",
+        answer_text=_FALLBACK[lang],
         confidence="low",
         references=[],
-        suggested_actions=["escalate"]
+        suggested_actions=["escalate"],
+        lang=lang
     )
-
@@ -0,0 +1,25 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List
+
+from app.chat.blocks import create_reminder_digest
+from app.i18n import t
+
+
+def build_digests(tasks: Iterable[Dict[str, Any]], lang: str = "en") -> List[Dict[str, Any]]:
+    """期限の近いタスクを担当者ごとにまとめ、1人1通のダイジェストにする"""
+    by_owner: Dict[str, List[Dict[str, Any]]] = {}
+    for task in tasks:
+        by_owner.setdefault(task["owner"], []).append(task)
+
+    digests: List[Dict[str, Any]] = []
+    for owner, owner_tasks in by_owner.items():
+        owner_tasks.sort(key=lambda x: x["due_date"])
+        title = t("reminders_digest_title", lang).format(count=len(owner_tasks))
+        digests.append({
+            "to": owner,
+            "title": title,
+            "body": "\n".join(f"{x['title']} (Due: {x['due_date']})" for x in owner_tasks),
+            "items": owner_tasks,
+            "blocks": create_reminder_digest(owner, owner_tasks, title),
+        })
+    return digests
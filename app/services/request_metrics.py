@@ -0,0 +1,70 @@
+"""
+リクエストごとの計測を行うASGIミドルウェア
+ルート（パスのテンプレート）ごとのレイテンシのヒストグラムと、DBのクエリ数・行数・時間を記録する
+レイテンシはレスポンスヘッダ送信まで（SSEなどのストリームは接続時間ではなく開始までの時間になる）
+"""
+from __future__ import annotations
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from app.db.instrumented import QueryStats, current_stats
+from app.services.metrics import inc, observe
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def route_label(scope: Scope) -> str:
+    """ルートのパステンプレート（/onboarding/{oid} など）。未マッチは1つにまとめてラベル数を抑える"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app: Callable[[Scope, Receive, Send], Awaitable[None]]) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+        recorded = False
+
+        def record() -> None:
+            nonlocal recorded
+            recorded = True
+            route = route_label(scope)
+            observe(
+                "http_request_duration_seconds",
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=route,
+                status=str(status),
+            )
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                record()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not recorded:
+                record()
+            # 以降（レスポンス後のタスクなど）のクエリはbackgroundとして数える
+            stats.closed = True
+            current_stats.reset(token)
+            route = route_label(scope)
+            if stats.queries:
+                inc("db_queries_total", stats.queries, route=route)
+                inc("db_rows_total", stats.rows, route=route)
+                inc("db_seconds_total", stats.seconds, route=route)
@@ -0,0 +1,79 @@
+"""
+リクエストのテナントの決定（TENANTSを設定したときだけ使う）
+1. X-Tenant-ID ヘッダ  2. サブドメイン（acme.example.com -> acme）  3. DEFAULT_TENANT
+Slackのリクエストはボディのteam_idから決める（SLACK_TEAM_TENANTS="T0123=acme,T0456=globex"）
+"""
+from __future__ import annotations
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import parse_qs
+
+from app.db import DEFAULT_TENANT, current_tenant, is_tenant
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+TENANT_HEADER = b"x-tenant-id"
+
+SLACK_TEAM_TENANTS: Dict[str, str] = dict(
+    pair.strip().split("=", 1) for pair in os.getenv("SLACK_TEAM_TENANTS", "").split(",") if "=" in pair
+)
+
+
+def resolve_tenant(scope: Scope) -> Optional[str]:
+    """ヘッダ > サブドメイン > 既定。知らないテナントを指定されたらNone"""
+    host = ""
+    for name, value in scope.get("headers", ()):
+        if name == TENANT_HEADER:
+            tenant = value.decode("latin-1").strip().lower()
+            return tenant if is_tenant(tenant) else None
+        if name == b"host":
+            host = value.decode("latin-1")
+    labels = host.split(":", 1)[0].split(".")
+    if len(labels) >= 3 and is_tenant(labels[0].lower()):
+        return labels[0].lower()
+    return DEFAULT_TENANT
+
+
+def slack_team_id(body: bytes, content_type: str) -> Optional[str]:
+    """Events API（JSON）/ インタラクション（payload）/ コマンド（フォーム）のteam_id"""
+    try:
+        if content_type.startswith("application/json"):
+            return json.loads(body).get("team_id")
+        form = parse_qs(body.decode("utf-8"))
+        if "payload" in form:
+            return (json.loads(form["payload"][0]).get("team") or {}).get("id")
+        return (form.get("team_id") or [None])[0]
+    except (ValueError, UnicodeDecodeError, AttributeError):
+        return None
+
+
+def slack_tenant(body: bytes, content_type: str) -> str:
+    tenant = SLACK_TEAM_TENANTS.get(slack_team_id(body, content_type) or "", DEFAULT_TENANT)
+    return tenant if is_tenant(tenant) else DEFAULT_TENANT
+
+
+class TenantMiddleware:
+    """テナントをcontextvarに設定する（repo・キャッシュ・フィードはこれを見る）"""
+
+    def __init__(self, app: Callable[[Scope, Receive, Send], Awaitable[None]]) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        tenant = resolve_tenant(scope)
+        if tenant is None:
+            body = b'{"error":"unknown tenant"}'
+            await send({"type": "http.response.start", "status": 404,
+                        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        token = current_tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(token)
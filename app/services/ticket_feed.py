@@ -0,0 +1,40 @@
+"""
+チケットの変更フィード（HRダッシュボードへのSSE配信）
+create_ticket / close_ticket が変更後の行を渡し、購読中のダッシュボードに行のHTML断片を送る
+イベントIDはtable_versionsのticketsのバージョンで、再接続時に取りこぼしを検出できる
+トピックはテナントごと（バージョンもテナントのDBごとなので混ぜない）
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional
+
+from app.db import DEFAULT_TENANT, current_tenant
+from app.services.pubsub import get_broker, sse_frame
+
+TOPIC = "tickets"
+
+# 行のHTMLを描画する関数（テンプレートを持つapp.mainが登録する）
+_row_renderer: Optional[Callable[[Dict[str, Any]], str]] = None
+
+
+def set_row_renderer(renderer: Optional[Callable[[Dict[str, Any]], str]]) -> None:
+    global _row_renderer
+    _row_renderer = renderer
+
+
+def topic() -> str:
+    """現在のテナントのフィードのトピック"""
+    tenant = current_tenant.get()
+    return TOPIC if tenant == DEFAULT_TENANT else f"{TOPIC}:{tenant}"
+
+
+def publish_ticket_change(ticket: Dict[str, Any], version: int) -> None:
+    """変更後のチケット行を配信（購読者がいなければ描画もしない）"""
+    broker = get_broker()
+    name = topic()
+    if _row_renderer is None or not broker.has_subscribers(name):
+        return
+    broker.publish(name, sse_frame("ticket", _row_renderer(ticket), id=str(version)))
+
+
+def resync_frame() -> bytes:
+    return sse_frame("resync", {})
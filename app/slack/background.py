@@ -0,0 +1,48 @@
+"""
+ack後のバックグラウンド処理（lazy stage）を実行するタスクランナー
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Set
+
+from app.services.metrics import inc, timed
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundRunner:
+    """同時実行数を制限してコルーチンをバックグラウンド実行する"""
+
+    def __init__(self, concurrency: int) -> None:
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def spawn(self, name: str, func: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> asyncio.Task:
+        """funcをバックグラウンドで実行（呼び出し元はすぐに戻る）"""
+        async def run() -> None:
+            with timed("slack_stage_seconds", stage="queue_wait", listener=name):
+                await self._slots.acquire()
+            try:
+                await func(*args, **kwargs)
+            except Exception as e:
+                inc("slack_background_errors_total", listener=name)
+                logger.error(f"Background task {name} failed: {e}")
+            finally:
+                self._slots.release()
+
+        task = asyncio.create_task(run())
+        # 実行中のタスクへの参照を保持（GCで消えないように）
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def drain(self, timeout: float = 10.0) -> None:
+        """シャットダウン時に実行中のタスクの完了を待つ"""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
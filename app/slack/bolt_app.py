@@ -1,177 +1,152 @@
 """
 Slack Bolt App統合
-FastAPIと同居できる形で実装
+FastAPIと同居できる形で実装（AsyncApp + AsyncSlackRequestHandler）
+slack_boltの読み込みが重いので、main.pyは最初のSlackリクエストでこのモジュールを読み込む
 """
+import asyncio
 import os
 import logging
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
-from slack_bolt import App
-from slack_bolt.adapter.fastapi import SlackRequestHandler
+from slack_bolt.async_app import AsyncApp
+from slack_bolt.adapter.fastapi.async_handler import AsyncSlackRequestHandler
 
 from app.services.qa_engine import process_question
 from app.db.repo import create_ticket
+from app.services.idempotency import fingerprint, get_store as get_idempotency
+from app.services.metrics import timed
+from app.slack.background import BackgroundRunner
+from app.chat.renderer import slack_answer, slack_blocks
+from app.slack.client import SLACK_BOT_TOKEN, SLACK_SIGNING_SECRET, get_async_client, post_response
+from app.slack.outbox import get_dispatcher
 
 logger = logging.getLogger(__name__)
 
 # Slack環境変数
-SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN", "")
-SLACK_SIGNING_SECRET = os.getenv("SLACK_SIGNING_SECRET", "")
 SLACK_HR_CHANNEL_ID = os.getenv("SLACK_HR_CHANNEL_ID", "")
+# ack後のバックグラウンド処理の同時実行数の上限
+SLACK_LAZY_CONCURRENCY = int(os.getenv("SLACK_LAZY_CONCURRENCY", "16"))
+
+background = BackgroundRunner(SLACK_LAZY_CONCURRENCY)
 
 # Slack Bolt App初期化
 if SLACK_BOT_TOKEN and SLACK_SIGNING_SECRET:
-    slack_app = App(
-        token=SLACK_BOT_TOKEN,
-        signing_secret=SLACK_SIGNING_SECRET
+    # Web API呼び出しは共有AsyncWebClient（コネクションプール再利用）を使う
+    # 署名はmain._handle_slack（SlackDeduplicator.verify）で検証済みなので、Boltでは検証しない
+    slack_app = AsyncApp(
+        client=get_async_client(),
+        signing_secret=SLACK_SIGNING_SECRET,
+        request_verification_enabled=False
     )
-    handler = SlackRequestHandler(slack_app)
+    handler = AsyncSlackRequestHandler(slack_app)
 else:
     logger.warning("SLACK_BOT_TOKEN or SLACK_SIGNING_SECRET not set. Slack integration disabled.")
     slack_app = None
     handler = None
 
-def create_slack_blocks(qa_response) -> list:
-    """QA応答をSlack Block Kit形式に変換"""
-    blocks = []
-    
-    # Section block（メインメッセージ）
-    blocks.append({
-        "type": "section",
-        "text": {
-            "type": "mrkdwn",
-            "text": qa_response.answer_text
-        }
-    })
-    
-    # Context block（参照元）
-    if qa_response.references:
-        ref_text = "📚 *References:*\n" + "\n".join(f"• {ref}" for ref in qa_response.references)
-        blocks.append({
-            "type": "context",
-            "elements": [
-                {
-                    "type": "mrkdwn",
-                    "text": ref_text
-                }
-            ]
-        })
-    
-    # Actions block（Escalateボタン）
-    if qa_response.confidence == "low" or len(qa_response.suggested_actions) > 0:
-        blocks.append({
-            "type": "actions",
-            "elements": [
-                {
-                    "type": "button",
-                    "text": {
-                        "type": "plain_text",
-                        "text": "Escalate to HR"
-                    },
-                    "action_id": "escalate_to_hr",
-                    "style": "danger"
-                }
-            ]
-        })
-    
-    return blocks
+async def answer_hrhelp(response_url: str, question: str) -> None:
+    """/hrhelp のバックグラウンド処理: QA → response_urlに返答"""
+    # QAエンジンで処理（イベントループを塞がないようスレッドで実行）
+    with timed("slack_stage_seconds", stage="qa", listener="hrhelp"):
+        qa_response = await asyncio.to_thread(process_question, question)
+
+    # トピックごとにエンコード済みのBlock Kit JSONをそのまま送る
+    with timed("slack_stage_seconds", stage="respond", listener="hrhelp"):
+        await post_response(response_url, slack_answer(qa_response))
+
+def escalation_key(body: Dict[str, Any], channel_id: str, user_id: str) -> Optional[str]:
+    """エスカレーションの冪等キー: 同じ回答メッセージのボタンは1件のチケットにする（二重クリック・再送）
+    メッセージのtsがなければ action_ts / trigger_id"""
+    message_ts = (body.get("container") or {}).get("message_ts") or (body.get("message") or {}).get("ts")
+    if message_ts:
+        return f"{user_id}:{channel_id}:{message_ts}"
+    action = (body.get("actions") or [{}])[0]
+    ref = action.get("action_ts") or body.get("trigger_id")
+    return f"{user_id}:{ref}" if ref else None
+
+async def escalate_to_hr(body, respond) -> None:
+    """Escalate to HRボタンのバックグラウンド処理: チケット作成（+ HR通知のoutbox記録） → 応答"""
+    # 元のメッセージから質問を取得
+    question = ""
+    if "message" in body:
+        message = body["message"]
+        if "blocks" in message:
+            for block in message["blocks"]:
+                if block.get("type") == "section" and "text" in block:
+                    # 最初のsection blockから質問を推測（実際には前のメッセージから取得すべき）
+                    text = block["text"].get("text", "")
+                    if text:
+                        question = text.replace("*HR Bot:*\n", "").strip()
+
+    # イベント情報から質問を取得（簡易版）
+    event = body.get("event", {})
+    channel_id = event.get("channel", "") or body.get("channel", {}).get("id", "")
+    user_id = body.get("user", {}).get("id", "") or event.get("user", "")
+
+    async def create() -> str:
+        # チケット作成（DB書き込みはスレッドで実行）
+        # HRチャンネル通知は同じトランザクションでoutboxに記録し、dispatcherが送信する
+        with timed("slack_stage_seconds", stage="ticket_insert", listener="escalate_to_hr"):
+            ticket_id = await asyncio.to_thread(
+                create_ticket,
+                source="slack",
+                question=question or "Escalated from Slack",
+                user_ref=user_id,
+                channel_ref=channel_id,
+                notify_channel=SLACK_HR_CHANNEL_ID or None,
+            )
+        if not SLACK_HR_CHANNEL_ID:
+            logger.info(f"HR channel not configured. Ticket created: {ticket_id}")
+        dispatcher = get_dispatcher()
+        if dispatcher is not None:
+            dispatcher.wake()
+        return ticket_id
+
+    # 同じメッセージからの2回目以降は最初のチケットを返す（チケット・通知を作らない）
+    ticket_id, _ = await get_idempotency().run_async(
+        "slack_escalate", escalation_key(body, channel_id, user_id), fingerprint(question), create
+    )
+
+    # ユーザーに応答
+    with timed("slack_stage_seconds", stage="respond", listener="escalate_to_hr"):
+        await respond(
+            text=f"✅ Escalated to HR. Ticket #{ticket_id[:8]} created. HR will follow up soon.",
+            replace_original=False
+        )
 
 if slack_app:
     @slack_app.event("app_mention")
-    def handle_app_mention(event: Dict[str, Any], say, client):
-        """@bot メンションで質問を処理"""
+    async def handle_app_mention(event: Dict[str, Any], say, client):
+        """@bot メンションで質問を処理（Events APIはBoltが先にackする）"""
         question = event.get("text", "").replace(f"<@{event.get('user')}>", "").strip()
         if not question:
-            say("Please ask a question after mentioning me.")
+            await say("Please ask a question after mentioning me.")
             return
-        
-        # QAエンジンで処理
-        qa_response = process_question(question)
-        
-        # Slack Block Kit形式で返答
-        blocks = create_slack_blocks(qa_response)
-        say(blocks=blocks)
+
+        async def answer() -> None:
+            # QAエンジンで処理（イベントループを塞がないようスレッドで実行）
+            with timed("slack_stage_seconds", stage="qa", listener="app_mention"):
+                qa_response = await asyncio.to_thread(process_question, question)
+            # Slack Block Kit形式で返答
+            with timed("slack_stage_seconds", stage="respond", listener="app_mention"):
+                await say(blocks=slack_blocks(qa_response))
+
+        background.spawn("app_mention", answer)
 
     @slack_app.command("/hrhelp")
-    def handle_hrhelp_command(ack, respond, command):
-        """スラッシュコマンド /hrhelp を処理"""
-        ack()
-        
+    async def handle_hrhelp_command(ack, command):
+        """スラッシュコマンド /hrhelp を処理（即ack、QAはバックグラウンド）"""
         question = command.get("text", "").strip()
-        if not question:
-            respond("Usage: /hrhelp <your question>\nExample: /hrhelp How do I request time off?")
-            return
-        
-        # QAエンジンで処理
-        qa_response = process_question(question)
-        
-        # Slack Block Kit形式で返答
-        blocks = create_slack_blocks(qa_response)
-        respond(blocks=blocks)
+        with timed("slack_stage_seconds", stage="ack", listener="hrhelp"):
+            if not question:
+                await ack("Usage: /hrhelp <your question>\nExample: /hrhelp How do I request time off?")
+                return
+            await ack()
+        background.spawn("hrhelp", answer_hrhelp, command["response_url"], question)
 
     @slack_app.action("escalate_to_hr")
-    def handle_escalate_action(ack, body, respond, client):
-        """Escalate to HRボタン押下時の処理"""
-        ack()
-        
-        # 元のメッセージから質問を取得
-        question = ""
-        if "message" in body:
-            message = body["message"]
-            if "blocks" in message:
-                for block in message["blocks"]:
-                    if block.get("type") == "section" and "text" in block:
-                        # 最初のsection blockから質問を推測（実際には前のメッセージから取得すべき）
-                        text = block["text"].get("text", "")
-                        if text:
-                            question = text.replace("*HR Bot:*\n", "").strip()
-        
-        # イベント情報から質問を取得（簡易版）
-        event = body.get("event", {})
-        channel_id = event.get("channel", "") or body.get("channel", {}).get("id", "")
-        user_id = body.get("user", {}).get("id", "") or event.get("user", "")
-        
-        # チケット作成
-        ticket_id = create_ticket(
-            source="slack",
-            question=question or "Escalated from Slack",
-            user_ref=user_id,
-            channel_ref=channel_id
-        )
-        
-        # ユーザーに応答
-        respond(
-            text=f"✅ Escalated to HR. Ticket #{ticket_id[:8]} created. HR will follow up soon.",
-            replace_original=False
-        )
-        
-        # HRチャンネルに通知（オプション）
-        if SLACK_HR_CHANNEL_ID:
-            try:
-                client.chat_postMessage(
-                    channel=SLACK_HR_CHANNEL_ID,
-                    text=f"🚨 New HR ticket from Slack",
-                    blocks=[
-                        {
-                            "type": "section",
-                            "text": {
-                                "type": "mrkdwn",
-                                "text": f"*Ticket ID:* {ticket_id[:8]}\n*User:* <@{user_id}>\n*Channel:* <#{channel_id}>\n*Question:* {question or 'Escalated from Slack'}"
-                            }
-                        },
-                        {
-                            "type": "context",
-                            "elements": [
-                                {
-                                    "type": "mrkdwn",
-                                    "text": f"View all tickets: <http://localhost:8000/tickets|Web Dashboard>"
-                                }
-                            ]
-                        }
-                    ]
-                )
-            except Exception as e:
-                logger.error(f"Failed to post to HR channel: {e}")
-        else:
-            logger.info(f"HR channel not configured. Ticket created: {ticket_id}")
-
+    async def handle_escalate_action(ack, body, respond):
+        """Escalate to HRボタン押下時の処理（即ack、チケット作成・通知はバックグラウンド）"""
+        with timed("slack_stage_seconds", stage="ack", listener="escalate_to_hr"):
+            await ack()
+        background.spawn("escalate_to_hr", escalate_to_hr, body, respond)
@@ -0,0 +1,69 @@
+"""
+共有AsyncWebClient
+アプリ全体で1つのクライアントとaiohttpセッション（コネクションプール）を使い回す
+aiohttp / slack_sdk は重いので、Slackを使うときに初めて読み込む（起動時間を短くするため）
+"""
+from __future__ import annotations
+import os
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import aiohttp
+    from slack_sdk.web.async_client import AsyncWebClient
+
+SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN", "")
+SLACK_SIGNING_SECRET = os.getenv("SLACK_SIGNING_SECRET", "")
+# ローカルのスタブSlack APIに向ける場合のみ指定（例: http://127.0.0.1:9000/api/）
+SLACK_API_URL = os.getenv("SLACK_API_URL", "https://slack.com/api/")
+
+_client: Optional[AsyncWebClient] = None
+
+
+def get_async_client() -> AsyncWebClient:
+    """共有AsyncWebClientを取得（セッションはopen_session()で起動時に設定）"""
+    global _client
+    if _client is None:
+        from slack_sdk.web.async_client import AsyncWebClient
+
+        _client = AsyncWebClient(token=SLACK_BOT_TOKEN or None, base_url=SLACK_API_URL)
+    return _client
+
+
+async def open_session() -> None:
+    """イベントループ上でaiohttpセッションを作成し、クライアントに設定"""
+    import aiohttp
+
+    client = get_async_client()
+    if client.session is None or client.session.closed:
+        client.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=30),
+            timeout=aiohttp.ClientTimeout(total=client.timeout),
+        )
+
+
+async def close_session() -> None:
+    if _client is None:
+        return
+    client = _client
+    if client.session is not None and not client.session.closed:
+        await client.session.close()
+    client.session = None
+
+
+async def post_response(response_url: str, body: bytes) -> None:
+    """エンコード済みのJSONをresponse_urlにPOST（共有セッションを使う）"""
+    client = get_async_client()
+    session = client.session
+    if session is None or session.closed:
+        import aiohttp
+
+        async with aiohttp.ClientSession() as tmp:
+            await _post(tmp, response_url, body)
+    else:
+        await _post(session, response_url, body)
+
+
+async def _post(session: aiohttp.ClientSession, url: str, body: bytes) -> None:
+    async with session.post(url, data=body, headers={"Content-Type": "application/json; charset=utf-8"}) as res:
+        if res.status != 200:
+            raise RuntimeError(f"response_url returned {res.status}: {await res.text()}")
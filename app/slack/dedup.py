@@ -0,0 +1,149 @@
+"""
+Slackの再送（X-Slack-Retry-Num / 同じevent_id）の重複排除
+Boltハンドラの手前で、QAやDB処理の前にO(1)で重複配信を捨てる
+署名の検証もここで1回だけ行う（BoltのAppは request_verification_enabled=False）
+Boltの処理が失敗したらキーを消して、Slackの再送を受け付けられるようにする
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Mapping, Optional, Set, Tuple
+from urllib.parse import parse_qs
+
+from app.db import current_tenant, get_conn
+from app.services.metrics import inc
+from app.utils.ttlcache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# memory: ワーカーごとのメモリ内キャッシュ / sqlite: DBで全ワーカー共有
+SLACK_DEDUP_STORE = os.getenv("SLACK_DEDUP_STORE", "memory")
+SLACK_DEDUP_TTL = float(os.getenv("SLACK_DEDUP_TTL", "900"))
+SLACK_DEDUP_MAX = int(os.getenv("SLACK_DEDUP_MAX", "50000"))
+
+
+class MemoryDedupStore:
+    def __init__(self, maxsize: int = SLACK_DEDUP_MAX, ttl: float = SLACK_DEDUP_TTL) -> None:
+        self._seen = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def first_seen(self, key: str) -> bool:
+        return self._seen.add(key)
+
+    def forget(self, key: str) -> None:
+        self._seen.pop(key)
+
+
+class SqliteDedupStore:
+    """複数ワーカー用: INSERT OR IGNOREの結果で初回かどうかを判定
+    キーは現在のテナント（ワークスペース）のDBに書く。テーブルはテナントごとに最初の使用時に作る"""
+
+    def __init__(self, ttl: float = SLACK_DEDUP_TTL, purge_every: int = 1000) -> None:
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._inserts = 0
+        self._tables: Set[str] = set()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = get_conn()
+        tenant = current_tenant.get()
+        if tenant not in self._tables:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS slack_dedup (key TEXT PRIMARY KEY, expires_at REAL NOT NULL) WITHOUT ROWID"
+            )
+            conn.commit()
+            self._tables.add(tenant)
+        return conn
+
+    def first_seen(self, key: str) -> bool:
+        now = time.time()
+        conn = self._conn()
+        # 期限切れのキーは新しい配信として扱う
+        conn.execute("DELETE FROM slack_dedup WHERE key = ? AND expires_at <= ?", (key, now))
+        cur = conn.execute("INSERT OR IGNORE INTO slack_dedup (key, expires_at) VALUES (?, ?)", (key, now + self.ttl))
+        inserted = cur.rowcount == 1
+        self._inserts += 1
+        if self._inserts % self.purge_every == 0:
+            conn.execute("DELETE FROM slack_dedup WHERE expires_at <= ?", (now,))
+        conn.commit()
+        conn.close()
+        return inserted
+
+    def forget(self, key: str) -> None:
+        conn = self._conn()
+        conn.execute("DELETE FROM slack_dedup WHERE key = ?", (key,))
+        conn.commit()
+        conn.close()
+
+
+def delivery_key(body: bytes, content_type: str) -> Optional[str]:
+    """配信を一意に識別するキー（Events APIはevent_id、コマンド・インタラクションはtrigger_id）"""
+    try:
+        if content_type.startswith("application/json"):
+            data = json.loads(body)
+            if data.get("event_id"):
+                return f"event:{data['event_id']}"
+            return None
+        form = parse_qs(body.decode("utf-8"))
+        if "payload" in form:
+            payload = json.loads(form["payload"][0])
+            if payload.get("trigger_id"):
+                return f"interactive:{payload['trigger_id']}"
+            actions = payload.get("actions") or [{}]
+            if actions[0].get("action_ts"):
+                return f"action:{payload.get('user', {}).get('id')}:{actions[0]['action_ts']}"
+            return None
+        if form.get("trigger_id"):
+            return f"command:{form['trigger_id'][0]}"
+    except (ValueError, UnicodeDecodeError, AttributeError, IndexError):
+        return None
+    return None
+
+
+class SlackDeduplicator:
+    def __init__(self, store, signing_secret: str) -> None:
+        self.store = store
+        self._verifier = None
+        if signing_secret:
+            from slack_sdk.signature import SignatureVerifier
+            self._verifier = SignatureVerifier(signing_secret)
+
+    def verify(self, body: bytes, headers: Mapping[str, str]) -> bool:
+        """Slackの署名（とタイムスタンプ）が正しいか"""
+        return self._verifier is None or self._verifier.is_valid_request(body, dict(headers))
+
+    def claim(self, body: bytes, headers: Mapping[str, str]) -> Tuple[bool, Optional[str]]:
+        """(重複配信か, 記録したキー)。記録したキーは処理が失敗したらforget()で消す"""
+        key = delivery_key(body, headers.get("content-type", ""))
+        if key is None:
+            return False, None
+        if self.store.first_seen(key):
+            return False, key
+        retry_num = headers.get("x-slack-retry-num", "")
+        inc("slack_duplicates_suppressed_total", kind=key.split(":", 1)[0])
+        logger.info(f"Suppressed duplicate Slack delivery {key} (retry={retry_num or '-'})")
+        return True, None
+
+    async def claim_request(self, request) -> Tuple[bool, Optional[str]]:
+        """FastAPIのRequest用（bodyはキャッシュされるのでBoltハンドラでも再度読める）"""
+        body = await request.body()
+        if isinstance(self.store, SqliteDedupStore):
+            return await asyncio.to_thread(self.claim, body, request.headers)
+        return self.claim(body, request.headers)
+
+    async def forget(self, key: Optional[str]) -> None:
+        if key is None:
+            return
+        if isinstance(self.store, SqliteDedupStore):
+            await asyncio.to_thread(self.store.forget, key)
+        else:
+            self.store.forget(key)
+
+
+def build_store():
+    if SLACK_DEDUP_STORE == "sqlite":
+        return SqliteDedupStore()
+    return MemoryDedupStore()
@@ -0,0 +1,171 @@
+"""
+Slack送信キュー
+asyncioキュー + Slackメソッドのティア別トークンバケットで送信し、429はRetry-Afterに従って再送する
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from app.utils.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Slack Web APIのレートリミット（1分あたりのリクエスト数）
+# https://api.slack.com/docs/rate-limits
+TIER_LIMITS_PER_MINUTE: Dict[str, float] = {
+    "tier1": 1,
+    "tier2": 20,
+    "tier3": 50,
+    "tier4": 100,
+    "special": 60,  # chat.postMessage: 1チャンネルあたり約1件/秒
+}
+
+METHOD_TIERS: Dict[str, str] = {
+    "chat.postMessage": "special",
+    "chat.update": "tier3",
+    "conversations.open": "tier3",
+    "users.info": "tier4",
+}
+
+DEFAULT_TIER = "tier3"
+
+
+@dataclass
+class OutgoingMessage:
+    method: str
+    kwargs: Dict[str, Any]
+    attempts: int = 0
+    future: Optional[asyncio.Future] = field(default=None, repr=False)
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """例外が429（rate_limited）ならRetry-Afterの秒数を返す"""
+    response = getattr(exc, "response", None)
+    if response is None or getattr(response, "status_code", None) != 429:
+        return None
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after") or 1
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class DeliveryQueue:
+    """Slack送信用の非同期キュー
+
+    client は AsyncWebClient 互換（chat_postMessage などのコルーチンメソッドを持つ）オブジェクト。
+    ワーカーは1つなので送信順序はsubmit順に保たれる。
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        *,
+        tier_limits: Optional[Dict[str, float]] = None,
+        max_retries: int = 5,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ) -> None:
+        self.client = client
+        limits = tier_limits or TIER_LIMITS_PER_MINUTE
+        self._buckets = {tier: TokenBucket(rate=per_min / 60.0, capacity=1.0) for tier, per_min in limits.items()}
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+
+    def _bucket(self, method: str) -> TokenBucket:
+        tier = METHOD_TIERS.get(method, DEFAULT_TIER)
+        return self._buckets.get(tier) or self._buckets[DEFAULT_TIER]
+
+    async def start(self) -> None:
+        if self._worker is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self, drain: bool = True) -> None:
+        """ワーカーを停止（drain=Trueなら残りを送信し終えてから）"""
+        if self._worker is None:
+            return
+        if drain:
+            await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    def submit(self, method: str = "chat.postMessage", **kwargs: Any) -> None:
+        """送信を予約（スレッドプールからも呼び出し可能）"""
+        if self._queue is None or self._loop is None:
+            raise RuntimeError("DeliveryQueue is not started")
+        msg = OutgoingMessage(method=method, kwargs=kwargs)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._queue.put_nowait(msg)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, msg)
+
+    async def join(self) -> None:
+        """キューが空になるまで待機"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _run(self) -> None:
+        while True:
+            msg = await self._queue.get()
+            try:
+                await self._deliver(msg)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Slack delivery failed ({msg.method}): {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, msg: OutgoingMessage) -> Any:
+        bucket = self._bucket(msg.method)
+        call = getattr(self.client, msg.method.replace(".", "_"))
+        while True:
+            await bucket.acquire()
+            msg.attempts += 1
+            try:
+                result = await call(**msg.kwargs)
+                self.sent += 1
+                return result
+            except Exception as e:
+                wait = retry_after_seconds(e)
+                if wait is None or msg.attempts > self.max_retries:
+                    raise
+                self.rate_limited += 1
+                # Retry-Afterと指数バックオフの大きい方だけ待つ（同じティアの後続も止める）
+                backoff = min(self.max_backoff, self.base_backoff * (2 ** (msg.attempts - 1)))
+                wait = max(wait, backoff)
+                bucket.pause(wait)
+                logger.warning(f"Slack rate limited ({msg.method}), retrying in {wait:.1f}s")
+
+
+_reminder_queue: Optional[DeliveryQueue] = None
+
+
+def get_reminder_queue() -> Optional[DeliveryQueue]:
+    """起動済みのリマインダー送信キュー（Slack未設定ならNone）"""
+    return _reminder_queue
+
+
+def set_reminder_queue(queue: Optional[DeliveryQueue]) -> None:
+    global _reminder_queue
+    _reminder_queue = queue
@@ -0,0 +1,64 @@
+"""
+ローカル用のSlackクライアントのフェイク
+AsyncWebClient互換のメソッドを持ち、送信内容を記録する。スループットや順序の確認に使う
+"""
+from __future__ import annotations
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from app.utils.ratelimit import TokenBucket
+
+
+class FakeResponse:
+    def __init__(self, data: Dict[str, Any], status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> None:
+        self.data = data
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+
+class FakeSlackApiError(Exception):
+    """slack_sdk.errors.SlackApiError と同じく response 属性を持つ"""
+
+    def __init__(self, message: str, response: FakeResponse) -> None:
+        super().__init__(message)
+        self.response = response
+
+
+class FakeSlackClient:
+    """chat.postMessage を記録するだけのフェイク
+
+    rate_per_sec を指定するとSlackと同様に超過時は429 + Retry-Afterを返す。
+    fail_times を指定すると最初のN回は500相当のエラーにする。
+    """
+
+    def __init__(self, rate_per_sec: Optional[float] = None, burst: float = 1.0, latency: float = 0.0, fail_times: int = 0) -> None:
+        self.calls: List[Dict[str, Any]] = []
+        self.rejected = 0
+        self.latency = latency
+        self.fail_times = fail_times
+        self._bucket = TokenBucket(rate_per_sec, burst) if rate_per_sec else None
+
+    async def chat_postMessage(self, **kwargs: Any) -> FakeResponse:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise FakeSlackApiError("internal_error", FakeResponse({"ok": False, "error": "internal_error"}, status_code=500))
+        if self._bucket is not None:
+            wait = self._bucket.try_acquire()
+            if wait > 0:
+                self.rejected += 1
+                raise FakeSlackApiError(
+                    "ratelimited",
+                    FakeResponse({"ok": False, "error": "ratelimited"}, status_code=429, headers={"Retry-After": str(max(1, round(wait)))}),
+                )
+        ts = f"{time.time():.6f}"
+        self.calls.append({"method": "chat.postMessage", "ts": ts, **kwargs})
+        return FakeResponse({"ok": True, "channel": kwargs.get("channel"), "ts": ts})
@@ -0,0 +1,130 @@
+"""
+Outbox dispatcher
+outboxテーブルに記録されたSlack通知をバッチで送信する（リトライ・指数バックオフ付き、at-least-once）
+outboxはテナントのDBごとにあるので、設定されたすべてのテナントを順に回る（再起動後、リクエストの来ていないテナントの未送信分も送る）
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Optional
+
+from app.db import all_tenants, tenant_context
+from app.db.repo import claim_outbox, defer_outbox, mark_outbox_failed, mark_outbox_sent
+from app.services.metrics import inc
+from app.slack.delivery import retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+SLACK_HR_CHANNEL_ID = os.getenv("SLACK_HR_CHANNEL_ID", "")
+
+
+class OutboxDispatcher:
+    """outboxを定期的に（またはwake()で即座に）ドレインする"""
+
+    def __init__(
+        self,
+        client: Any,
+        *,
+        batch_size: int = 20,
+        interval: float = 5.0,
+        lease_seconds: float = 30.0,
+        max_attempts: int = 8,
+        base_backoff: float = 2.0,
+        max_backoff: float = 600.0,
+    ) -> None:
+        self.client = client
+        self.batch_size = batch_size
+        self.interval = interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def wake(self) -> None:
+        """新しいメッセージが入ったことを通知（スレッドからも呼び出し可能）"""
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                processed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {e}")
+                processed = 0
+            if processed >= self.batch_size:
+                continue  # まだ残っている可能性があるので続けて処理
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def run_once(self) -> int:
+        """テナントごとに1バッチを送信し、処理した件数を返す"""
+        processed = 0
+        for tenant in all_tenants():
+            with tenant_context(tenant):
+                processed += await self._run_tenant_once()
+        return processed
+
+    async def _run_tenant_once(self) -> int:
+        rows = await asyncio.to_thread(claim_outbox, self.batch_size, self.lease_seconds)
+        for i, row in enumerate(rows):
+            call = getattr(self.client, row["method"].replace(".", "_"))
+            try:
+                await call(**json.loads(row["payload"]))
+            except Exception as e:
+                attempts = row["attempts"] + 1
+                retry_after = retry_after_seconds(e)
+                delay = min(self.max_backoff, self.base_backoff * (2 ** (attempts - 1)))
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                dead = attempts >= self.max_attempts
+                await asyncio.to_thread(mark_outbox_failed, row["id"], str(e), time.time() + delay, dead)
+                inc("outbox_failures_total", dead=str(dead).lower())
+                logger.warning(f"Outbox {row['dedup_key']} failed (attempt {attempts}): {e}")
+                if retry_after is not None:
+                    # レートリミット中は残りのバッチも送らず、Retry-After後に回す
+                    rest = [r["id"] for r in rows[i + 1:]]
+                    await asyncio.to_thread(defer_outbox, rest, time.time() + retry_after)
+                    break
+            else:
+                await asyncio.to_thread(mark_outbox_sent, row["id"])
+                inc("outbox_sent_total")
+        return len(rows)
+
+
+_dispatcher: Optional[OutboxDispatcher] = None
+
+
+def get_dispatcher() -> Optional[OutboxDispatcher]:
+    return _dispatcher
+
+
+def set_dispatcher(dispatcher: Optional[OutboxDispatcher]) -> None:
+    global _dispatcher
+    _dispatcher = dispatcher
@@ -0,0 +1,123 @@
+"""
+言語ごとにプリコンパイルしたJinjaテンプレート
+t("key", ...) のキーが文字列リテラルの呼び出しはコンパイル時に翻訳済みの文字列に置き換えるため、
+描画時には翻訳の辞書引きを行わない
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import jinja2
+from jinja2.ext import Extension
+from jinja2.lexer import Token, TokenStream
+from fastapi.templating import Jinja2Templates
+
+from app.i18n import TRANSLATIONS, t
+from app.services.metrics import timed
+
+LANGS: Sequence[str] = ("en", "ja")
+
+# コンパイル済みテンプレート（バイトコード）の保存先（python -m app.templating でビルド時に作れる）
+JINJA_CACHE_DIR = Path(os.getenv("JINJA_CACHE_DIR") or Path(tempfile.gettempdir()) / "onboarding-jinja")
+
+
+class I18nFoldExtension(Extension):
+    """t("key", <任意の言語式>) を environment.i18n_lang の翻訳文字列リテラルに畳み込む"""
+
+    def filter_stream(self, stream: TokenStream) -> Iterator[Token]:
+        lang = getattr(self.environment, "i18n_lang", "en")
+        prev: Optional[Token] = None
+        while not stream.eos:
+            token = next(stream)
+            if token.test("name:t") and stream.current.test("lparen") and not (prev and prev.test("dot")):
+                folded = self._fold_call(token, stream, lang)
+                for out in folded:
+                    yield out
+                prev = folded[-1]
+                continue
+            yield token
+            prev = token
+
+    @staticmethod
+    def _fold_call(name: Token, stream: TokenStream, lang: str) -> List[Token]:
+        # 対応する閉じ括弧までのトークンを集める
+        call = [name]
+        depth = 0
+        while not stream.eos:
+            token = next(stream)
+            call.append(token)
+            if token.type in ("lparen", "lbracket", "lbrace"):
+                depth += 1
+            elif token.type in ("rparen", "rbracket", "rbrace"):
+                depth -= 1
+                if depth == 0:
+                    break
+        key = call[2] if len(call) > 3 else None
+        if key is None or key.type != "string" or call[3].type not in ("comma", "rparen"):
+            return call  # キーが動的な呼び出しは実行時のt()に任せる
+        return [Token(name.lineno, "string", t(key.value, lang))]
+
+
+def _translations_hash(lang: str) -> str:
+    data = json.dumps(TRANSLATIONS.get(lang, {}), sort_keys=True, ensure_ascii=False).encode()
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def create_env(directory: str, lang: str, cache_dir: Optional[Path] = JINJA_CACHE_DIR) -> jinja2.Environment:
+    bytecode_cache = None
+    if cache_dir is not None:
+        # 翻訳が変わればコンパイル結果も変わるので、言語と翻訳のハッシュごとにディレクトリを分ける
+        lang_dir = cache_dir / f"{lang}-{_translations_hash(lang)}"
+        lang_dir.mkdir(parents=True, exist_ok=True)
+        bytecode_cache = jinja2.FileSystemBytecodeCache(str(lang_dir))
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(directory),
+        autoescape=True,
+        extensions=[I18nFoldExtension],
+        bytecode_cache=bytecode_cache,
+        auto_reload=False,
+    )
+    env.i18n_lang = lang
+    # キーが動的な呼び出し用
+    env.globals["t"] = t
+    return env
+
+
+class LocalizedTemplates:
+    """context["lang"] に応じて言語別のJinja2Templatesで描画する"""
+
+    def __init__(self, directory: str, langs: Sequence[str] = LANGS, cache_dir: Optional[Path] = JINJA_CACHE_DIR) -> None:
+        self.langs = tuple(langs)
+        self._by_lang: Dict[str, Jinja2Templates] = {
+            lang: Jinja2Templates(env=create_env(directory, lang, cache_dir)) for lang in self.langs
+        }
+
+    def for_lang(self, lang: str) -> Jinja2Templates:
+        return self._by_lang.get(lang) or self._by_lang[self.langs[0]]
+
+    def TemplateResponse(self, name: str, context: Dict[str, Any], **kwargs: Any):
+        request = context["request"]
+        with timed("template_render_seconds", template=name):
+            return self.for_lang(context.get("lang", "en")).TemplateResponse(request, name, context, **kwargs)
+
+    def get_template(self, name: str, lang: str) -> jinja2.Template:
+        return self.for_lang(lang).get_template(name)
+
+    def warm(self) -> int:
+        """全言語・全テンプレートをコンパイル（またはバイトコードキャッシュから読み込み）"""
+        count = 0
+        for templates in self._by_lang.values():
+            for name in templates.env.list_templates(extensions=["html"]):
+                templates.env.get_template(name)
+                count += 1
+        return count
+
+
+if __name__ == "__main__":
+    # ビルド時にJINJA_CACHE_DIRへ全テンプレートをコンパイルしておく（起動直後の最初の表示でコンパイルしない）
+    compiled = LocalizedTemplates(str(Path(__file__).parent / "templates")).warm()
+    print(f"compiled {compiled} templates into {JINJA_CACHE_DIR}")
@@ -0,0 +1,31 @@
+"""
+JSONエンコードの高速パス
+orjsonがインストールされていれば使い、なければ標準のjsonにフォールバックする
+出力はどちらもFastAPIのJSONResponseと同じ形（ensure_ascii=False, 区切り文字の空白なし）
+"""
+from __future__ import annotations
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjsonはオプション
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        # 標準のjsonと同じく数値などのキーも文字列にする
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """ORJSONResponse相当（orjsonがなければ標準のjson）"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,49 @@
+from __future__ import annotations
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """トークンバケット方式のレートリミッタ
+
+    rate: 1秒あたりに補充されるトークン数
+    capacity: バースト上限（バケットの大きさ）
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """トークンを取得。取得できた場合は0、できない場合は待つべき秒数を返す"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """トークンが取得できるまで待機"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """429のRetry-After等でバケットを空にして一定時間停止"""
+        with self._lock:
+            self._tokens = -seconds * self.rate
+            self._updated = time.monotonic()
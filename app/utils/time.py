@@ -8,3 +8,20 @@ def now_jst() -> datetime:
 
 def parse_date(s: str) -> date:
     return date.fromisoformat(s)
+
+# DBの整数列: 時刻はUNIX秒、日付は1970-01-01からの日数（範囲検索・索引用）
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def epoch(dt: datetime) -> int:
+    return int(dt.timestamp())
+
+def epoch_day(d: date) -> int:
+    return d.toordinal() - _EPOCH_ORDINAL
+
+def day_date(day: int) -> date:
+    """epoch_day() の逆"""
+    return date.fromordinal(day + _EPOCH_ORDINAL)
+
+def day_start_epoch(d: date) -> int:
+    """JSTのその日の0時のUNIX秒"""
+    return epoch(datetime(d.year, d.month, d.day, tzinfo=JST))
@@ -0,0 +1,120 @@
+"""
+バースト時の流入制御（app/services/admission.py）の効果
+処理能力を超える一定レートでチャット質問（1割はエスカレーション）とSlackコマンドを送り続け（オープンループ）、
+流入制御なし / ありで、受け付けたリクエストのレイテンシ・Slackが3秒以内にackできた割合・429/503の件数を比べる
+ENVは読み込み時に決まるので、モードごとに別プロセスで測る（クライアントはX-Forwarded-Forで分けるので ADMISSION_TRUSTED_PROXIES=1）
+python -m bench.admission --web-rate 1500 --slack-rate 20 --seconds 5
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from bench.seed import QUESTIONS
+from bench.slack_load import SIGNING_SECRET, command_body
+
+SLACK_DEADLINE = 3.0
+
+
+def _summary(latencies: List[float], statuses: Dict[int, int]) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 1) if ordered else 0.0
+
+    return {
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "admitted": len(ordered),
+        "admitted_p50_ms": pct(50),
+        "admitted_p99_ms": pct(99),
+        "admitted_max_ms": round(ordered[-1] * 1000, 1) if ordered else 0.0,
+    }
+
+
+async def _drive(web_rate: float, slack_rate: float, seconds: float, clients: int) -> Dict[str, Any]:
+    from bench.slack_stub import SlackStub, signed_headers
+
+    with SlackStub(latency=0.02) as stub:
+        os.environ["SLACK_BOT_TOKEN"] = "xoxb-bench"
+        os.environ["SLACK_SIGNING_SECRET"] = SIGNING_SECRET
+        os.environ["SLACK_API_URL"] = stub.url + "/api/"
+        from app.main import app
+        from bench.asgi import lifespan, request
+
+        lanes = {"web": ([], {}), "slack": ([], {})}
+        slack_late = 0
+
+        async def one(lane: str, i: int, arrived: float) -> None:
+            nonlocal slack_late
+            if lane == "slack":
+                body = command_body(i, f"{stub.url}/respond/{i}")
+                path, headers = "/slack/commands", signed_headers(SIGNING_SECRET, body)
+            else:
+                path = "/chat/escalate" if i % 10 == 0 else "/chat/ask"
+                body = json.dumps({"question": QUESTIONS[i % len(QUESTIONS)]}).encode()
+                headers = {"content-type": "application/json", "x-forwarded-for": f"10.0.{i % clients // 256}.{i % clients % 256}"}
+            res = await request(app, "POST", path, body, headers)
+            # 到着（タスク作成）からの時間。イベントループが詰まって処理が始まるまでの待ちも含む
+            elapsed = time.perf_counter() - arrived
+            latencies, statuses = lanes[lane]
+            statuses[res.status] = statuses.get(res.status, 0) + 1
+            if res.status < 400:
+                latencies.append(elapsed)
+                if lane == "slack" and elapsed > SLACK_DEADLINE:
+                    slack_late += 1
+
+        async with lifespan(app):
+            tasks: List[asyncio.Task] = []
+            sent = {"web": 0, "slack": 0}
+            started = time.perf_counter()
+            # 10msごとに、経過時間ぶんのリクエストをまとめて投入する（応答を待たない）
+            while (elapsed := time.perf_counter() - started) < seconds:
+                for lane, rate in (("web", web_rate), ("slack", slack_rate)):
+                    while sent[lane] < int(elapsed * rate):
+                        tasks.append(asyncio.create_task(one(lane, sent[lane], time.perf_counter())))
+                        sent[lane] += 1
+                await asyncio.sleep(0.01)
+            await asyncio.gather(*tasks)
+            drained = time.perf_counter() - started
+
+    return {
+        "sent": sent,
+        "drain_sec": round(drained, 2),
+        "web": _summary(*lanes["web"]),
+        "slack": {**_summary(*lanes["slack"]), "acked_over_3s": slack_late},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--web-rate", type=float, default=1500, help="chat requests per second")
+    parser.add_argument("--slack-rate", type=float, default=20, help="Slack commands per second")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--clients", type=int, default=2000, help="distinct web clients (X-Forwarded-For)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        print(json.dumps(asyncio.run(_drive(args.web_rate, args.slack_rate, args.seconds, args.clients))))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, enabled in (("off", "0"), ("on", "1")):
+            db = os.path.join(tmp, f"admission-{mode}.db")
+            out = subprocess.run(
+                [sys.executable, "-m", "bench.admission", "--worker", "--web-rate", str(args.web_rate),
+                 "--slack-rate", str(args.slack_rate), "--seconds", str(args.seconds), "--clients", str(args.clients)],
+                env={**os.environ, "DB_PATH": db, "ADMISSION_ENABLED": enabled, "ADMISSION_TRUSTED_PROXIES": "1"}, check=True, capture_output=True, text=True,
+            ).stdout
+            results[mode] = json.loads(out.strip().splitlines()[-1])
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+ベンチマーク用の最小ASGIクライアント（HTTPサーバを介さずにアプリを直接呼び出す）
+"""
+from __future__ import annotations
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class Response:
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+        self.status = status
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in headers}
+        self.body = body
+
+
+async def request(
+    app: Any,
+    method: str,
+    url: str,
+    body: bytes = b"",
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """ASGIアプリに1リクエストを送り、レスポンスを返す"""
+    parts = urlsplit(url)
+    raw_headers = [(b"host", b"bench")]
+    for k, v in (headers or {}).items():
+        raw_headers.append((k.lower().encode("latin-1"), v.encode("latin-1")))
+    if body:
+        raw_headers.append((b"content-length", str(len(body)).encode()))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method.upper(),
+        "scheme": "http",
+        "path": parts.path or "/",
+        "raw_path": (parts.path or "/").encode(),
+        "query_string": parts.query.encode(),
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    sent = False
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()  # disconnectは送らない
+        return {"type": "http.disconnect"}
+
+    status = 500
+    resp_headers: List[Tuple[bytes, bytes]] = []
+    chunks: List[bytes] = []
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status, resp_headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            resp_headers = list(message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return Response(status, resp_headers, b"".join(chunks))
+
+
+class Stream:
+    """レスポンスボディを少しずつ受け取る接続（SSE用）"""
+
+    def __init__(self) -> None:
+        self.status = 0
+        self.headers: Dict[str, str] = {}
+        self.started = asyncio.Event()
+        self.chunks: asyncio.Queue = asyncio.Queue()
+        self.disconnected = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self._buffer = b""
+
+    async def read_until(self, marker: bytes) -> bytes:
+        """markerを含むところまで読む"""
+        while marker not in self._buffer:
+            self._buffer += await self.chunks.get()
+        i = self._buffer.index(marker) + len(marker)
+        out, self._buffer = self._buffer[:i], self._buffer[i:]
+        return out
+
+    async def close(self) -> None:
+        self.disconnected.set()
+        if self.task is not None:
+            await self.task
+
+
+async def open_stream(app: Any, url: str, headers: Optional[Dict[str, str]] = None) -> Stream:
+    """GETリクエストを送り、レスポンスヘッダを受け取ったところで返す（ボディはStreamから読む）"""
+    parts = urlsplit(url)
+    raw_headers = [(b"host", b"bench")]
+    for k, v in (headers or {}).items():
+        raw_headers.append((k.lower().encode("latin-1"), v.encode("latin-1")))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": parts.path or "/",
+        "raw_path": (parts.path or "/").encode(),
+        "query_string": parts.query.encode(),
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    stream = Stream()
+    sent = False
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await stream.disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            stream.status = message["status"]
+            stream.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in message.get("headers", [])}
+            stream.started.set()
+        elif message["type"] == "http.response.body":
+            if message.get("body"):
+                stream.chunks.put_nowait(message["body"])
+
+    stream.task = asyncio.create_task(app(scope, receive, send))
+    await stream.started.wait()
+    return stream
+
+
+@asynccontextmanager
+async def lifespan(app: Any) -> AsyncIterator[None]:
+    """startup/shutdownイベントを実行"""
+    to_app: asyncio.Queue = asyncio.Queue()
+    from_app: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}}, to_app.get, from_app.put))
+    await to_app.put({"type": "lifespan.startup"})
+    msg = await from_app.get()
+    if msg["type"] != "lifespan.startup.complete":
+        raise RuntimeError(f"startup failed: {msg}")
+    try:
+        yield
+    finally:
+        await to_app.put({"type": "lifespan.shutdown"})
+        await from_app.get()
+        await task
@@ -0,0 +1,85 @@
+"""
+Webチャットの1メッセージあたりのオーバーヘッド比較（POSTでJSONを返す従来の流れ vs SSEストリーム）
+python -m bench.chat_stream --messages 2000 --sessions 50
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from statistics import quantiles
+from typing import List
+
+from bench.asgi import lifespan, open_stream, request
+
+QUESTIONS = ["How do I request leave?", "勤怠の締め日は？", "special case for my address change", "unknown topic"]
+
+
+def _summary(samples: List[float], elapsed: float, wire_bytes: int) -> dict:
+    q = quantiles(samples, n=100)
+    return {
+        "messages": len(samples),
+        "msg_per_sec": round(len(samples) / elapsed, 1),
+        "p50_us": round(q[49] * 1e6, 1),
+        "p99_us": round(q[98] * 1e6, 1),
+        "bytes_per_msg": round(wire_bytes / len(samples), 1),
+    }
+
+
+async def run(messages: int, sessions: int) -> dict:
+    from app.main import app
+
+    async with lifespan(app):
+        # 従来: POST /chat/ask がJSONを返す
+        samples: List[float] = []
+        wire = 0
+        started = time.perf_counter()
+        for i in range(messages):
+            body = json.dumps({"question": QUESTIONS[i % len(QUESTIONS)]}).encode()
+            t0 = time.perf_counter()
+            resp = await request(app, "POST", "/chat/ask", body, {"content-type": "application/json"})
+            samples.append(time.perf_counter() - t0)
+            wire += len(resp.body)
+        post = _summary(samples, time.perf_counter() - started, wire)
+
+        # SSE: セッションごとに接続を開いたまま、POSTは202で返りblocksはストリームで届く
+        streams = []
+        for s in range(sessions):
+            cookie = {"cookie": f"chat_sid=bench-{s}"}
+            stream = await open_stream(app, "/chat/stream", cookie)
+            assert stream.status == 200, stream.status
+            await stream.read_until(b"\n\n")  # retry:
+            streams.append((cookie, stream))
+        samples = []
+        wire = 0
+        started = time.perf_counter()
+        for i in range(messages):
+            cookie, stream = streams[i % sessions]
+            body = json.dumps({"question": QUESTIONS[i % len(QUESTIONS)], "stream": True}).encode()
+            t0 = time.perf_counter()
+            resp = await request(app, "POST", "/chat/ask", body, {"content-type": "application/json", **cookie})
+            assert resp.status == 202, resp.status
+            data = await stream.read_until(b"event: done\ndata: {}\n\n")
+            samples.append(time.perf_counter() - t0)
+            wire += len(data)
+        sse = _summary(samples, time.perf_counter() - started, wire)
+        for _, stream in streams:
+            await stream.close()
+
+    return {"post_json": post, "sse": sse}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=50)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DB_PATH"] = os.path.join(tmp, "bench.db")
+        print(json.dumps(asyncio.run(run(args.messages, args.sessions)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+ISO文字列の日時列と整数の列（UNIX秒・日数）の比較
+1. サイズ: 値1つあたりのバイト数と、同じ並びの索引をTEXT列 / INTEGER列に作った場合の大きさ（dbstat）
+2. クエリ: リマインダー・チケット一覧の以前のクエリ（文字列、索引なし）、文字列+索引、今のクエリ（整数+索引）
+python -m bench.date_columns --tasks 1000000 --tickets 200000 --db /tmp/dates.db   # 2回目以降は --reuse-db
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sqlite3
+import time
+from datetime import timedelta
+from statistics import median
+from typing import Any, Callable, Dict, Tuple
+
+# 比べるために一時的に作るTEXT列の索引（今の索引と同じ並び）
+TEXT_INDEXES = {
+    "bench_tasks_due_date": "CREATE INDEX bench_tasks_due_date ON tasks(due_date)",
+    "bench_tickets_status_created_at": "CREATE INDEX bench_tickets_status_created_at ON tickets(status, created_at)",
+    "bench_tickets_created_at": "CREATE INDEX bench_tickets_created_at ON tickets(created_at)",
+}
+INT_INDEXES = ("idx_tasks_due_day", "idx_tickets_status_created_ts", "idx_tickets_created_ts")
+
+
+def _ms(fn: Callable[[], Any], runs: int) -> float:
+    fn()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return round(median(samples) * 1000, 3)
+
+
+def _queries(conn: sqlite3.Connection) -> Dict[str, Tuple[Callable[[], Any], Callable[[], Any]]]:
+    """名前 -> (文字列のクエリ, 整数のクエリ)"""
+    from app.utils.time import day_start_epoch, epoch, epoch_day, now_jst
+
+    now = now_jst()
+    today = now.date()
+    day = epoch_day(today)
+    targets = [(today + timedelta(days=d)).isoformat() for d in (7, 3, 0)]
+    week_ago = now - timedelta(days=7)
+
+    def reminders_run_text():
+        rows = conn.execute(
+            "SELECT * FROM tasks WHERE is_done = 0 AND due_date IN (?, ?, ?)", targets
+        ).fetchall()
+        return [r for r in rows if not (r["last_reminded_at"] and r["last_reminded_at"][:10] == today.isoformat())]
+
+    return {
+        "reminders_window": (
+            lambda: conn.execute(
+                "SELECT * FROM tasks WHERE due_date BETWEEN ? AND ? ORDER BY due_date ASC",
+                ((today - timedelta(days=1)).isoformat(), (today + timedelta(days=7)).isoformat()),
+            ).fetchall(),
+            lambda: conn.execute(
+                "SELECT * FROM tasks WHERE due_day BETWEEN ? AND ? ORDER BY due_day ASC", (day - 1, day + 7)
+            ).fetchall(),
+        ),
+        "reminders_run_select": (
+            reminders_run_text,
+            lambda: conn.execute(
+                """SELECT * FROM tasks WHERE due_day IN (?, ?, ?) AND is_done = 0
+                   AND (last_reminded_ts IS NULL OR last_reminded_ts < ?)""",
+                (day + 7, day + 3, day, day_start_epoch(today)),
+            ).fetchall(),
+        ),
+        "tickets_open_recent_100": (
+            lambda: conn.execute(
+                "SELECT * FROM tickets WHERE status = 'open' ORDER BY created_at DESC LIMIT 100"
+            ).fetchall(),
+            lambda: conn.execute(
+                "SELECT * FROM tickets WHERE status = 'open' ORDER BY created_ts DESC LIMIT 100"
+            ).fetchall(),
+        ),
+        "tickets_last_7_days_count": (
+            lambda: conn.execute(
+                "SELECT COUNT(*) FROM tickets WHERE created_at >= ?", (week_ago.isoformat(),)
+            ).fetchone(),
+            lambda: conn.execute(
+                "SELECT COUNT(*) FROM tickets WHERE created_ts >= ?", (epoch(week_ago),)
+            ).fetchone(),
+        ),
+    }
+
+
+def _index_bytes(conn: sqlite3.Connection, names) -> Dict[str, int]:
+    rows = conn.execute(
+        f"SELECT name, SUM(pgsize) FROM dbstat WHERE name IN ({','.join('?' for _ in names)}) GROUP BY name",
+        tuple(names),
+    ).fetchall()
+    return {name: size for name, size in rows}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--tasks", type=int, default=1000000)
+    parser.add_argument("--tickets", type=int, default=200000)
+    parser.add_argument("--reuse-db", action="store_true")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    os.environ["DB_PATH"] = args.db
+
+    seeded = None
+    if not args.reuse_db:
+        if os.path.exists(args.db):
+            os.remove(args.db)
+        from bench.seed import seed
+        seeded = seed(args.tasks, args.tickets)
+
+    conn = sqlite3.connect(args.db)
+    conn.row_factory = sqlite3.Row
+    value_bytes = dict(conn.execute(
+        """SELECT avg(length(CAST(due_date AS BLOB))) AS due_date_text,
+                  avg(CASE WHEN due_day BETWEEN -32768 AND 32767 THEN 2 ELSE 3 END) AS due_day_int
+           FROM tasks"""
+    ).fetchone())
+    value_bytes.update(dict(conn.execute(
+        "SELECT avg(length(CAST(created_at AS BLOB))) AS created_at_text, 4 AS created_ts_int FROM tickets"
+    ).fetchone()))
+
+    queries = _queries(conn)
+    results: Dict[str, Dict[str, float]] = {}
+    for name, (text_q, int_q) in queries.items():
+        results[name] = {"text_no_index_ms": _ms(text_q, args.runs), "int_indexed_ms": _ms(int_q, args.runs)}
+
+    # 同じ並びのTEXT列の索引を作って、索引の効果と型の違いを分ける
+    for sql in TEXT_INDEXES.values():
+        conn.execute(sql)
+    conn.execute("ANALYZE")
+    for name, (text_q, _) in queries.items():
+        results[name]["text_indexed_ms"] = _ms(text_q, args.runs)
+    sizes = {"text": _index_bytes(conn, TEXT_INDEXES), "int": _index_bytes(conn, INT_INDEXES)}
+    for name in TEXT_INDEXES:
+        conn.execute(f"DROP INDEX {name}")
+    conn.execute("ANALYZE")
+    conn.close()
+
+    print(json.dumps({
+        "seeded": seeded,
+        "value_bytes": {k: round(v, 1) for k, v in value_bytes.items()},
+        "index_bytes": sizes,
+        "queries": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+リマインダー送信キューのスループット・順序確認
+python -m bench.delivery --messages 200 --rate 50
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import time
+
+from app.slack.delivery import DeliveryQueue
+from app.slack.fake_client import FakeSlackClient
+
+
+async def run(messages: int, rate: float, server_rate: float) -> dict:
+    client = FakeSlackClient(rate_per_sec=server_rate)
+    # 計測用にspecialティアの上限を rate/秒 に置き換える
+    queue = DeliveryQueue(client, tier_limits={"special": rate * 60, "tier3": rate * 60}, base_backoff=0.01)
+    await queue.start()
+    started = time.perf_counter()
+    for i in range(messages):
+        queue.submit("chat.postMessage", channel="C-bench", text=f"digest {i}")
+    await queue.stop()
+    elapsed = time.perf_counter() - started
+
+    order = [int(c["text"].split()[-1]) for c in client.calls]
+    return {
+        "messages": messages,
+        "elapsed_sec": round(elapsed, 3),
+        "throughput_per_sec": round(len(client.calls) / elapsed, 1),
+        "in_order": order == sorted(order),
+        "delivered": len(client.calls),
+        "rate_limited": queue.rate_limited,
+        "failed": queue.failed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=50.0, help="client-side tokens per second")
+    parser.add_argument("--server-rate", type=float, default=None, help="fake Slack limit per second (429 above it)")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.messages, args.rate, args.server_rate)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+全エンドポイントの負荷テスト（ルートごとのスループットとレイテンシ分位数をJSONで出力）
+- --target asgi: app.main:app をプロセス内でASGIとして直接呼ぶ（bench/asgi.py）
+- --target uvicorn: ローカルにuvicornを起動してHTTPで叩く（--workersで複数ワーカー）
+- --url: 起動済みのサーバを叩く（シードは別途 bench.seed で）
+DBはタスク数（1k〜1M）を指定してシードし、Slackのペイロードはテスト用シークレットで署名する
+
+python -m bench.harness --tasks 10000 --requests 5000 --concurrency 20 --out after.json --baseline before.json
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from bench.seed import QUESTIONS, seed
+from bench.slack_load import SIGNING_SECRET, command_body
+
+# 操作名: 重み（--mix name=weight,... で上書き）
+DEFAULT_MIX: Dict[str, float] = {
+    "chat_ask": 30,
+    "chat_escalate": 3,
+    "onboard_create": 2,
+    "onboard_approve": 2,
+    "task_toggle": 8,
+    "ticket_close": 2,
+    "home": 5,
+    "onboarding_detail": 20,
+    "tickets": 8,
+    "reminders": 5,
+    "reports": 1,
+    "slack_command": 15,
+}
+
+Call = Callable[[str, str, bytes, Dict[str, str]], Awaitable[Tuple[int, Dict[str, str]]]]
+
+
+class Context:
+    """操作間で共有するID（シード済みDBから一部を読み込む）"""
+
+    def __init__(self, db_path: str, rng: random.Random, slack_url: str) -> None:
+        conn = sqlite3.connect(db_path)
+        self.onboarding_ids = [r[0] for r in conn.execute("SELECT id FROM onboarding_requests ORDER BY random() LIMIT 5000")]
+        self.pending_ids = [r[0] for r in conn.execute("SELECT id FROM onboarding_requests WHERE status = 'PENDING' ORDER BY random() LIMIT 5000")]
+        self.task_ids = [r[0] for r in conn.execute("SELECT id FROM tasks ORDER BY random() LIMIT 5000")]
+        self.open_ticket_ids = [r[0] for r in conn.execute("SELECT id FROM tickets WHERE status = 'open' ORDER BY random() LIMIT 5000")]
+        conn.close()
+        self.rng = rng
+        self.slack_url = slack_url
+        self.counter = 0
+
+
+FORM = {"content-type": "application/x-www-form-urlencoded"}
+JSON = {"content-type": "application/json"}
+
+
+async def op_chat_ask(call: Call, ctx: Context) -> int:
+    body = json.dumps({"question": ctx.rng.choice(QUESTIONS)}).encode()
+    return (await call("POST", "/chat/ask", body, JSON))[0]
+
+
+async def op_chat_escalate(call: Call, ctx: Context) -> int:
+    body = json.dumps({"question": ctx.rng.choice(QUESTIONS)}).encode()
+    return (await call("POST", "/chat/escalate", body, JSON))[0]
+
+
+async def op_onboard_create(call: Call, ctx: Context) -> int:
+    ctx.counter += 1
+    form = urlencode({
+        "employee_name": f"Bench Hire {ctx.counter}",
+        "manager_name": f"Manager {ctx.counter % 500}",
+        "role": "eng",
+        "grade": "newgrad",
+        "start_date": "2026-12-01",
+        "lang": "en",
+    }).encode()
+    status, headers = await call("POST", "/onboard", form, FORM)
+    location = headers.get("location", "")
+    if location:
+        ctx.pending_ids.append(location.rsplit("/", 1)[-1])
+    return status
+
+
+async def op_onboard_approve(call: Call, ctx: Context) -> int:
+    if not ctx.pending_ids:
+        return await op_onboard_create(call, ctx)
+    oid = ctx.pending_ids.pop(ctx.rng.randrange(len(ctx.pending_ids)))
+    return (await call("POST", f"/onboarding/{oid}/approve", b"", {}))[0]
+
+
+async def op_task_toggle(call: Call, ctx: Context) -> int:
+    task_id = ctx.rng.choice(ctx.task_ids)
+    # 詳細ページはJSON APIで切り替える（フォームの /toggle はJavaScriptなしのときだけ）
+    return (await call("POST", f"/tasks/{task_id}/toggle.json", b"", {}))[0]
+
+
+async def op_ticket_close(call: Call, ctx: Context) -> int:
+    if not ctx.open_ticket_ids:
+        return await op_chat_escalate(call, ctx)
+    tid = ctx.open_ticket_ids.pop(ctx.rng.randrange(len(ctx.open_ticket_ids)))
+    return (await call("POST", f"/tickets/{tid}/close", b"", {}))[0]
+
+
+async def op_home(call: Call, ctx: Context) -> int:
+    return (await call("GET", "/", b"", {}))[0]
+
+
+async def op_onboarding_detail(call: Call, ctx: Context) -> int:
+    oid = ctx.rng.choice(ctx.onboarding_ids)
+    return (await call("GET", f"/onboarding/{oid}", b"", {}))[0]
+
+
+async def op_tickets(call: Call, ctx: Context) -> int:
+    return (await call("GET", "/tickets", b"", {}))[0]
+
+
+async def op_reminders(call: Call, ctx: Context) -> int:
+    return (await call("GET", "/reminders", b"", {}))[0]
+
+
+async def op_reports(call: Call, ctx: Context) -> int:
+    return (await call("GET", "/reports", b"", {}))[0]
+
+
+async def op_slack_command(call: Call, ctx: Context) -> int:
+    from bench.slack_stub import signed_headers
+
+    ctx.counter += 1
+    body = command_body(ctx.counter, f"{ctx.slack_url}/respond/{ctx.counter}")
+    return (await call("POST", "/slack/commands", body, signed_headers(SIGNING_SECRET, body)))[0]
+
+
+OPS: Dict[str, Callable[[Call, Context], Awaitable[int]]] = {
+    name[3:]: fn for name, fn in globals().items() if name.startswith("op_")
+}
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 3)
+
+    return {
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+    }
+
+
+async def drive(call: Call, ctx: Context, mix: Dict[str, float], total: int, concurrency: int, rng: random.Random) -> Dict[str, Any]:
+    names = [n for n, w in mix.items() if w > 0]
+    plan = rng.choices(names, weights=[mix[n] for n in names], k=total)
+    samples: Dict[str, List[float]] = {n: [] for n in names}
+    errors: Dict[str, int] = {n: 0 for n in names}
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index
+        while next_index < len(plan):
+            name = plan[next_index]
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                status = await OPS[name](call, ctx)
+            except Exception:
+                status = 599
+            samples[name].append(time.perf_counter() - started)
+            if status >= 400:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    routes = {}
+    for name in names:
+        if samples[name]:
+            routes[name] = {
+                "count": len(samples[name]),
+                "errors": errors[name],
+                "req_per_sec": round(len(samples[name]) / elapsed, 1),
+                **_percentiles(samples[name]),
+            }
+    every = [s for values in samples.values() for s in values]
+    return {
+        "elapsed_sec": round(elapsed, 3),
+        "total": {
+            "count": len(every),
+            "errors": sum(errors.values()),
+            "req_per_sec": round(len(every) / elapsed, 1),
+            **_percentiles(every),
+        },
+        "routes": routes,
+    }
+
+
+@asynccontextmanager
+async def asgi_target() -> AsyncIterator[Call]:
+    from app.main import app
+    from bench.asgi import lifespan, request
+
+    async def call(method: str, url: str, body: bytes, headers: Dict[str, str]) -> Tuple[int, Dict[str, str]]:
+        res = await request(app, method, url, body, headers)
+        return res.status, res.headers
+
+    async with lifespan(app):
+        yield call
+
+
+@asynccontextmanager
+async def http_target(base_url: str, concurrency: int) -> AsyncIterator[Call]:
+    import aiohttp
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(base_url=base_url, connector=connector) as session:
+        async def call(method: str, url: str, body: bytes, headers: Dict[str, str]) -> Tuple[int, Dict[str, str]]:
+            async with session.request(method, url, data=body or None, headers=headers, allow_redirects=False) as res:
+                await res.read()
+                return res.status, {k.lower(): v for k, v in res.headers.items()}
+
+        yield call
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@asynccontextmanager
+async def uvicorn_target(workers: int, concurrency: int) -> AsyncIterator[Call]:
+    import urllib.request
+
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=dict(os.environ),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                urllib.request.urlopen(base_url + "/health", timeout=1).read()
+                break
+            except OSError:
+                if time.monotonic() > deadline or proc.poll() is not None:
+                    raise RuntimeError("uvicorn did not start")
+                await asyncio.sleep(0.1)
+        async with http_target(base_url, concurrency) as call:
+            yield call
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _compare(result: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """ベースラインとの比（>1 はスループット向上 / レイテンシ増加）"""
+    out = {}
+    for name, cur in list(result["routes"].items()) + [("total", result["total"])]:
+        base = baseline["routes"].get(name) if name != "total" else baseline.get("total")
+        if not base:
+            continue
+        out[name] = {
+            "req_per_sec": round(cur["req_per_sec"] / base["req_per_sec"], 3) if base["req_per_sec"] else None,
+            "p50": round(cur["p50_ms"] / base["p50_ms"], 3) if base["p50_ms"] else None,
+            "p99": round(cur["p99_ms"] / base["p99_ms"], 3) if base["p99_ms"] else None,
+        }
+    return out
+
+
+def _parse_mix(spec: Optional[str], slack: bool) -> Dict[str, float]:
+    mix = dict(DEFAULT_MIX)
+    if spec:
+        mix = {name: 0.0 for name in mix}
+        for part in spec.split(","):
+            name, _, weight = part.partition("=")
+            if name not in OPS:
+                raise SystemExit(f"unknown operation: {name} (choose from {', '.join(OPS)})")
+            mix[name] = float(weight or 1)
+    if not slack:
+        mix["slack_command"] = 0
+    return mix
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    mix = _parse_mix(args.mix, slack=not args.no_slack)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "bench.db")
+        os.environ["DB_PATH"] = db_path
+        # 全リクエストが同じクライアントから来るので、流入制御（レート制限）は既定で切る（bench.admission で別に測る）
+        os.environ.setdefault("ADMISSION_ENABLED", "0")
+        seeded: Dict[str, Any] = {}
+        if not args.url and not (args.db and args.reuse_db):
+            if os.path.exists(db_path):
+                os.remove(db_path)
+            tickets = args.tasks // 5 if args.tickets is None else args.tickets
+            seeded = seed(args.tasks, tickets, args.seed)
+
+        stub = None
+        slack_url = ""
+        if mix.get("slack_command"):
+            from bench.slack_stub import SlackStub
+
+            stub = SlackStub(latency=args.slack_latency).__enter__()
+            slack_url = stub.url
+            os.environ["SLACK_BOT_TOKEN"] = "xoxb-bench"
+            os.environ["SLACK_SIGNING_SECRET"] = SIGNING_SECRET
+            os.environ["SLACK_API_URL"] = stub.url + "/api/"
+        try:
+            ctx = Context(db_path, rng, slack_url)
+            if args.url:
+                target = http_target(args.url, args.concurrency)
+            elif args.target == "uvicorn":
+                target = uvicorn_target(args.workers, args.concurrency)
+            else:
+                target = asgi_target()
+            async with target as call:
+                if args.warmup:
+                    await drive(call, ctx, mix, args.warmup, args.concurrency, rng)
+                result = await drive(call, ctx, mix, args.requests, args.concurrency, rng)
+        finally:
+            if stub is not None:
+                stub.__exit__(None, None, None)
+
+    result = {
+        "config": {
+            "target": "url" if args.url else args.target,
+            "workers": args.workers if args.target == "uvicorn" and not args.url else 1,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "mix": {k: v for k, v in mix.items() if v},
+            "seed": args.seed,
+        },
+        "seeded": seeded,
+        "env": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "git": _git_rev()},
+        **result,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            result["vs_baseline"] = _compare(result, json.load(f))
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--target", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--url", help="benchmark an already running server instead")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--tasks", type=int, default=1000, help="seeded tasks (1k..1M)")
+    parser.add_argument("--tickets", type=int, default=None, help="seeded tickets (default: tasks / 5)")
+    parser.add_argument("--db", help="database path (default: temporary)")
+    parser.add_argument("--reuse-db", action="store_true", help="use --db as is without seeding")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--mix", help="operation weights, e.g. chat_ask=5,tickets=1")
+    parser.add_argument("--no-slack", action="store_true", help="skip signed Slack payloads")
+    parser.add_argument("--slack-latency", type=float, default=0.02, help="stub Slack API latency (sec)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON result to this file")
+    parser.add_argument("--baseline", help="previous result JSON to compare against")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
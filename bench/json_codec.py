@@ -0,0 +1,99 @@
+"""
+JSON APIのリクエスト解析・レスポンスエンコードの1リクエストあたりのコスト
+1. 解析: 手書き（await request.json() + dict.get）、FastAPIのボディ引数、parse_body()（model_validate_json）
+   - モデル検証だけのマイクロベンチと、最小のFastAPIアプリでのリクエスト1回あたり
+2. エンコード: 標準のjson（FastAPIのJSONResponse）と orjson（FastJSONResponse）、jsonable_encoderを通す場合
+python -m bench.json_codec
+"""
+from __future__ import annotations
+import asyncio
+import json
+import time
+import timeit
+from typing import Any, Callable, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from app.chat.renderer import web_answer
+from app.schemas import ChatAskRequest, parse_body
+from app.services.qa_engine import process_question
+from app.utils import fastjson
+from bench.asgi import request
+
+ASK = json.dumps({"question": "How do I request leave for a special case?", "stream": False}).encode()
+
+
+def _per_call_us(fn: Callable[[], Any], number: int = 20000) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def _manual_parse() -> None:
+    data = json.loads(ASK)
+    data.get("question", "")
+    data.get("stream")
+
+
+def _route_cost() -> Dict[str, float]:
+    """同じ処理（解析して204）を手書き・ボディ引数・parse_body()で比べる"""
+    app = FastAPI()
+
+    @app.post("/manual")
+    async def manual(request: Request):
+        data = await request.json()
+        data.get("question", "")
+        return Response(status_code=204)
+
+    @app.post("/body_param")
+    async def body_param(body: ChatAskRequest):
+        return Response(status_code=204)
+
+    @app.post("/parse_body")
+    async def parsed(request: Request):
+        await parse_body(request, ChatAskRequest)
+        return Response(status_code=204)
+
+    async def run(url: str, n: int) -> float:
+        headers = {"content-type": "application/json"}
+        for _ in range(200):
+            await request(app, "POST", url, ASK, headers)
+        started = time.perf_counter()
+        for _ in range(n):
+            await request(app, "POST", url, ASK, headers)
+        return (time.perf_counter() - started) / n * 1e6
+
+    return {url: round(min(asyncio.run(run(url, 3000)) for _ in range(3)), 1) for url in ("/manual", "/body_param", "/parse_body")}
+
+
+def _payloads() -> Dict[str, Any]:
+    blocks = json.loads(web_answer(process_question("How do I request leave?")))
+    tickets = [
+        {"id": f"t-{i}", "created_at": "2026-10-19T09:00:00+09:00", "source": "web", "question": f"住所変更の手続き #{i}",
+         "status": "open", "resolved_at": None}
+        for i in range(100)
+    ]
+    return {"chat_answer": blocks, "tickets_100": {"tickets": tickets}}
+
+
+def main() -> None:
+    parse = {
+        "manual_json_loads_us": round(_per_call_us(_manual_parse), 2),
+        "pydantic_model_validate_json_us": round(_per_call_us(lambda: ChatAskRequest.model_validate_json(ASK)), 2),
+        "route_us": _route_cost(),
+    }
+    encode: Dict[str, Dict[str, float]] = {}
+    for name, payload in _payloads().items():
+        encode[name] = {
+            "bytes": len(fastjson.dumps(payload)),
+            "stdlib_JSONResponse_us": round(_per_call_us(lambda: JSONResponse(payload), 5000), 2),
+            "FastJSONResponse_us": round(_per_call_us(lambda: fastjson.FastJSONResponse(payload), 5000), 2),
+            "jsonable_encoder_plus_FastJSON_us": round(
+                _per_call_us(lambda: fastjson.FastJSONResponse(jsonable_encoder(payload)), 2000), 2
+            ),
+        }
+    print(json.dumps({"backend": fastjson.BACKEND, "parse": parse, "encode": encode}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
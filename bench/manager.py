@@ -0,0 +1,108 @@
+"""
+マネージャー一覧（/manager/{name}）の集計のコスト
+- n_plus_1: マネージャーのオンボーディングを一覧してから、1件ずつ get_onboarding + list_tasks してPythonで集計
+- grouped: manager_portfolio（LEFT JOIN + GROUP BY 1回）
+- grouped_no_index: grouped から idx_onboarding_manager_status を外したもの
+1回あたりの時間（中央値）とSQLの数を出す。seedはマネージャー500人なので、1人あたり タスク数/5/500 件
+python -m bench.manager --tasks 1000000
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import tempfile
+import time
+from statistics import median
+from typing import Any, Callable, Dict, List
+
+
+def _queries() -> float:
+    from app.services.metrics import snapshot
+    return sum(snapshot()["counters"].get("db_queries_total", {}).values())
+
+
+def _measure(fn: Callable[[str], Any], managers: List[str]) -> Dict[str, Any]:
+    samples: List[float] = []
+    before = _queries()
+    for name in managers:
+        started = time.perf_counter()
+        fn(name)
+        samples.append(time.perf_counter() - started)
+    return {
+        "ms": round(median(samples) * 1000, 2),
+        "sql_per_call": round((_queries() - before) / len(managers), 1),
+    }
+
+
+def n_plus_1(name: str) -> List[Dict[str, Any]]:
+    """以前の画面と同じ読み方（詳細ページの関数を1件ずつ呼ぶ）"""
+    from app.db import get_conn
+    from app.db.repo import get_onboarding, list_tasks
+    from app.utils.time import now_jst
+
+    today = now_jst().date().isoformat()
+    conn = get_conn()
+    ids = [r[0] for r in conn.execute(
+        "SELECT id FROM onboarding_requests WHERE manager_name = ? ORDER BY created_ts DESC", (name,)
+    )]
+    conn.close()
+    items = []
+    for oid in ids:
+        item = dict(get_onboarding(oid))
+        tasks = list_tasks(oid)
+        pending = sorted((t["due_date"], t["title"]) for t in tasks if not t["is_done"] and t["due_date"] >= today)
+        item.update(
+            tasks_total=len(tasks),
+            tasks_done=sum(1 for t in tasks if t["is_done"]),
+            overdue=sum(1 for t in tasks if not t["is_done"] and t["due_date"] < today),
+            next_due={"title": pending[0][1], "due_date": pending[0][0]} if pending else None,
+        )
+        items.append(item)
+    return items
+
+
+def _run(runs: int) -> Dict[str, Any]:
+    from app.db import get_conn
+    from app.db.repo import manager_portfolio
+    from bench.seed import STATUSES
+
+    managers = [f"Manager {i * 37 % 500}" for i in range(runs)]
+    # 2つの読み方が同じ結果になることを先に確かめる（作成日時が同じ行の並びは決まらないのでidで並べて比べる）
+    def key(items: List[Dict[str, Any]]) -> List[tuple]:
+        return sorted((o["id"], o["tasks_total"], o["tasks_done"], o["overdue"], o["next_due"]) for o in items)
+
+    for name in managers[:3]:
+        assert key(n_plus_1(name)) == key(manager_portfolio(name)), name
+
+    result = {
+        "onboardings_per_manager": len(manager_portfolio(managers[0])),
+        "n_plus_1": _measure(n_plus_1, managers),
+        "grouped": _measure(manager_portfolio, managers),
+        # seedではマネージャーごとに状態が1つに決まるので、その状態で絞る（全件が残る）
+        "grouped_status_filter": _measure(lambda name: manager_portfolio(name, STATUSES[int(name.split()[1]) % 5]), managers),
+    }
+    conn = get_conn()
+    conn.execute("DROP INDEX idx_onboarding_manager_status")
+    conn.commit()
+    conn.close()
+    result["grouped_no_index"] = _measure(manager_portfolio, managers)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=1000000)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "manager.db")
+        # DB_PATHは読み込み時に決まるので、appを読み込む前に設定する
+        os.environ["DB_PATH"] = db
+        from bench.seed import seed
+        seeded = seed(args.tasks, 0)
+        result = _run(args.runs)
+    print(json.dumps({"seeded": seeded, **result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+計測（MetricsMiddleware + DB計測）のオーバーヘッド確認
+1. 部品ごとのコスト: ミドルウェア1回あたり、クエリ1本あたりの増分（マイクロベンチ）
+2. 実リクエスト: 計測を有効にした状態で混合ルートを流し、1リクエストあたりのCPU時間とクエリ数を測る
+3. 1と2から計測の割合を出す。参考としてMETRICS_ENABLED=1/0の別プロセスのA/Bも出す
+   （A/Bはスレッドプールの切り替え待ちで回ごとに±5%以上揺れるので、割合は3の値で判断する）
+python -m bench.metrics_overhead --requests 4000 --rounds 3
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+
+def _query_cost() -> float:
+    """クエリ1本（execute + fetchone）あたりの増分（us）"""
+    from app.db.instrumented import InstrumentedConnection, QueryStats, current_stats
+
+    token = current_stats.set(QueryStats())
+    costs = []
+    for factory in (sqlite3.Connection, InstrumentedConnection):
+        conn = sqlite3.connect(":memory:", factory=factory)
+        conn.row_factory = sqlite3.Row
+        conn.execute("CREATE TABLE t (id TEXT PRIMARY KEY, x INTEGER)")
+        conn.executemany("INSERT INTO t VALUES (?, ?)", [(str(i), i) for i in range(100)])
+        run = lambda: conn.execute("SELECT * FROM t WHERE id = ?", ("5",)).fetchone()  # noqa: E731
+        costs.append(min(timeit.repeat(run, number=20000, repeat=5)) / 20000 * 1e6)
+        conn.close()
+    current_stats.reset(token)
+    return costs[1] - costs[0]
+
+
+def _middleware_cost() -> float:
+    """ミドルウェア1回あたりの増分（us）"""
+    from app.services.request_metrics import MetricsMiddleware
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    async def run(target, n: int) -> float:
+        started = time.perf_counter()
+        for _ in range(n):
+            await target({"type": "http", "method": "GET"}, None, send)
+        return (time.perf_counter() - started) / n * 1e6
+
+    wrapped = MetricsMiddleware(app)
+    bare = min(asyncio.run(run(app, 20000)) for _ in range(3))
+    instrumented = min(asyncio.run(run(wrapped, 20000)) for _ in range(3))
+    return instrumented - bare
+
+
+async def _worker(requests: int) -> str:
+    from bench.asgi import lifespan, request
+    from app.main import app
+    from app.services import metrics
+
+    async with lifespan(app):
+        form = b"employee_name=a&manager_name=b&role=eng&grade=newgrad&start_date=2026-11-01&lang=en"
+        resp = await request(app, "POST", "/onboard", form, {"content-type": "application/x-www-form-urlencoded"})
+        oid = resp.headers["location"].rsplit("/", 1)[-1]
+        await request(app, "POST", f"/onboarding/{oid}/approve")
+        ask = json.dumps({"question": "How do I request leave?"}).encode()
+        mix = [
+            ("GET", "/health", b"", {}),
+            ("POST", "/chat/ask", ask, {"content-type": "application/json"}),
+            ("GET", f"/onboarding/{oid}", b"", {}),
+            ("GET", "/tickets", b"", {}),
+        ]
+        for method, url, body, headers in mix:  # ウォームアップ
+            await request(app, method, url, body, headers)
+        metrics.reset()
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        for i in range(requests):
+            method, url, body, headers = mix[i % len(mix)]
+            await request(app, method, url, body, headers)
+        cpu = time.process_time() - cpu_started
+        wall = time.perf_counter() - started
+        queries = sum(metrics.snapshot()["counters"].get("db_queries_total", {}).values())
+        return json.dumps({"cpu_us": cpu / requests * 1e6, "req_per_sec": requests / wall, "queries_per_req": queries / requests})
+
+
+def _run(enabled: bool, requests: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, METRICS_ENABLED="1" if enabled else "0", DB_PATH=os.path.join(tmp, "bench.db"))
+        out = subprocess.run(
+            [sys.executable, "-m", "bench.metrics_overhead", "--worker", "--requests", str(requests)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        print(asyncio.run(_worker(args.requests)))
+        return
+
+    per_query = _query_cost()
+    per_request = _middleware_cost()
+    on, off = [], []
+    for _ in range(args.rounds):
+        off.append(_run(False, args.requests))
+        on.append(_run(True, args.requests))
+    cpu_on = min(r["cpu_us"] for r in on)
+    queries = on[0]["queries_per_req"]
+    instrumentation = per_request + queries * per_query
+    result = {
+        "requests": args.requests,
+        "middleware_us_per_req": round(per_request, 2),
+        "db_us_per_query": round(per_query, 2),
+        "queries_per_req": round(queries, 2),
+        "cpu_us_per_req": round(cpu_on, 1),
+        "overhead_pct": round(instrumentation / cpu_on * 100, 2),
+        "ab_req_per_sec_disabled": round(max(r["req_per_sec"] for r in off), 1),
+        "ab_req_per_sec_enabled": round(max(r["req_per_sec"] for r in on), 1),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Outbox dispatcherの確認（フェイクSlackクライアントに対して送信し、重複・欠落がないことを確認）
+python -m bench.outbox --tickets 200 --dispatchers 2 --fail-times 5
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+
+
+async def run(tickets: int, dispatchers: int, fail_times: int, rate: float) -> dict:
+    from app.db import init_db
+    from app.db.repo import create_ticket
+    from app.slack.fake_client import FakeSlackClient
+    from app.slack.outbox import OutboxDispatcher
+
+    init_db()
+    for i in range(tickets):
+        create_ticket("slack", f"question {i}", user_ref="U1", channel_ref="C1", notify_channel="C-HR")
+
+    client = FakeSlackClient(rate_per_sec=rate, burst=rate, fail_times=fail_times)
+    workers = [OutboxDispatcher(client, batch_size=20, interval=0.05, base_backoff=0.05) for _ in range(dispatchers)]
+    started = time.perf_counter()
+    for w in workers:
+        await w.start()
+    while len(client.calls) < tickets and time.perf_counter() - started < 120:
+        await asyncio.sleep(0.02)
+    elapsed = time.perf_counter() - started
+    for w in workers:
+        await w.stop()
+
+    ids = Counter(c["blocks"][0]["text"]["text"].split("\n")[0] for c in client.calls)
+    return {
+        "tickets": tickets,
+        "dispatchers": dispatchers,
+        "delivered": len(client.calls),
+        "duplicates": sum(n - 1 for n in ids.values() if n > 1),
+        "rate_limited": client.rejected,
+        "elapsed_sec": round(elapsed, 3),
+        "throughput_per_sec": round(len(client.calls) / elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument("--dispatchers", type=int, default=2)
+    parser.add_argument("--fail-times", type=int, default=5, help="fake Slack returns 500 for the first N calls")
+    parser.add_argument("--rate", type=float, default=500.0, help="fake Slack limit per second")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DB_PATH"] = os.path.join(tmp, "bench.db")
+        print(json.dumps(asyncio.run(run(args.tickets, args.dispatchers, args.fail_times, args.rate)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+QAのキーワードマッチの1質問あたりのコスト
+- before: 以前の辞書（トピックごとに日英混在のキーワード一覧）を全トピック・全キーワード順に `in` で調べる
+- after: match_topic（文字種で言語を判定し、その言語の索引だけを引く）
+日本語・英語・日英混在・マッチしない質問で、1質問あたりの時間と最初にマッチするまでに調べるキーワード数を出す
+--topics でKBのトピックを複製して大きな辞書でも測る（キーワードに番号を付けるので別のキーワードになる）
+python -m bench.qa_index --topics 6 200
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import tempfile
+import timeit
+from typing import Any, Dict, List, Optional
+
+from app.services import qa_engine
+
+QUESTIONS = {
+    "ja": ["住所変更の手続きを教えてください", "勤怠の締め日はいつですか", "研修の申請方法", "福利厚生について知りたい"],
+    "en": ["How do I request leave for a special case?", "benefits enrollment deadline", "first day schedule", "training course list"],
+    "mixed": ["PTOの申請方法", "onboardingの資料はどこですか"],
+    "no_match": ["ビザの更新について", "visa renewal support"],
+}
+
+
+def _scaled(topics: int) -> Dict[str, Any]:
+    """KBのトピックを topics 件まで複製する（元のトピックが先頭なので結果は変わらない）"""
+    base = qa_engine.load_knowledge()
+    kb = dict(base)
+    i = 0
+    while len(kb) < topics:
+        for topic, data in base.items():
+            if len(kb) >= topics:
+                break
+            kb[f"{topic}_{i}"] = {
+                **data,
+                **{lang: {**data[lang], "keywords": [f"{kw}{i}" for kw in data[lang]["keywords"]]} for lang in qa_engine.LANGS},
+            }
+        i += 1
+    return kb
+
+
+def _flat(kb: Dict[str, Any]) -> Dict[str, List[str]]:
+    """以前の形（トピックごとに全言語のキーワードを1つの一覧に）"""
+    return {topic: [kw for lang in qa_engine.LANGS for kw in data[lang]["keywords"]] for topic, data in kb.items()}
+
+
+def _before(flat: Dict[str, List[str]], question: str) -> Optional[str]:
+    question_lower = question.lower()
+    for topic, keywords in flat.items():
+        for keyword in keywords:
+            if keyword.lower() in question_lower:
+                return topic
+    return None
+
+
+def _checked(keywords: List[str], question: str) -> int:
+    """最初にマッチするまでに調べたキーワード数"""
+    question_lower = question.lower()
+    for checked, keyword in enumerate(keywords, 1):
+        if keyword.lower() in question_lower:
+            return checked
+    return len(keywords)
+
+
+def _avg(values: List[int]) -> float:
+    return round(sum(values) / len(values), 1)
+
+
+def _per_call_us(fn, questions: List[str], number: int) -> float:
+    def run() -> None:
+        for q in questions:
+            fn(q)
+    return round(min(timeit.repeat(run, number=number, repeat=5)) / number / len(questions) * 1e6, 2)
+
+
+def _measure(topics: int, number: int) -> Dict[str, Any]:
+    kb = _scaled(topics)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "qa_knowledge.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(kb, f, ensure_ascii=False)
+        # 複製したKBを読み込ませる（索引は言語ごとに最初の質問で作る）
+        qa_engine.KNOWLEDGE_PATH = path
+        qa_engine.load_knowledge.cache_clear()
+        qa_engine._index.cache_clear()
+        flat = _flat(kb)
+        everything = [kw for keywords in flat.values() for kw in keywords]
+        per_lang = {lang: len(qa_engine._index((lang,))) for lang in qa_engine.LANGS}
+        result: Dict[str, Any] = {"topics": len(kb), "keywords": sum(map(len, flat.values())), "index_keywords": per_lang}
+        for kind, questions in QUESTIONS.items():
+            assert [_before(flat, q) for q in questions] == [qa_engine.match_topic(q) for q in questions], kind
+            result[kind] = {
+                "before_us": _per_call_us(lambda q: _before(flat, q), questions, number),
+                "after_us": _per_call_us(qa_engine.match_topic, questions, number),
+                "before_keywords_checked": _avg([_checked(everything, q) for q in questions]),
+                "after_keywords_checked": _avg([
+                    _checked([kw for kw, _ in qa_engine._index(qa_engine.detect_languages(q))], q) for q in questions
+                ]),
+            }
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--topics", type=int, nargs="+", default=[6, 200])
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps([_measure(n, args.number) for n in args.topics], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+/reports のレイテンシと履歴の量の関係
+チケット件数を変えたDBごとに、集計テーブルから作るreport()と、元のテーブルに同じ集計をGROUP BYで流した場合を比べる
+python -m bench.reports --tickets 10000 100000 1000000
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from statistics import median
+from typing import Callable, Dict, List
+
+# report(days=30) と同じ内容を元のテーブルから集計する
+ADHOC = [
+    """SELECT substr(created_at, 1, 10) AS day, source, COUNT(*) FROM tickets
+       WHERE created_at >= ? GROUP BY 1, 2""",
+    """SELECT substr(resolved_at, 1, 10), source, COUNT(*), SUM(julianday(resolved_at) - julianday(created_at))
+       FROM tickets WHERE status = 'closed' AND resolved_at >= ? GROUP BY 1, 2""",
+    "SELECT topic, COUNT(*) FROM tickets WHERE created_at >= ? GROUP BY topic",
+    """SELECT role, SUM(status = 'PENDING'), SUM(status = 'APPROVED'), SUM(status = 'REJECTED')
+       FROM onboarding_requests WHERE ? IS NOT NULL GROUP BY role""",
+    """SELECT o.role, COUNT(*), SUM(t.is_done) FROM tasks t JOIN onboarding_requests o ON o.id = t.onboarding_id
+       WHERE ? IS NOT NULL GROUP BY o.role""",
+    """SELECT substr(created_at, 1, 10), SUM(status = 'PENDING'), SUM(status = 'APPROVED'), SUM(status = 'REJECTED')
+       FROM onboarding_requests WHERE created_at >= ? GROUP BY 1""",
+]
+
+
+def _ms(fn: Callable[[], object], runs: int) -> float:
+    fn()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return round(median(samples) * 1000, 2)
+
+
+def _adhoc(db: str, since: str) -> None:
+    conn = sqlite3.connect(db)
+    for sql in ADHOC:
+        conn.execute(sql, (since,)).fetchall()
+    conn.close()
+
+
+def _worker(tickets: int, runs: int, db: str) -> Dict:
+    from bench.seed import seed
+    seeded = seed(max(1000, tickets // 4), tickets)
+
+    from app.db.rollups import report
+    data = report(30)
+    return {
+        "tickets": tickets,
+        "db_mb": seeded["db_mb"],
+        "report_rollups_ms": _ms(lambda: report(30), runs),
+        "adhoc_group_by_ms": _ms(lambda: _adhoc(db, data["since"]), max(3, runs // 4)),
+        "rollup_rows": {"tickets_daily": len(data["tickets"]["daily"]), "topics": len(data["topics"])},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickets", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--worker", type=str, default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        print(json.dumps(_worker(args.tickets[0], args.runs, args.worker)))
+        return
+
+    results: List[Dict] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.tickets:
+            # DB_PATHは読み込み時に決まるので、件数ごとに別プロセスで測る
+            db = os.path.join(tmp, f"reports-{n}.db")
+            out = subprocess.run(
+                [sys.executable, "-m", "bench.reports", "--worker", db, "--tickets", str(n), "--runs", str(args.runs)],
+                env={**os.environ, "DB_PATH": db}, check=True, capture_output=True, text=True,
+            ).stdout
+            results.append(json.loads(out.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
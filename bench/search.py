@@ -0,0 +1,72 @@
+"""
+全文検索（/search/tickets, /search/onboardings）のレイテンシ
+チケットN件のDBを作り（索引はトリガーで同時に作られる）、よくある語・まれな語・短い語・複数語・ページ送りを測る
+python -m bench.search --tickets 1000000 --db /tmp/search.db   # 2回目以降は --reuse-db
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import time
+from statistics import quantiles
+from typing import Dict, List, Tuple
+
+# (名前, 関数名, 引数)
+CASES: List[Tuple[str, str, Dict]] = [
+    ("common_en", "search_tickets", {"q": "visa"}),
+    ("common_ja", "search_tickets", {"q": "住所変更"}),
+    ("common_two_terms", "search_tickets", {"q": "visa renewal"}),
+    ("common_page_10", "search_tickets", {"q": "visa", "page": 10}),
+    ("common_status_open", "search_tickets", {"q": "締め日", "status": "open"}),
+    ("rare", "search_tickets", {"q": "#123457"}),
+    ("rare_ja_phrase", "search_tickets", {"q": "研修の申請方法 #4242"}),
+    ("no_match", "search_tickets", {"q": "zzzqqq"}),
+    ("short_common", "search_tickets", {"q": "住所"}),
+    ("short_rare", "search_tickets", {"q": "#7"}),
+    ("onboarding_name", "search_onboardings", {"q": "Employee 4242"}),
+    ("onboarding_manager", "search_onboardings", {"q": "Manager 42"}),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--tickets", type=int, default=1000000)
+    parser.add_argument("--tasks", type=int, default=50000)
+    parser.add_argument("--reuse-db", action="store_true")
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+    os.environ["DB_PATH"] = args.db
+
+    seeded = None
+    if not args.reuse_db:
+        if os.path.exists(args.db):
+            os.remove(args.db)
+        from bench.seed import seed
+        seeded = seed(args.tasks, args.tickets)
+
+    from app.db import search
+
+    results = {}
+    for name, fn, kwargs in CASES:
+        call = getattr(search, fn)
+        first = call(**kwargs)
+        samples = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            call(**kwargs)
+            samples.append(time.perf_counter() - started)
+        q = quantiles(samples, n=100)
+        results[name] = {
+            "args": kwargs,
+            "order": first["order"],
+            "hits": len(first["results"]),
+            "p50_ms": round(q[49] * 1000, 2),
+            "p99_ms": round(q[98] * 1000, 2),
+        }
+    print(json.dumps({"seeded": seeded, "db_mb": round(os.path.getsize(args.db) / 1e6, 1), "cases": results},
+                     indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+ベンチマーク用のDBを指定した件数で作る（タスク1k〜1M件）
+オンボーディング1件あたりタスク5件、期限は今日の前後90日に散らす
+python -m bench.seed --db /tmp/bench.db --tasks 100000 --tickets 20000
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+import uuid
+from datetime import timedelta
+from typing import Dict, Iterator, Tuple
+
+TASKS_PER_ONBOARDING = 5
+ROLES = [("eng", "newgrad"), ("general", "newgrad"), ("general", "mid"), ("cs", "mid")]
+STATUSES = ["PENDING", "APPROVED", "APPROVED", "APPROVED", "REJECTED"]
+QUESTIONS = [
+    "住所変更の手続きを教えてください",
+    "How do I request leave for a special case?",
+    "visa renewal support",
+    "勤怠の締め日はいつですか",
+    "benefits enrollment deadline",
+    "研修の申請方法",
+]
+
+
+def _onboardings(count: int, rng: random.Random, today) -> Iterator[Tuple]:
+    for i in range(count):
+        role, grade = ROLES[i % len(ROLES)]
+        created = today - timedelta(days=rng.randint(0, 365))
+        start = created + timedelta(days=rng.randint(7, 60))
+        status = STATUSES[i % len(STATUSES)]
+        yield (
+            str(uuid.UUID(int=rng.getrandbits(128))),
+            created.isoformat() + "T09:00:00+09:00",
+            f"Employee {i}",
+            f"Manager {i % 500}",
+            role,
+            grade,
+            start.isoformat(),
+            status,
+            "budget freeze" if status == "REJECTED" else None,
+            "ja" if i % 3 == 0 else "en",
+        )
+
+
+def _tasks(onboarding_ids, count: int, rng: random.Random, today) -> Iterator[Tuple]:
+    for i in range(count):
+        oid = onboarding_ids[i // TASKS_PER_ONBOARDING]
+        due = today + timedelta(days=rng.randint(-90, 90))
+        yield (
+            str(uuid.UUID(int=rng.getrandbits(128))),
+            oid,
+            f"Employee {i // TASKS_PER_ONBOARDING}" if i % 2 else f"Manager {(i // TASKS_PER_ONBOARDING) % 500}",
+            f"Task {i}",
+            "Seeded task for benchmarks",
+            due.isoformat(),
+            1 if due < today and rng.random() < 0.8 else 0,
+        )
+
+
+def _tickets(count: int, rng: random.Random, today) -> Iterator[Tuple]:
+    from app.db.rollups import NO_TOPIC
+    from app.services.qa_engine import match_topic
+
+    topics = [match_topic(q) or NO_TOPIC for q in QUESTIONS]
+    for i in range(count):
+        created = today - timedelta(days=rng.randint(0, 365))
+        closed = rng.random() < 0.7
+        source = "slack" if i % 2 else "web"
+        yield (
+            str(uuid.UUID(int=rng.getrandbits(128))),
+            created.isoformat() + f"T{rng.randint(9, 18):02d}:00:00+09:00",
+            source,
+            f"U{i % 1000}" if source == "slack" else None,
+            f"{QUESTIONS[i % len(QUESTIONS)]} #{i}",
+            "closed" if closed else "open",
+            f"C{i % 50}" if source == "slack" else None,
+            (created + timedelta(days=rng.randint(0, 5))).isoformat() + "T12:00:00+09:00" if closed else None,
+            topics[i % len(QUESTIONS)],
+        )
+
+
+def seed(tasks: int, tickets: int, seed: int = 1) -> Dict[str, float]:
+    """DB_PATH（環境変数）のDBを初期化して件数分のデータを入れる"""
+    from app.db import DB_PATH, init_db
+    from app.db.connection import backfill_epoch_columns
+    from app.db.rollups import rebuild_all
+    from app.utils.time import now_jst
+
+    init_db()
+    rng = random.Random(seed)
+    today = now_jst().date()
+    onboardings = max(1, -(-tasks // TASKS_PER_ONBOARDING))
+    started = time.perf_counter()
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("PRAGMA synchronous = OFF")
+    with conn:
+        rows = list(_onboardings(onboardings, rng, today))
+        conn.executemany(
+            """INSERT INTO onboarding_requests
+               (id, created_at, employee_name, manager_name, role, grade, start_date, status, rejection_reason, lang)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            rows,
+        )
+        conn.executemany(
+            """INSERT INTO tasks (id, onboarding_id, owner, title, description, due_date, is_done)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            _tasks([r[0] for r in rows], tasks, rng, today),
+        )
+        conn.executemany(
+            """INSERT INTO tickets (id, created_at, source, user_ref, question, status, channel_ref, resolved_at, topic)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            _tickets(tickets, rng, today),
+        )
+    with conn:
+        backfill_epoch_columns(conn)
+    conn.execute("ANALYZE")
+    conn.close()
+    # 直接INSERTしたので集計テーブルは作り直す
+    rebuild_all()
+    return {
+        "onboardings": onboardings,
+        "tasks": tasks,
+        "tickets": tickets,
+        "seconds": round(time.perf_counter() - started, 2),
+        "db_mb": round(os.path.getsize(DB_PATH) / 1e6, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--tickets", type=int, default=None, help="default: tasks / 5")
+    args = parser.parse_args()
+    os.environ["DB_PATH"] = args.db
+    tickets = args.tasks // 5 if args.tickets is None else args.tickets
+    print(json.dumps(seed(args.tasks, tickets), indent=2))
+
+
+if __name__ == "__main__":
+    main()
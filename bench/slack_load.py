@@ -0,0 +1,118 @@
+"""
+Slackエンドポイントの負荷テスト（スタブSlack APIに対して /slack/commands を叩く）
+python -m bench.slack_load --requests 500 --concurrency 50
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import time
+from urllib.parse import urlencode
+
+SIGNING_SECRET = "bench-signing-secret"
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def command_body(i: int, response_url: str) -> bytes:
+    return urlencode({
+        "command": "/hrhelp",
+        "text": f"How do I request time off? #{i}",
+        "team_id": "T1",
+        "user_id": "U1",
+        "channel_id": "C1",
+        "response_url": response_url,
+        "trigger_id": f"trigger-{i}",
+    }).encode()
+
+
+def action_body(i: int, response_url: str) -> bytes:
+    payload = {
+        "type": "block_actions",
+        "team": {"id": "T1"},
+        "user": {"id": "U1"},
+        "channel": {"id": "C1"},
+        "trigger_id": f"trigger-{i}",
+        "response_url": response_url,
+        "message": {"blocks": [{"type": "section", "text": {"type": "mrkdwn", "text": f"*HR Bot:*\nquestion {i}"}}]},
+        "actions": [{"type": "button", "action_id": "escalate_to_hr", "action_ts": f"{time.time():.6f}"}],
+    }
+    return urlencode({"payload": json.dumps(payload)}).encode()
+
+
+async def run(total: int, concurrency: int, latency: float, kind: str = "command", retries: int = 0) -> dict:
+    from bench.slack_stub import SlackStub, signed_headers
+
+    with SlackStub(latency=latency) as stub:
+        os.environ["SLACK_BOT_TOKEN"] = "xoxb-bench"
+        os.environ["SLACK_SIGNING_SECRET"] = SIGNING_SECRET
+        os.environ["SLACK_API_URL"] = stub.url + "/api/"
+        from app.main import app
+        from bench.asgi import lifespan, request
+
+        async with lifespan(app):
+            sem = asyncio.Semaphore(concurrency)
+            statuses: dict = {}
+            latencies: list = []
+            path = "/slack/commands" if kind == "command" else "/slack/interactive"
+            build = command_body if kind == "command" else action_body
+
+            async def one(i: int) -> None:
+                body = build(i, f"{stub.url}/respond/{i}")
+                # retries > 0 ならSlackの再送（同じペイロード + X-Slack-Retry-Num）を模擬する
+                for attempt in range(retries + 1):
+                    headers = signed_headers(SIGNING_SECRET, body)
+                    if attempt:
+                        headers["x-slack-retry-num"] = str(attempt)
+                        headers["x-slack-retry-reason"] = "http_timeout"
+                    async with sem:
+                        t0 = time.perf_counter()
+                        res = await request(app, "POST", path, body, headers)
+                        latencies.append(time.perf_counter() - t0)
+                    statuses[res.status] = statuses.get(res.status, 0) + 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(total)))
+            acked = time.perf_counter() - started
+            sent = total * (retries + 1)
+
+            # respond()の到着（リスナー処理の完了）を待つ
+            deadline = time.monotonic() + 60
+            while stub.count("/respond/") < total and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            completed = time.perf_counter() - started
+
+            from app.services.metrics import snapshot
+            suppressed = sum(snapshot()["counters"].get("slack_duplicates_suppressed_total", {}).values())
+
+    return {
+        "kind": kind,
+        "requests": total * (retries + 1),
+        "concurrency": concurrency,
+        "statuses": statuses,
+        "ack_requests_per_sec": round(sent / acked, 1),
+        "ack_p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "ack_p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "completed_requests_per_sec": round(total / completed, 1),
+        "responses_delivered": stub.count("/respond/"),
+        "duplicates_suppressed": int(suppressed),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub Slack API latency (sec)")
+    parser.add_argument("--kind", choices=["command", "action"], default="command")
+    parser.add_argument("--retries", type=int, default=0, help="redeliver each payload N extra times")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests, args.concurrency, args.latency, args.kind, args.retries)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
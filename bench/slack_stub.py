@@ -0,0 +1,76 @@
+"""
+ローカルのスタブSlack API（auth.test / chat.postMessage / response_url を受ける）
+"""
+from __future__ import annotations
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+
+class SlackStub:
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.requests: List[Tuple[str, Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    payload = json.loads(raw) if raw.startswith(b"{") else {"raw": raw.decode()}
+                except ValueError:
+                    payload = {"raw": raw.decode(errors="replace")}
+                with stub._lock:
+                    stub.requests.append((self.path, payload))
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if self.path.split("?")[0].endswith("auth.test"):
+                    body = {"ok": True, "user_id": "UBOT", "bot_id": "BBOT", "team_id": "T1", "url": "https://bench.slack.com/"}
+                else:
+                    body = {"ok": True, "ts": f"{time.time():.6f}"}
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def count(self, prefix: str) -> int:
+        with self._lock:
+            return sum(1 for path, _ in self.requests if path.startswith(prefix))
+
+    def __enter__(self) -> "SlackStub":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.server.shutdown()
+
+
+def signed_headers(secret: str, body: bytes, content_type: str = "application/x-www-form-urlencoded") -> Dict[str, str]:
+    """Slackの署名ヘッダ（X-Slack-Signature）を付与"""
+    import hashlib
+    import hmac
+
+    ts = str(int(time.time()))
+    base = f"v0:{ts}:".encode() + body
+    sig = "v0=" + hmac.new(secret.encode(), base, hashlib.sha256).hexdigest()
+    return {
+        "content-type": content_type,
+        "x-slack-request-timestamp": ts,
+        "x-slack-signature": sig,
+    }
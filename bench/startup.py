@@ -0,0 +1,122 @@
+"""
+コールドスタートの計測と予算チェック（CIで使う: 予算を超えたら終了コード1）
+1. python -X importtime -c "import app.main" の累積時間（app.main）と重いモジュールの上位
+2. Slack未設定のとき slack_bolt / slack_sdk / aiohttp が読み込まれていないこと
+3. 別プロセスで import → startup完了 → 最初のページまでの時間（空のDB・空のテンプレートキャッシュ / 2回目の起動）
+python -m bench.startup --rounds 5 --import-budget-ms 900 --startup-budget-ms 1200
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from statistics import median
+from typing import Dict, List, Tuple
+
+# Slack未設定で読み込まれてはいけないモジュール
+FORBIDDEN = ("slack_bolt", "slack_sdk", "aiohttp")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _clean_env(**extra: str) -> Dict[str, str]:
+    env = {k: v for k, v in os.environ.items() if not k.startswith("SLACK_")}
+    env.update(extra)
+    return env
+
+
+def _importtime(env: Dict[str, str]) -> Dict[str, Tuple[int, int]]:
+    """モジュール名 -> (self us, cumulative us)"""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=env, check=True, capture_output=True, text=True,
+    ).stderr
+    modules: Dict[str, Tuple[int, int]] = {}
+    for line in err.splitlines():
+        m = _LINE.match(line)
+        if m:
+            modules[m.group(4)] = (int(m.group(1)), int(m.group(2)))
+    return modules
+
+
+async def _worker() -> str:
+    started = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+    from bench.asgi import lifespan, request
+
+    async with lifespan(app):
+        ready = time.perf_counter()
+        resp = await request(app, "GET", "/")
+        first = time.perf_counter()
+        assert resp.status == 200, resp.status
+    return json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "startup_ms": (ready - imported) * 1000,
+        "first_page_ms": (first - ready) * 1000,
+        "total_ms": (first - started) * 1000,
+    })
+
+
+def _boot(env: Dict[str, str]) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "bench.startup", "--worker"],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _median(runs: List[dict]) -> dict:
+    return {k: round(median(r[k] for r in runs), 1) for k in runs[0]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=900.0, help="importtimeでのapp.mainの累積時間の上限")
+    parser.add_argument("--startup-budget-ms", type=float, default=1200.0, help="2回目の起動でimportから最初のページまでの上限")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        print(asyncio.run(_worker()))
+        return
+
+    failures: List[str] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _clean_env(DB_PATH=os.path.join(tmp, "startup.db"), JINJA_CACHE_DIR=os.path.join(tmp, "jinja"))
+        samples = [_importtime(env) for _ in range(args.rounds)]
+        cold = _boot(env)  # 空のDB・空のバイトコードキャッシュ
+        warm = _median([_boot(env) for _ in range(args.rounds)])
+
+    import_ms = median(s["app.main"][1] for s in samples) / 1000
+    modules = samples[-1]
+    top = sorted(((name, cum) for name, (_, cum) in modules.items() if "." not in name), key=lambda x: -x[1])
+    app_modules = sorted(((name, cum) for name, (_, cum) in modules.items() if name.startswith("app.")), key=lambda x: -x[1])
+    loaded = [name for name in FORBIDDEN if name in modules]
+
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import app.main took {import_ms:.0f}ms (budget {args.import_budget_ms:.0f}ms)")
+    if warm["total_ms"] > args.startup_budget_ms:
+        failures.append(f"startup took {warm['total_ms']:.0f}ms (budget {args.startup_budget_ms:.0f}ms)")
+    if loaded:
+        failures.append(f"imported without Slack configured: {', '.join(loaded)}")
+
+    print(json.dumps({
+        "importtime_app_main_ms": round(import_ms, 1),
+        "top_packages_ms": {name: round(cum / 1000, 1) for name, cum in top[: args.top]},
+        "top_app_modules_ms": {name: round(cum / 1000, 1) for name, cum in app_modules[: args.top]},
+        "cold_boot": {k: round(v, 1) for k, v in cold.items()},
+        "warm_boot": warm,
+        "failures": failures,
+    }, indent=2, ensure_ascii=False))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
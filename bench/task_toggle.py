@@ -0,0 +1,106 @@
+"""
+タスクの完了切り替え1クリックのコスト
+- form: POST /tasks/{id}/toggle → 303 → GET /onboarding/{oid}（以前の画面の動き。ページ全体を描画し直す）
+- json: POST /tasks/{id}/toggle.json（行だけクライアント側で書き換える）
+- 一括: N件を1件ずつjsonで切り替える場合と POST /tasks/bulk 1回
+1操作あたりの時間（中央値）・SQLの数・レスポンスのバイト数を出す
+python -m bench.task_toggle --tasks 100000 --bulk 100
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from statistics import median
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+def _queries() -> float:
+    from app.services.metrics import snapshot
+    return sum(snapshot()["counters"].get("db_queries_total", {}).values())
+
+
+async def _measure(op: Callable[[int], Awaitable[int]], runs: int) -> Dict[str, Any]:
+    samples: List[float] = []
+    sizes: List[int] = []
+    before = _queries()
+    for i in range(runs):
+        started = time.perf_counter()
+        sizes.append(await op(i))
+        samples.append(time.perf_counter() - started)
+    return {
+        "ms": round(median(samples) * 1000, 3),
+        "sql_per_op": round((_queries() - before) / runs, 1),
+        "response_bytes": round(sum(sizes) / runs),
+    }
+
+
+async def _run(db: str, bulk: int, runs: int) -> Dict[str, Any]:
+    from app.main import app
+    from bench.asgi import lifespan, request
+
+    conn = sqlite3.connect(db)
+    # タスクの多いオンボーディングを1つ選ぶ（詳細ページの描画が重い側）
+    oid, = conn.execute(
+        "SELECT onboarding_id FROM tasks GROUP BY onboarding_id ORDER BY COUNT(*) DESC LIMIT 1"
+    ).fetchone()
+    task_ids = [r[0] for r in conn.execute("SELECT id FROM tasks WHERE onboarding_id = ?", (oid,))]
+    bulk_ids = [r[0] for r in conn.execute("SELECT id FROM tasks ORDER BY random() LIMIT ?", (bulk,))]
+    conn.close()
+    form = {"content-type": "application/x-www-form-urlencoded"}
+    body = f"redirect_to=/onboarding/{oid}".encode()
+
+    async def form_click(i: int) -> int:
+        res = await request(app, "POST", f"/tasks/{task_ids[i % len(task_ids)]}/toggle", body, form)
+        page = await request(app, "GET", res.headers["location"])
+        return len(res.body) + len(page.body)
+
+    async def json_click(i: int) -> int:
+        res = await request(app, "POST", f"/tasks/{task_ids[i % len(task_ids)]}/toggle.json")
+        return len(res.body)
+
+    async def one_by_one(i: int) -> int:
+        size = 0
+        for task_id in bulk_ids:
+            size += len((await request(app, "POST", f"/tasks/{task_id}/toggle.json")).body)
+        return size
+
+    async def bulk_call(i: int) -> int:
+        payload = json.dumps({"task_ids": bulk_ids, "is_done": i % 2 == 0}).encode()
+        res = await request(app, "POST", "/tasks/bulk", payload, {"content-type": "application/json"})
+        return len(res.body)
+
+    async with lifespan(app):
+        await form_click(0)
+        await json_click(0)
+        return {
+            "onboarding_tasks": len(task_ids),
+            "click_form_redirect_render": await _measure(form_click, runs),
+            "click_json": await _measure(json_click, runs),
+            f"bulk_{len(bulk_ids)}_one_by_one_json": await _measure(one_by_one, max(3, runs // 20)),
+            f"bulk_{len(bulk_ids)}_tasks_bulk": await _measure(bulk_call, max(3, runs // 20)),
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--bulk", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "toggle.db")
+        # DB_PATHは読み込み時に決まるので、appを読み込む前に設定する
+        os.environ["DB_PATH"] = db
+        os.environ.setdefault("ADMISSION_ENABLED", "0")
+        from bench.seed import seed
+        seeded = seed(args.tasks, args.tasks // 5)
+        result = asyncio.run(_run(db, args.bulk, args.runs))
+    print(json.dumps({"seeded": seeded, **result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+テナント数と書き込みスループット
+同じ数のワーカーでcreate_ticket（1件1トランザクション）を流し、書き込み先のテナント数（=DBファイル数）を変えて比べる
+1ファイルだと書き込みロックを全ワーカーで取り合う。テナントごとのファイルなら別のテナントの書き込みを待たない
+--mode threads は1プロセス内のスレッド（GILも共有する）、processes は uvicorn --workers に近い別プロセス
+python -m bench.tenants --mode processes --workers 8 --tenants 1 2 4 8 --seconds 5
+"""
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+
+def _write(tenant: str, seconds: float, start: Any) -> Tuple[int, int]:
+    """secondsの間create_ticketを繰り返して (件数, ロックエラー数) を返す"""
+    from app.db import close_idle, init_db, tenant_context
+    from app.db.repo import create_ticket
+
+    count = errors = 0
+    with tenant_context(tenant):
+        init_db()
+        start.wait()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            try:
+                create_ticket("web", f"住所変更の手続き {tenant} #{count}")
+                count += 1
+            except sqlite3.OperationalError:  # database is locked
+                errors += 1
+        close_idle()
+    return count, errors
+
+
+def _process_worker(args: Tuple[str, float, Any]) -> Tuple[int, int]:
+    return _write(*args)
+
+
+def _run(mode: str, tenants: List[str], workers: int, seconds: float) -> Dict[str, float]:
+    assignments = [tenants[i % len(tenants)] for i in range(workers)]
+    if mode == "threads":
+        start: Any = threading.Barrier(workers)
+        results: List[Tuple[int, int]] = [(0, 0)] * workers
+
+        def run(i: int) -> None:
+            results[i] = _write(assignments[i], seconds, start)
+
+        pool = [threading.Thread(target=run, args=(i,)) for i in range(workers)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+    else:
+        ctx = multiprocessing.get_context("fork")
+        start = ctx.Manager().Barrier(workers)
+        with ctx.Pool(workers) as pool:
+            results = pool.map(_process_worker, [(t, seconds, start) for t in assignments])
+    return {
+        "tenants": len(tenants),
+        "writes_per_sec": round(sum(c for c, _ in results) / seconds, 1),
+        "locked_errors": sum(e for _, e in results),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("processes", "threads"), default="processes")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # TENANTSは読み込み時に決まるので、appを読み込む前に設定する
+        names = [f"t{i}" for i in range(max(args.tenants))]
+        os.environ["TENANTS"] = ",".join(names)
+        results = []
+        for n in args.tenants:
+            # テナント数ごとに空のDBから始める
+            run_dir = os.path.join(tmp, f"run-{n}")
+            os.makedirs(run_dir)
+            os.environ["DB_PATH"] = os.path.join(run_dir, "default.db")
+            os.environ["TENANT_DB_DIR"] = run_dir
+            results.append(_run(args.mode, names[:n], args.workers, args.seconds))
+    base = results[0]["writes_per_sec"] or 1
+    for r in results:
+        r["speedup"] = round(r["writes_per_sec"] / base, 2)
+    print(json.dumps({"mode": args.mode, "workers": args.workers, "seconds": args.seconds, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()